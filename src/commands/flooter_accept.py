@@ -1,5 +1,4 @@
 import sys
-import shutil
 
 from typing import Optional
 
@@ -7,41 +6,76 @@ from commands.command import Command
 from errors import FlooterError, FlooterRunError
 from loggers import Logger
 from spec.floot_spec import FlootSpec
-from util import _set, _exit_on_exception
+from spec.selection import Selection
+from spec.storage import Storage
+from util import _exit_on_exception
 
 class FlooterAccept(Command):
     def __init__(self, spec: FlootSpec, _: Optional[Logger]) -> None:
         self.spec = spec
 
     def accept_run(self, rid: str) -> None:
-        """ Just copies everyhing to the main_dir. This alo copies the .meta file """
+        """ Just copies everyhing to the main_dir. This alo copies the meta information """
         storage = self.spec.storages.get_run_storage(rid)
-
-        # disable autosave, otherwise everything is overriden again
-        self.spec.storages.main.meta.noautosave()
-
-        shutil.copytree(storage.base_dir, self.spec.storages.main.base_dir, dirs_exist_ok=True)
+        main = self.spec.storages.main
+
+        # a run of selected requests replaces only these in main
+        selection = Selection.load(storage.meta)
+        if selection is not None:
+            self.accept_selection(storage, main, selection)
+            return
+
+        # copy the records, main and the run may use different layouts
+        for req_id in storage.list_requests():
+            main.write(req_id, storage.read(req_id))
+        main.meta.replace_with(storage.meta)
+
+        # main may compress differently than the runs
+        for _, endpoint_name, req_id, _ in storage.meta.iter_requests():
+            if main.exists(req_id):
+                main.recompress(req_id, self.spec.storages.codec_for(main, endpoint_name))
+        main.close()
+
+    def accept_selection(self, storage: Storage, main: Storage, selection: Selection) -> None:
+        requests = list(storage.meta.iter_requests())
+        made = {(testset_name, endpoint_name, req_id) for testset_name, endpoint_name, req_id, _ in requests}
+
+        # selected requests the run did not make anymore
+        for testset_name, endpoint_name, req_id, _ in list(main.meta.iter_requests()):
+            if selection.selects(testset_name, endpoint_name, req_id) and \
+               (testset_name, endpoint_name, req_id) not in made:
+                main.meta.remove_request(testset_name, endpoint_name, req_id)
+
+        for testset_name, endpoint_name, req_id, parameters in requests:
+            main.meta.add_request(testset_name, endpoint_name, req_id, parameters,
+                                  storage.meta.digests(testset_name, endpoint_name, req_id),
+                                  storage.meta.timing(testset_name, endpoint_name, req_id))
+            main.write(req_id, storage.read(req_id))
+            main.recompress(req_id, self.spec.storages.codec_for(main, endpoint_name))
+        main.close()
 
     def accept_request(self, rid: str, req_id: str) -> None:
-        """ Just copies request file. No need to modify .meta file """
+        """ Just copies the request and its meta information """
 
         storage = self.spec.storages.get_run_storage(rid)
-
-        # find req_id and copy the content over to main
-        for testset_name, endpoints in storage.meta['testsets'].items():
-            for endpoint_name, req_ids in endpoints.items():
-                if req_id in req_ids:
-                    _set(self.spec.storages.main.meta,
-                         f'testsets.{testset_name}.{endpoint_name}.{req_id}',
-                         req_ids[req_id]
-                    )
-                    break
-
-
         if not storage.exists(req_id):
             raise FlooterRunError(f'The request {req_id} does not exist for the run {rid}')
 
-        shutil.copy(storage.path(req_id), self.spec.storages.main.path(req_id))
+        # find req_id and copy the content over to main
+        main = self.spec.storages.main
+        codec = main.codec
+        found = storage.meta.find(req_id)
+        if found is not None:
+            testset_name, endpoint_name = found
+            main.meta.add_request(testset_name, endpoint_name, req_id,
+                                  storage.meta.parameters(testset_name, endpoint_name, req_id),
+                                  storage.meta.digests(testset_name, endpoint_name, req_id),
+                                  storage.meta.timing(testset_name, endpoint_name, req_id))
+            codec = self.spec.storages.codec_for(main, endpoint_name)
+
+        main.write(req_id, storage.read(req_id))
+        main.recompress(req_id, codec)
+        main.close()
 
     @_exit_on_exception(FlooterError)
     def run(self, rid: str, req_id: Optional[str]):
@@ -64,6 +98,8 @@ class FlooterAccept(Command):
                     self.accept_run(rid)
                 else:
                     self.accept_request(rid, req_id)
+                # bodies of main which were replaced
+                self.spec.storages.collect_garbage()
 
                 break
 
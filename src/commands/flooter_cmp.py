@@ -1,39 +1,44 @@
 import itertools
+import multiprocessing
 import sys
 import requests
 import difflib
+import zipfile
 
-
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
 from termcolor import colored
-from typing import Dict, Any, Iterable, Iterator, List, Tuple
+from typing import Deque, Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 from errors import FlooterError, FlooterRunError
 
-from util import _get_or, _get, _box, _merge, _exit_on_exception
+from util import _box, _merge, _exit_on_exception, format_seconds
 from commands.command import Command
-from loggers import Logger, bold, color
+from latency import by_endpoint, percentile
+from loggers import BufferedLogger, Logger, TableWriter, bold, color, replay
 from spec.floot_spec import FlootSpec
+from diff.binary_diff import chunk_diff, zip_diff
+from diff.json_diff import JsonDiff
+from diff.text_diff import text_diff
+from spec import record
+from spec.selection import Selection
 from spec.storage import Storage
 
 
-def _split(a: Dict, b: Dict, path: str) -> Tuple[Dict, Dict, Dict]:
-    a_items = _get_or(a, path, T=dict, default=dict())
-    b_items = _get_or(b, path, T=dict, default=dict())
+def _split(a_items: Iterable[str], b_items: Iterable[str]) -> Tuple[Set[str], Set[str], Set[str]]:
+    a_items, b_items = set(a_items), set(b_items)
 
-    a_exclusive= set(a_items.keys()).difference(b_items.keys())
-    b_exclusive= set(b_items.keys()).difference(a_items.keys())
+    a_exclusive= a_items.difference(b_items)
+    b_exclusive= b_items.difference(a_items)
 
     # shared endpoints
-    shared = set(a_items.keys()).intersection(b_items.keys())
+    shared = a_items.intersection(b_items)
 
     return a_exclusive, b_exclusive, shared
 
-def _get_header_info(r: requests.Response) -> List[str]:
-    return [
-        f'Status-Code: {r.status_code}',
-        f'Reason: {r.reason}',
-        f"Content-Type: {r.headers.get('Content-Type', '')}",
-        f"Connection: {r.headers.get('Connection', '')}",
-    ]
+def _media_type(content_type: str) -> str:
+    """ the content type without parameters like the charset """
+    return content_type.split(';')[0].strip().lower()
 
 def _contains_one_of(s: str, l: Iterable[str]) -> bool:
     """
@@ -44,15 +49,72 @@ def _contains_one_of(s: str, l: Iterable[str]) -> bool:
             return True
     return False
 
+JSON_CONTENT_TYPES = ['json']
 TEXT_BASED_CONTENT_TYPES = ['json', 'text']
-SIZE_COMPARABLE_CONTENT_TYPES = ['zip']
+ZIP_CONTENT_TYPES = ['application/zip', 'application/x-zip']
+BINARY_CONTENT_TYPES = ['zip', 'octet-stream', 'pdf', 'image/', 'audio/', 'video/', 'font/', 'protobuf', 'msgpack']
+
+# added to the exit code if an endpoint got slower, 5 means both
+PERF_EXIT_CODE = 4
+
+# the comparison of a worker process
+_worker: Optional['FlooterCompare'] = None
+
+def _init_worker(spec_path: Path, brief: bool) -> None:
+    global _worker
+    # loads the spec and with it the comperators once per worker
+    _worker = FlooterCompare(FlootSpec.load_from_file(spec_path), BufferedLogger(), brief)
+
+def _compare_in_worker(a_name:          str,
+                       b_name:          str,
+                       testset_name:    str,
+                       endpoint_name:   str,
+                       req_id:          str,
+                       comperator_name: Optional[str]
+                       ) -> Tuple[List[Tuple[str, tuple]], int]:
+    """ returns what was written and the exit code """
+    _worker.logger = BufferedLogger()
+    _worker.exit_code = 0
+    _worker.compare_request(a_name, _worker.storage(a_name), b_name, _worker.storage(b_name),
+                            testset_name, endpoint_name, req_id, comperator_name)
+    return _worker.logger.records, _worker.exit_code
 
 class FlooterCompare(Command):
-    def __init__(self, spec: FlootSpec, logger: Logger, brief: bool) -> None:
+    def __init__(self, spec: FlootSpec, logger: Logger, brief: bool, jobs: int = 1, perf: bool = False) -> None:
         self.spec = spec
         self.logger = logger
         self.brief = brief
+        self.jobs = jobs
+        self.perf = perf
         self.exit_code = 0
+        self.storages: Dict[str, Storage] = dict()
+        # testset, endpoint and request id of every request that differs or is missing
+        self.changed: Set[Tuple[str, str, str]] = set()
+        # of the runs which made only a part of the requests
+        self.selections: Tuple[Optional[Selection], Optional[Selection]] = (None, None)
+
+        # comparisons running in worker processes, in the order they are written
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.pending: Deque[Tuple[Tuple[str, str, str], Future]] = deque()
+
+    def storage(self, name: str) -> Storage:
+        """ main or the storage of a run, opened only once """
+        if name not in self.storages:
+            self.storages[name] = (self.spec.storages.main if name == 'main'
+                                   else self.spec.storages.get_run_storage(name))
+        return self.storages[name]
+
+    def _write_result(self, key: Tuple[str, str, str], future: Future) -> None:
+        records, exit_code = future.result()
+        replay(records, self.logger)
+        self.exit_code = max(self.exit_code, exit_code)
+        if exit_code != 0:
+            self.changed.add(key)
+
+    def _drain(self) -> None:
+        """ writes the results of all pending comparisons """
+        while len(self.pending) > 0:
+            self._write_result(*self.pending.popleft())
 
     def cmp_headers(self,
                     a_name: str,                # this is a modifed a_name
@@ -61,16 +123,16 @@ class FlooterCompare(Command):
                     b_resp: requests.Response,
                     ) -> Iterable[str]:
 
-        a_resp_header_fields = _get_header_info(a_resp)
-        b_resp_header_fields = _get_header_info(b_resp)
+        a_resp_header_fields = record.header_info(a_resp)
+        b_resp_header_fields = record.header_info(b_resp)
 
-        return difflib.unified_diff(
+        return [line if line.endswith('\n') else f'{line}\n' for line in difflib.unified_diff(
             a_resp_header_fields,
             b_resp_header_fields,
             fromfile=a_name,
             tofile=b_name,
             n=0                 # no context lines as they are only key value pairs
-        )
+        )]
 
     def cmp_body_text(self,
                       a_name: str,
@@ -79,26 +141,56 @@ class FlooterCompare(Command):
                       b_resp: requests.Response
                       ) -> Iterable[str]:
 
-        return difflib.unified_diff(
+        return text_diff(
             a_resp.content.decode('utf-8').splitlines(),
             b_resp.content.decode('utf-8').splitlines(),
-            fromfile=a_name,
-            tofile=b_name,
+            a_name,
+            b_name,
+            self.spec.compare.text,
         )
 
-    def cmp_body_size(self,
+    def cmp_body_json(self,
                       a_name: str,
                       a_resp: requests.Response,
                       b_name: str,
                       b_resp: requests.Response
                       ) -> Iterable[str]:
-
-        return difflib.unified_diff(
-            [len(a_resp.content)],
-            [len(b_resp.content)],
-            fromfile=a_name,
-            tofile=b_name,
-        )
+        try:
+            a_json, b_json = a_resp.json(), b_resp.json()
+        except ValueError:
+            # not valid json after all
+            return self.cmp_body_text(a_name, a_resp, b_name, b_resp)
+
+        changes = [f'{change}\n' for change in JsonDiff(self.spec.compare.json).diff(a_json, b_json)]
+        if len(changes) == 0:
+            return []
+        return [f'--- {a_name}\n', f'+++ {b_name}\n'] + changes
+
+    def cmp_body_binary(self,
+                        a_name: str,
+                        a_resp: requests.Response,
+                        b_name: str,
+                        b_resp: requests.Response,
+                        is_zip: bool
+                        ) -> Iterable[str]:
+        chunk_size = self.spec.compare.binary.chunk_size
+        changes: List[str] = list()
+
+        if is_zip:
+            try:
+                changes = list(zip_diff(a_resp.iter_content(chunk_size), b_resp.iter_content(chunk_size)))
+                if len(changes) == 0:
+                    # same members, anything else does not matter
+                    return []
+            except zipfile.BadZipFile:
+                # not a valid zip after all
+                pass
+
+        if len(changes) == 0:
+            changes = list(chunk_diff(a_resp.iter_content(chunk_size), b_resp.iter_content(chunk_size), chunk_size))
+            if len(changes) == 0:
+                return []
+        return [f'--- {a_name}\n', f'+++ {b_name}\n'] + [f'{change}\n' for change in changes]
 
     def cmp_body(self,
                  a_name: str,
@@ -107,15 +199,24 @@ class FlooterCompare(Command):
                  b_response: requests.Response
                  ) -> Iterable[str]:
 
-        content_types = [a_response.headers.get('Content-Type'), b_response.headers.get('Content-Type')]
+        content_types = [a_response.headers.get('Content-Type', ''), b_response.headers.get('Content-Type', '')]
+
+        # compare json bodies by their structure
+        if all([_contains_one_of(ct, JSON_CONTENT_TYPES) for ct in content_types]):
+            return self.cmp_body_json(a_name, a_response, b_name, b_response)
 
         # compare text-based bodies if they are both text based
-        if all([_contains_one_of(ct, TEXT_BASED_CONTENT_TYPES) for ct in content_types]):
+        elif all([_contains_one_of(ct, TEXT_BASED_CONTENT_TYPES) for ct in content_types]):
             return self.cmp_body_text(a_name, a_response, b_name, b_response)
 
-        # they can be compared based on their type
-        elif all([_contains_one_of(ct, SIZE_COMPARABLE_CONTENT_TYPES) for ct in content_types]):
-            return self.cmp_body_size(a_name, a_response, b_name, b_response)
+        # compare zip archives by their members
+        elif all([_contains_one_of(ct, ZIP_CONTENT_TYPES) for ct in content_types]):
+            return self.cmp_body_binary(a_name, a_response, b_name, b_response, is_zip=True)
+
+        # compare binary bodies byte wise, also if they are of the same unknown type
+        elif all([_contains_one_of(ct, BINARY_CONTENT_TYPES) for ct in content_types]) or \
+             (content_types[0] != '' and _media_type(content_types[0]) == _media_type(content_types[1])):
+            return self.cmp_body_binary(a_name, a_response, b_name, b_response, is_zip=False)
 
         # cannot compare them because it is not yet defined
         else:
@@ -131,14 +232,22 @@ class FlooterCompare(Command):
                               req_id:        str,
                               is_new:        bool
                               ) -> None:
+        # the other run did not miss the request if it did not select it
+        other_selection = self.selections[0] if is_new else self.selections[1]
+        if other_selection is not None and not other_selection.selects(testset_name, endpoint_name, req_id):
+            return
+
         # whenever something is exclusive it is a change!
         self.exit_code = 1
+        self.changed.add((testset_name, endpoint_name, req_id))
+        # keep the order of the output
+        self._drain()
 
         display_color = 'green' if is_new else 'red'
         self.logger.writeln(colored(name, color=display_color) + f' > {testset_name} > {endpoint_name} > {req_id}')
 
         resp: requests.Response = storage.load(req_id)
-        self.logger.response(resp, _get(storage.meta, f'testsets.{testset_name}.{endpoint_name}.{req_id}.parameters'), self.brief)
+        self.logger.response(resp, storage.meta.parameters(testset_name, endpoint_name, req_id), self.brief)
 
     def cmp_shared_request(self,
                            a_name:          str,
@@ -149,17 +258,50 @@ class FlooterCompare(Command):
                            endpoint_name:   str,
                            req_id:          str
                            ) -> None:
+        # check if a comperator is defined for the endpoint
+        comperator_name = _merge(self.spec.endpoints,
+                                 self.spec.testsets.get(testset_name, {'endpoints': {}}).endpoints
+                                ).get(endpoint_name).comperator
+
+        # the default comperator only looks at the body and the header fields
+        # of the digests, there is nothing to show if they are the same
+        if comperator_name is None:
+            a_digests = a_storage.meta.digests(testset_name, endpoint_name, req_id)
+            if a_digests is not None and a_digests == b_storage.meta.digests(testset_name, endpoint_name, req_id):
+                return
+        # a response which was not modified refers to the record of main
+        elif a_storage.read(req_id) == b_storage.read(req_id):
+            return
+
+        if self.pool is None:
+            self.compare_request(a_name, a_storage, b_name, b_storage,
+                                 testset_name, endpoint_name, req_id, comperator_name)
+            return
+
+        self.pending.append(((testset_name, endpoint_name, req_id),
+                             self.pool.submit(_compare_in_worker, a_name, b_name,
+                                              testset_name, endpoint_name, req_id, comperator_name)))
+        # results are written in order while the workers go on
+        if len(self.pending) > 4 * self.jobs:
+            self._write_result(*self.pending.popleft())
+
+    def compare_request(self,
+                        a_name:          str,
+                        a_storage:       Storage,
+                        b_name:          str,
+                        b_storage:       Storage,
+                        testset_name:    str,
+                        endpoint_name:   str,
+                        req_id:          str,
+                        comperator_name: Optional[str]
+                        ) -> None:
+        """ loads and compares the responses, runs in a worker process with --jobs """
         prompt = f"[{colored(a_name, 'red')} | {colored(b_name, 'green')}] > {testset_name} > {endpoint_name} > {req_id}\n"
 
         a_resp: requests.Response = a_storage.load(req_id)
         b_resp: requests.Response = b_storage.load(req_id)
 
 
-        # check if a comperator is defined for the endpoint
-        comperator_name = _merge(self.spec.endpoints,
-                                 self.spec.testsets.get(testset_name, {'endpoints': {}}).endpoints
-                                ).get(endpoint_name).comperator
-
         # use defualt comperator
         if comperator_name is None:
             # compare headers
@@ -172,6 +314,7 @@ class FlooterCompare(Command):
             # if there is anything to print -> then there was a change
             if len(header_diff) + len(body_diff) > 0:
                 self.exit_code = 1
+                self.changed.add((testset_name, endpoint_name, req_id))
 
         # a specific comperator should be used
         else:
@@ -195,6 +338,8 @@ class FlooterCompare(Command):
                 self.logger.writeln(line)
 
             self.exit_code = 1 if had_changes else self.exit_code
+            if had_changes:
+                self.changed.add((testset_name, endpoint_name, req_id))
 
 
     def cmp_exclusive_endpoint(self,
@@ -204,7 +349,7 @@ class FlooterCompare(Command):
                                endpoint_name:   str,
                                is_new:          bool
                                ) -> None:
-        for req_id in _get(storage.meta, f'testsets.{testset_name}.{endpoint_name}'):
+        for req_id in storage.meta.requests(testset_name, endpoint_name):
             self.cmp_exclusive_request(name, storage, testset_name, endpoint_name, req_id, is_new)
 
     def cmp_shared_endpoint(self,
@@ -215,16 +360,17 @@ class FlooterCompare(Command):
                             testset_name:   str,
                             endpoint_name:  str,
                             ) -> None:
-        x = _split(a_storage.meta, b_storage.meta, f'testsets.{testset_name}.{endpoint_name}')
+        x = _split(a_storage.meta.requests(testset_name, endpoint_name),
+                   b_storage.meta.requests(testset_name, endpoint_name))
         a_exclusive_requests, b_exclusive_requests, shared_requests = x
 
-        for req_id in a_exclusive_requests:
+        for req_id in sorted(a_exclusive_requests):
             self.cmp_exclusive_request(a_name, a_storage, testset_name, endpoint_name, req_id, False)
 
-        for req_id in b_exclusive_requests:
+        for req_id in sorted(b_exclusive_requests):
             self.cmp_exclusive_request(b_name, b_storage, testset_name, endpoint_name, req_id, True)
 
-        for req_id in shared_requests:
+        for req_id in sorted(shared_requests):
             self.cmp_shared_request(
                 a_name,
                 a_storage,
@@ -242,7 +388,7 @@ class FlooterCompare(Command):
                               is_new:          bool        # cmp old new
                               ) -> None:
 
-        for endpoint in _get(storage.meta, f'testsets.{testset_name}'):
+        for endpoint in storage.meta.endpoints(testset_name):
             self.cmp_exclusive_endpoint(name, storage, testset_name, endpoint, is_new)
 
     def cmp_shared_testset(self,
@@ -254,16 +400,16 @@ class FlooterCompare(Command):
                             ) -> None:
 
         # for line length
-        x = _split(a_storage.meta, b_storage.meta, f'testsets.{testset_name}')
+        x = _split(a_storage.meta.endpoints(testset_name), b_storage.meta.endpoints(testset_name))
         a_exclusive_endpoints, b_exclusive_endpoints, shared_endpoints = x
 
-        for endpoint in a_exclusive_endpoints:
+        for endpoint in sorted(a_exclusive_endpoints):
             self.cmp_exclusive_endpoint(a_name, a_storage, testset_name, endpoint, False)
 
-        for endpoint in b_exclusive_endpoints:
+        for endpoint in sorted(b_exclusive_endpoints):
             self.cmp_exclusive_endpoint(b_name, b_storage, testset_name, endpoint, True)
 
-        for endpoint in shared_endpoints:
+        for endpoint in sorted(shared_endpoints):
             self.cmp_shared_endpoint(
                 a_name,
                 a_storage,
@@ -280,18 +426,19 @@ class FlooterCompare(Command):
             b_name:     str,        # b is new
             b_storage:  Storage
             ) -> None:
+        self.selections = (Selection.load(a_storage.meta), Selection.load(b_storage.meta))
 
         # for line length
-        x = _split(a_storage.meta, b_storage.meta, 'testsets')
+        x = _split(a_storage.meta.testsets(), b_storage.meta.testsets())
         a_exclusive_testsets, b_exclusive_testsets, shared_testsets = x
 
-        for testset in a_exclusive_testsets:
+        for testset in sorted(a_exclusive_testsets):
             self.cmp_exclusive_testset(a_name, a_storage, testset, False)
 
-        for testset in b_exclusive_testsets:
+        for testset in sorted(b_exclusive_testsets):
             self.cmp_exclusive_testset(b_name, b_storage, testset, True)
 
-        for testset in shared_testsets:
+        for testset in sorted(shared_testsets):
             self.cmp_shared_testset(
                 a_name,
                 a_storage,
@@ -300,24 +447,85 @@ class FlooterCompare(Command):
                 testset
             )
 
+    def cmp_perf(self,
+                 a_name:     str,        # a is old
+                 a_storage:  Storage,
+                 b_name:     str,        # b is new
+                 b_storage:  Storage
+                 ) -> None:
+        """ compares the latency percentile of every endpoint both runs made requests of """
+        options = self.spec.compare.perf
+        p = options.percentile
+        a_endpoints, _ = by_endpoint(a_storage.meta)
+        b_endpoints, _ = by_endpoint(b_storage.meta)
+        shared = sorted(a_endpoints.keys() & b_endpoints.keys())
+
+        self.logger.it(bold(f'Latency p{p:g}: {a_name} -> {b_name}'))
+        if len(shared) == 0:
+            self.logger.writeln('There are no endpoints with timings in both runs')
+            return
+
+        columns = ['testset', 'endpoint', 'requests', 'old', 'new', 'change', 'result']
+        table = TableWriter(self.logger, columns)
+        regressions = 0
+        for testset_name, endpoint_name in shared:
+            a_timings = a_endpoints[(testset_name, endpoint_name)]
+            b_timings = b_endpoints[(testset_name, endpoint_name)]
+            old = percentile(sorted(t.total for t in a_timings), p)
+            new = percentile(sorted(t.total for t in b_timings), p)
+
+            if min(len(a_timings), len(b_timings)) < options.min_samples:
+                result = 'too few requests'
+            elif options.is_regression(old, new):
+                result = colored('slower', 'red')
+                regressions += 1
+            else:
+                result = 'ok'
+            if self.brief and result == 'ok':
+                continue
+
+            table.row({
+                'testset':  [testset_name],
+                'endpoint': [endpoint_name],
+                'requests': [f'{len(a_timings)} -> {len(b_timings)}'],
+                'old':      [format_seconds(old)],
+                'new':      [format_seconds(new)],
+                'change':   [f'{(new - old) / old:+.1%}' if old > 0 else ''],
+                'result':   [result],
+            })
+        table.close()
+
+        if regressions > 0:
+            self.logger.writeln(f'{regressions} endpoints got slower')
+            self.exit_code |= PERF_EXIT_CODE
+
+    def changed_requests(self, a_name: str, b_name: str) -> Set[Tuple[str, str, str]]:
+        """ the requests that differ or are missing, as testset, endpoint and request id """
+        self.cmp(a_name, self.storage(a_name), b_name, self.storage(b_name))
+        self._drain()
+        return self.changed
+
     @_exit_on_exception(FlooterError)
     def run(self, a: str, b: str, *args, **kwargs):
         self.logger.begin()
 
-        if b is None:
-            self.cmp(
-                'main',
-                self.spec.storages.main,
-                a,
-                self.spec.storages.get_run_storage(a)
-            )
-        else:
-            self.cmp(
-                a,
-                self.spec.storages.get_run_storage(a),
-                b,
-                self.spec.storages.get_run_storage(b)
-            )
-
-        # exit 0 if no difference, exit 1 otherwise
+        # compare a run with main if there is only one run
+        a_name, b_name = ('main', a) if b is None else (a, b)
+
+        if self.jobs > 1:
+            # spawned workers do not inherit the open databases of the storages
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker,
+                                            initargs=(Path(self.spec.spec_path).resolve(), self.brief))
+        try:
+            self.cmp(a_name, self.storage(a_name), b_name, self.storage(b_name))
+            self._drain()
+            if self.perf:
+                self.cmp_perf(a_name, self.storage(a_name), b_name, self.storage(b_name))
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+
+        # exit 0 if no difference, exit 1 otherwise, 4 or 5 if an endpoint got slower
         sys.exit(self.exit_code)
@@ -3,6 +3,7 @@ import sys
 from commands.command import Command
 from loggers import Logger, indent, bold, iterable
 from spec.floot_spec import FlootSpec
+from spec.storage import Storage
 from util import _exit_on_exception
 from errors import FlooterError
 
@@ -20,6 +21,12 @@ class FlooterList(Command):
 
         self.logger.it(bold('List of runs'))
 
-        self.logger.it(indent(iterable(map(lambda x: x[0], ordered_runs))))
+        def describe(rid: str, storage: Storage) -> str:
+            # runs from before there was the flag are complete
+            notes = [note for note, applies in [('incomplete', not storage.meta.get('complete', True)),
+                                                ('partial', 'selection' in storage.meta)] if applies]
+            return f'{rid} ({", ".join(notes)})' if notes else rid
+
+        self.logger.it(indent(iterable(map(lambda x: describe(*x), ordered_runs))))
 
         sys.exit(0)
@@ -0,0 +1,278 @@
+import datetime
+import json
+import sys
+import time
+
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+import requests
+
+from commands.request_command import RequestCommand, enrich_err
+from engines.engine import Engine, PreparedRequest
+from engines.thread_engine import ThreadEngine
+from errors import FlooterError
+from latency import PERCENTILES, Histogram
+from loggers import Logger, TableWriter, bold
+from spec.codecs import CHUNK_SIZE
+from spec.endpoint import Endpoint
+from spec.floot_spec import FlootSpec
+from spec.meta import Timing
+from spec.selection import Selection
+from spec.testset import TestSet
+from util import _coalesce_fns, _exit_on_exception, format_seconds, format_size
+
+
+class _Measured:
+    """ What the requests of an endpoint or of an interval took """
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        # status codes of 400 and above and the names of exceptions
+        self.errors: Counter = Counter()
+        self.failed = 0         # requests without a response
+        self.received = 0
+        self.seconds = 0.0      # the endpoint was running
+
+    @property
+    def requests(self) -> int:
+        return self.latency.count + self.failed
+
+    def record(self, outcome: Union[Timing, str]) -> None:
+        if isinstance(outcome, str):
+            self.failed += 1
+            self.errors[outcome] += 1
+            return
+        self.latency.record(outcome.total)
+        self.received += outcome.received
+        if outcome.status >= 400:
+            self.errors[str(outcome.status)] += 1
+
+    def merge(self, other: '_Measured') -> None:
+        self.latency.merge(other.latency)
+        self.errors.update(other.errors)
+        self.failed += other.failed
+        self.received += other.received
+        self.seconds += other.seconds
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'requests':     self.requests,
+            'errors':       dict(self.errors),
+            'received':     self.received,
+            'seconds':      self.seconds,
+            'latency':      {**{f'p{p}': self.latency.percentile(p) for p in PERCENTILES},
+                             'max': self.latency.max, 'mean': self.latency.mean()},
+            # the highest latency of a bucket and how many requests fell into it
+            'histogram':    [[upper, count] for upper, count in self.latency.buckets()],
+        }
+
+
+class FlooterLoad(RequestCommand):
+    """ Makes the requests of the spec over and over and records what they took, stores nothing """
+    def __init__(self,
+                 spec: FlootSpec,
+                 logger: Logger,
+                 concurrency: int = 1,
+                 engine: Type[Engine] = ThreadEngine,
+                 rate: Optional[float] = None,
+                 iterations: Optional[int] = None,
+                 duration: Optional[float] = None,
+                 interval: float = 10,
+                 output: Optional[Path] = None,
+                 selection: Optional[Selection] = None) -> None:
+        # a single pass over the requests unless told otherwise
+        self.iterations = 1 if iterations is None and duration is None else iterations
+        self.duration = duration
+        self.interval = interval
+        self.output = output
+        super().__init__(spec, logger, concurrency, engine, rate)
+        self.selection = self._check_selection(selection)
+
+        self.endpoints: Dict[Tuple[str, str], _Measured] = dict()
+        self.intervals: List[Dict[str, Any]] = list()
+        self.window = _Measured()
+        self.started = 0.0
+        self.started_at: Optional[datetime.datetime] = None
+        self.window_started = 0.0
+        self.deadline: Optional[float] = None
+
+    def _done(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _until_done(self, combinations: Iterable[List[Tuple[str, Any]]]) -> Iterator[List[Tuple[str, Any]]]:
+        for combination in combinations:
+            if self._done():
+                return
+            yield combination
+
+    def _measure(self, prepared: PreparedRequest, resp: requests.Response) -> Timing:
+        """ reads the body only to drop it, runs on a worker """
+        timing = prepared.timing
+        if prepared.streams(resp.headers):
+            start = time.perf_counter()
+            timing.received = sum(len(chunk) for chunk in resp.iter_content(CHUNK_SIZE))
+            timing.total += time.perf_counter() - start
+        resp.close()
+        return timing
+
+    def _failed(self, prepared: PreparedRequest, err: Exception) -> str:
+        return type(err).__name__
+
+    def _complete_request(self,
+                          testset: TestSet,
+                          prepared: PreparedRequest,
+                          outcome: Union[Timing, str]) -> None:
+        """
+        Is called in the order the requests were prepared and never concurrently
+        """
+        key = (prepared.testset_name, prepared.endpoint_name)
+        if key not in self.endpoints:
+            self.endpoints[key] = _Measured()
+        self.endpoints[key].record(outcome)
+        self.window.record(outcome)
+
+        now = time.monotonic()
+        if now - self.window_started >= self.interval:
+            self._end_interval(now)
+
+        self._after_request(testset, prepared)
+
+    def _end_interval(self, now: float) -> None:
+        window, seconds = self.window, now - self.window_started
+        interval = {
+            'second':       round(self.window_started - self.started, 3),
+            'seconds':      round(seconds, 3),
+            'requests':     window.requests,
+            'errors':       sum(window.errors.values()),
+            'received':     window.received,
+            'p50':          window.latency.percentile(50),
+            'p99':          window.latency.percentile(99),
+            'max':          window.latency.max,
+        }
+        self.intervals.append(interval)
+        self.logger.writeln(f"{interval['second']:>7.0f}s  {window.requests / max(seconds, 1e-9):8.1f} requests/s  "
+                            f"p50 {format_seconds(interval['p50'])}  p99 {format_seconds(interval['p99'])}  "
+                            f"max {format_seconds(interval['max'])}  {interval['errors']} errors")
+        self.window = _Measured()
+        self.window_started = now
+
+    @enrich_err
+    def _run_endpoint(self,
+                      testset_name:     str,
+                      testset:          TestSet,
+                      endpoint_name:    str,
+                      endpoint:         Endpoint
+                      ) -> None:
+        if self._done():
+            return
+        _coalesce_fns(self.spec.hooks.before_endpoint, testset.hooks.before_endpoint)(testset_name, endpoint_name, self.vars)
+
+        runs = self._until_done(self._combinations(testset_name, testset, endpoint_name, endpoint))
+        start = time.monotonic()
+        for _ in self.engine.run(
+            runs,
+            self._scheduler(testset, endpoint),
+            lambda combination: self._prepare_request(testset_name, testset, endpoint_name, endpoint, combination),
+            self._measure,
+            lambda prepared, outcome: self._complete_request(testset, prepared, outcome),
+            self._failed
+        ):
+            pass
+        if (testset_name, endpoint_name) in self.endpoints:
+            self.endpoints[(testset_name, endpoint_name)].seconds += time.monotonic() - start
+
+        _coalesce_fns(self.spec.hooks.after_endpoint, testset.hooks.after_endpoint)(testset_name, endpoint_name, self.vars)
+
+    def _row(self, testset_name: str, endpoint_name: str, measured: _Measured) -> Dict[str, List[str]]:
+        row = {
+            'testset':      [testset_name],
+            'endpoint':     [endpoint_name],
+            'requests':     [str(measured.requests)],
+            'errors':       [str(sum(measured.errors.values()))],
+        }
+        # requests which all failed have no latency
+        latency = measured.latency if measured.latency.count > 0 else None
+        for p in PERCENTILES:
+            row[f'p{p}'] = [format_seconds(latency.percentile(p)) if latency else '']
+        row['max'] = [format_seconds(latency.max) if latency else '']
+        row['mean'] = [format_seconds(latency.mean()) if latency else '']
+        seconds = max(measured.seconds, 1e-9)
+        row['requests/s'] = [f'{measured.requests / seconds:.1f}']
+        row['received/s'] = [format_size(measured.received / seconds)]
+        return row
+
+    def _report(self, seconds: float, iterations: int) -> None:
+        total = _Measured()
+        for measured in self.endpoints.values():
+            total.merge(measured)
+
+        self.logger.it(bold('Latency per endpoint'))
+        columns = ['testset', 'endpoint', 'requests', 'errors'] + [f'p{p}' for p in PERCENTILES] + \
+                  ['max', 'mean', 'requests/s', 'received/s']
+        table = TableWriter(self.logger, columns)
+        for (testset_name, endpoint_name), measured in sorted(self.endpoints.items()):
+            table.row(self._row(testset_name, endpoint_name, measured))
+        table.row(self._row('all', '', total))
+        table.close()
+
+        for (testset_name, endpoint_name), measured in sorted(self.endpoints.items()):
+            if measured.errors:
+                errors = ', '.join(f'{error} x{count}' for error, count in measured.errors.most_common())
+                self.logger.writeln(f'{testset_name} > {endpoint_name}: {errors}')
+
+        stats = self.engine.stats
+        self.logger.writeln(f'Made {total.requests} requests in {seconds:.1f} seconds and {iterations} iterations, '
+                            f'{total.requests / max(seconds, 1e-9):.1f} requests per second')
+        self.logger.writeln(f'Opened {stats.connections} connections, {stats.reused} requests reused a connection')
+
+        if self.output is not None:
+            result = {
+                'started':      self.started_at.isoformat(timespec='seconds'),
+                'seconds':      seconds,
+                'iterations':   iterations,
+                'endpoints':    [{'testset': testset_name, 'endpoint': endpoint_name, **measured.to_json()}
+                                 for (testset_name, endpoint_name), measured in sorted(self.endpoints.items())],
+                'total':        total.to_json(),
+                'intervals':    self.intervals,
+            }
+            with open(self.output, 'wt') as f:
+                json.dump(result, f, indent=2)
+            self.logger.writeln(f'Wrote the results to {self.output}')
+
+    @_exit_on_exception(FlooterError)
+    def run(self):
+        self.logger.begin()
+        _coalesce_fns(self.spec.hooks.before_all)(self.vars)
+
+        self.started = self.window_started = time.monotonic()
+        self.started_at = datetime.datetime.now().astimezone()
+        if self.duration is not None:
+            self.deadline = self.started + self.duration
+
+        iterations = 0
+        try:
+            with self.engine:
+                while not self._done() and (self.iterations is None or iterations < self.iterations):
+                    made = sum(measured.requests for measured in self.endpoints.values())
+                    for name, testset in self.spec.testsets.items():
+                        if self._done():
+                            break
+                        self._run_testset(name, testset)
+                    iterations += 1
+
+                    # the plan may make no requests at all, it would be replayed for nothing
+                    if made == sum(measured.requests for measured in self.endpoints.values()):
+                        self.logger.warn('An iteration made no requests, stopping')
+                        break
+        except KeyboardInterrupt:
+            self.logger.warn('Interrupted, the requests made so far are reported')
+
+        now = time.monotonic()
+        if self.window.requests > 0:
+            self._end_interval(now)
+        self._report(now - self.started, iterations)
+
+        _coalesce_fns(self.spec.hooks.after_all)(self.vars)
+
+        sys.exit(0)
@@ -0,0 +1,41 @@
+import sys
+from typing import Optional
+
+from commands.command import Command
+from errors import FlooterError
+from loggers import Logger
+from spec.floot_spec import FlootSpec
+from spec.storage import Storage
+from util import _exit_on_exception
+
+class FlooterMigrate(Command):
+    """ Rewrites requests that were stored as pickle into records """
+
+    def __init__(self, spec: FlootSpec, logger: Logger) -> None:
+        self.spec = spec
+        self.logger = logger
+
+    def migrate(self, name: str, storage: Storage) -> None:
+        migrated = 0
+        for req_id in storage.list_requests():
+            if storage.is_legacy(req_id):
+                storage.save(req_id, storage.load(req_id))
+                migrated += 1
+
+        self.logger.writeln(f'{name}: migrated {migrated} requests')
+
+    @_exit_on_exception(FlooterError)
+    def run(self, name: Optional[str], *args, **kwargs):
+        self.logger.begin()
+
+        # without a name, main and every run are migrated
+        if name is None or 'main' in name.lower().strip():
+            self.migrate('main', self.spec.storages.main)
+
+        if name is None:
+            for rid in self.spec.storages.list_runs():
+                self.migrate(rid, self.spec.storages.get_run_storage(rid))
+        elif 'main' not in name.lower().strip():
+            self.migrate(name, self.spec.storages.get_run_storage(name))
+
+        sys.exit(0)
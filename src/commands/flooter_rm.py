@@ -5,7 +5,7 @@ from commands.command import Command
 from loggers import Logger
 from spec.floot_spec import FlootSpec
 from errors import FlooterError, FlooterRunError
-from util import _exit_on_exception
+from util import _exit_on_exception, format_size
 
 
 
@@ -34,7 +34,9 @@ class FlooterRm(Command):
 
             # remove if yes
             if user_resp == 'y':
-                self.spec.storages.rm_run(rid)
+                removed, size = self.spec.storages.rm_run(rid)
+                if removed > 0:
+                    sys.stdout.write(f'Removed {removed} bodies no other run refers to, {format_size(size)}\n')
 
             break
 
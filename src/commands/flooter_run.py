@@ -1,136 +1,204 @@
 import sys
-import re
-import urllib.parse
+import json
 import uuid
-import hashlib
-import inspect
+import signal
+import threading
+import time
 
-from typing import Any, Callable, List, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
 
 import requests
 
-from commands.command import Command
-from loggers import Logger
-from spec.strategies import STRATEGY_MAPPING
-from util import _coalesce_fns, _set, _merge, _exit_on_exception
+from commands.flooter_cmp import FlooterCompare
+from commands.request_command import RequestCommand, enrich_err
+from engines.engine import Engine, PreparedRequest
+from engines.thread_engine import ThreadEngine
+from loggers import Logger, NullLogger, TableWriter
+from util import _coalesce_fns, _exit_on_exception
 from spec.floot_spec import FlootSpec
 from spec.endpoint import Endpoint
 from spec.testset import TestSet
+from spec import record
+from spec.meta import Digests
+from spec.selection import Selection
 from errors import FlooterError, FlooterRunError
 
-def enrich_err(func: Callable) -> Callable:
-    """
-    This decorator enriches a FlooterError with the content of parameters
-
-    @enrich_err
-    def x(a_name, a_content, b_name, b_content):
-        raise FlooterError('.... details')
-
-    try:
-        x('A', None, 'b', None)
-    except FlooterError as err:
-        err.message() == 'A > b: .... details
-    """
-    sig = inspect.signature(func)
-    idxs = [idx for idx, name in enumerate(sig.parameters) if name.endswith('_name')]
-
-    def _inner(*args, **kwargs):
-        try:
-            return func(*args, **kwargs)
-        except FlooterError as err:
-            # only enrich if not enriched already
-            if not err.is_enriched:
-                # print what the named params are
-                raise err.enrich(' > '.join([a for idx, a in enumerate(args) if idx in idxs]) + ':')
-            else:
-                raise err
-
-    return _inner
-
-class FlooterRun(Command):
-    TEMPLATE_RE: re.Pattern = re.compile(r'^\{\{(\w+)\}\}$')
-
-    def __init__(self, spec: FlootSpec, logger: Logger) -> None:
-        self.spec = spec
-        self.logger = logger
-        self.run_id = self._generate_run_id()
-        self.run_storage = spec.storages.make_run_storage(self.run_id)
-
-        _set(self.run_storage.meta, 'rid', self.run_id)
-
-        self.vars = dict()
+class FlooterRun(RequestCommand):
+    def __init__(self,
+                 spec: FlootSpec,
+                 logger: Logger,
+                 concurrency: int = 1,
+                 engine: Type[Engine] = ThreadEngine,
+                 rate: Optional[float] = None,
+                 adaptive: bool = False,
+                 resume: Optional[str] = None,
+                 selection: Optional[Selection] = None,
+                 rerun_changed: Optional[str] = None) -> None:
+        super().__init__(spec, logger, concurrency, engine, rate, adaptive)
+        # a resumed run continues in the storage of the interrupted one
+        self.resumed = resume is not None
+        if self.resumed:
+            if selection is not None or rerun_changed is not None:
+                raise FlooterRunError('A resumed run makes the requests of the interrupted run, '
+                                      'it cannot select other requests')
+            self.run_id = resume
+            self.run_storage = self.spec.storages.get_run_storage(self.run_id)
+            if self.run_storage.meta.get('complete', True):
+                raise FlooterRunError(f'The run {self.run_id} was completed, there is nothing to resume')
+            self.selection = Selection.load(self.run_storage.meta)
+        else:
+            self.selection = self._select(selection, rerun_changed)
+            self.run_id = self._generate_run_id()
+            self.run_storage = self.spec.storages.make_run_storage(self.run_id)
+            if self.selection is not None:
+                self.selection.save(self.run_storage.meta)
+
+        self.run_storage.meta['rid'] = self.run_id
+        # set once all requests were made, interrupted runs keep what they stored
+        self.run_storage.meta['complete'] = False
+
+        self.warned_checkpoint = False
+        # testset of a resumed run whose before_testset hook was called before it was interrupted
+        self.restored_testset: Optional[str] = None
+        # responses which were not modified since main
+        self.not_modified = 0
+        self.not_modified_lock = threading.Lock()
+
+    def _select(self, selection: Optional[Selection], rerun_changed: Optional[str]) -> Optional[Selection]:
+        """ checks the selection and narrows it down to the changed requests of the run to rerun """
+        self._check_selection(selection)
+        if rerun_changed is None:
+            return selection
+
+        changed = FlooterCompare(self.spec, NullLogger(), True).changed_requests('main', rerun_changed)
+        rerun = Selection.of_requests(changed)
+        if selection is not None:
+            rerun.testsets = selection.testsets
+            rerun.endpoints = selection.endpoints
+            if selection.request_ids is not None:
+                rerun.request_ids &= selection.request_ids
+        return rerun
 
     def _generate_run_id(self) -> str:
         return str(uuid.uuid4())
 
-    def _generate_request_id(self,
-                             testset_name: str,
-                             endpoint_name: str,
-                             param_combination: List[Tuple[str, Any]]) -> str:
-        hasher = hashlib.sha256()
-        hasher.update(endpoint_name.encode())
-        hasher.update(testset_name.encode())
-        for name, value in param_combination:
-            hasher.update(name.encode())
-            hasher.update(str(value).encode()) # Any to str -> must always be the same
-        return hasher.hexdigest()
-
-    def _encode_param(self, param: Tuple[str, Any]) -> Tuple[str, Any]:
-        return (param[0], urllib.parse.quote_plus(str(param[1])))
-
-    def _enrich(self, name: str) -> str:
-        template_match = FlooterRun.TEMPLATE_RE.match(name)
-
-        if template_match is not None:
-            var_name = template_match.group(1)
-
-            if var_name not in self.vars:
-                self.logger.warn(f'{var_name} is not a known variable!!')
-            return self.vars.get(var_name, '')
-
-        return name
-
-    def _enrich_param(self, param: Tuple[str, str]) -> Tuple[str, str]:
-        return (param[0], self._enrich(param[1]))
-
-    @enrich_err
-    def _run_request(self,
-                     testset_name: str,
-                     testset: TestSet,
-                     endpoint_name: str,
-                     endpoint: Endpoint,
-                     param_combination: List[Tuple[str, str]]):
-
-        before_req_hook = _coalesce_fns(testset.hooks.before_request, self.spec.hooks.before_request)
-        before_req_hook(testset_name, endpoint_name, param_combination, self.vars)
-
-        req_id = self._generate_request_id(testset_name, endpoint_name, param_combination)
-
-        # if a transformer is specified, it must exist!
-        if endpoint.transformer is not None and endpoint.transformer not in self.spec.transformers:
-            raise FlooterRunError(f'uses the {endpoint.transformer} transformer but it was never defiend!')
-        transformer = self.spec.transformers.get(endpoint.transformer, lambda tn, en, resp: resp)
-
-        # do string interpolation
-        param_combination = [self._enrich_param(param) for param in param_combination]
-        interpolated_endpoint_name = '/'.join(map(self._enrich, endpoint_name.split('/')))
-
-        if endpoint.type.lower() == 'get':
-            # make the request
-            resp = requests.get(f'{self.spec.host}/{interpolated_endpoint_name}',
-                                map(self._encode_param, param_combination),
-                                headers={k: self._enrich(v) for k, v in self.spec.request.header.items()}
-                                )
-            # let a defined transformer make changes, defaults to identity function
-            resp = transformer(resp)
+    def _checkpoint(self, testset_name: Optional[str]) -> None:
+        """
+        Saves the variables after the before_all or before_testset hook, so a
+        resumed run can continue with them instead of running the hooks again
+        """
+        try:
+            state = json.loads(json.dumps(self.vars))
+            # tuples or keys which are no strings would not be the same
+            if state != self.vars:
+                state = None
+        except (TypeError, ValueError):
+            state = None
+
+        if state is None and not self.warned_checkpoint:
+            self.logger.warn('The variables cannot be saved as JSON, resuming this run runs all hooks again')
+            self.warned_checkpoint = True
+
+        self.run_storage.meta['checkpoint'] = {'testset': testset_name, 'vars': state}
+        self.run_storage.meta.commit()
+
+    def _filter(self,
+                testset_name: str,
+                endpoint_name: str,
+                combinations: Iterable[List[Tuple[str, Any]]],
+                skipped: List[int]
+                ) -> Iterator[List[Tuple[str, Any]]]:
+        """ leaves out the requests which were not selected and which the resumed run made already """
+        done = set(self.run_storage.meta.requests(testset_name, endpoint_name)) if self.resumed else set()
+        for combination in combinations:
+            req_id = self._generate_request_id(testset_name, endpoint_name, combination)
+            if self.selection is not None and not self.selection.selects(testset_name, endpoint_name, req_id):
+                continue
+            if req_id in done and self.run_storage.exists(req_id):
+                skipped[0] += 1
+                continue
+            yield combination
+
+    def _validators(self, req_id: str) -> Tuple[Dict[str, str], Optional[Digests]]:
+        """
+        The conditional header fields for the response of the request in main
+        and the digests of that response
+        """
+        main = self.spec.storages.main
+        if not main.exists(req_id):
+            return {}, None
+        baseline = main.load(req_id)
+        # objects of transformers and pickled responses of old runs
+        if not isinstance(baseline, record.StoredResponse):
+            return {}, None
+
+        validators = dict()
+        if 'ETag' in baseline.headers:
+            validators['If-None-Match'] = baseline.headers['ETag']
+        if 'Last-Modified' in baseline.headers:
+            validators['If-Modified-Since'] = baseline.headers['Last-Modified']
+        if len(validators) == 0:
+            return {}, None
+        return validators, (baseline.digest, record.header_digest(baseline))
+
+    def _prepare_request(self,
+                         testset_name: str,
+                         testset: TestSet,
+                         endpoint_name: str,
+                         endpoint: Endpoint,
+                         param_combination: List[Tuple[str, str]]) -> PreparedRequest:
+        prepared = super()._prepare_request(testset_name, testset, endpoint_name, endpoint, param_combination)
+        if self.spec.request.conditional:
+            validators, prepared.baseline = self._validators(prepared.req_id)
+            prepared.headers.update(validators)
+        return prepared
+
+    def _store_response(self, prepared: PreparedRequest, resp: requests.Response) -> Digests:
+        """
+        Applies the transformer and saves the response. This may run on a
+        worker thread and therefore must neither touch the variables nor the
+        meta information of the run storage.
+        """
+        # the response in main is still the same, the run refers to its record
+        # and body instead of storing them again
+        if resp.status_code == 304 and prepared.baseline is not None:
+            resp.close()
+            self.run_storage.write(prepared.req_id, bytes(self.spec.storages.main.read(prepared.req_id)))
+            with self.not_modified_lock:
+                self.not_modified += 1
+            return prepared.baseline
+
+        codec = self.spec.storages.codec_for(self.run_storage, prepared.endpoint_name)
+        # large bodies go to the storage while they arrive, the transformer
+        # gets a response which reads its body from there when it is accessed
+        if prepared.streams(resp.headers):
+            start = time.perf_counter()
+            resp, prepared.timing.received = self.run_storage.save_body(resp, codec)
+            prepared.timing.total += time.perf_counter() - start
+
+        # let a defined transformer make changes, defaults to identity function
+        resp = prepared.transformer(prepared.testset_name, prepared.endpoint_name, resp)
+        # save the actual response under the req_id name
+        return self.run_storage.save(prepared.req_id, resp, codec)
+
+    def _complete_request(self,
+                          testset: TestSet,
+                          prepared: PreparedRequest,
+                          stored: Optional[Digests]) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        Is called in the order the requests were prepared and never concurrently
+        """
+        if stored:
             # safe some meta information
-            _set(self.run_storage.meta, f'testsets.{testset_name}.{endpoint_name}.{req_id}.parameters', param_combination)
-            # save the actual response under the req_id name
-            self.run_storage.save(req_id, resp)
+            self.run_storage.meta.add_request(prepared.testset_name,
+                                              prepared.endpoint_name,
+                                              prepared.req_id,
+                                              prepared.params,
+                                              stored,
+                                              prepared.timing)
 
-        after_req_hook = _coalesce_fns(testset.hooks.after_request, self.spec.hooks.after_request)
-        after_req_hook(testset_name, endpoint_name, param_combination, self.vars)
-        return (req_id, param_combination)
+        self._after_request(testset, prepared)
+        return (prepared.req_id, prepared.params)
 
     @enrich_err
     def _run_endpoint(self,
@@ -142,50 +210,47 @@ class FlooterRun(Command):
         self.logger.writeln(f'{testset_name} > {endpoint_name}', ['bold', 'underline'])
         _coalesce_fns(self.spec.hooks.before_endpoint, testset.hooks.before_endpoint)(testset_name, endpoint_name, self.vars)
 
-        avail_params = _merge(self.spec.parameters, testset.parameters, endpoint.parameters)
-
-        # error if a param is used that is not defined
-        ukn_params = [p for p in endpoint.uses if p not in avail_params]
-        if len(ukn_params):
-            raise FlooterRunError(f'Endpoint uses undefined parameters '
-                                  f'{ukn_params} available are {list(avail_params.keys())}')
-
-        # get used params
-        params = {k: v for k, v in avail_params.items() if k in endpoint.uses}
-
-        # generate requests based on strategy
-        strategy = _merge(STRATEGY_MAPPING, self.spec.strategies).get(endpoint.strategy.name)
-        if strategy is None:
-            raise FlooterRunError(f'Strategy {endpoint.strategy} is not known')
-        runs = strategy(testset_name, endpoint_name, self.vars, endpoint.strategy.args, params)
-        requests = [self._run_request(testset_name, testset, endpoint_name, endpoint, combination)
-                    for combination in runs]
-
-        if len(requests) > 0:
-            # generate data for table
-            columns = ['request id'] + endpoint.uses
-            rows = []
-            for rid, params in requests:
-                entry = dict({k: list([]) for k in columns})
-                entry['request id'] = [rid]
-                for name, value in params:
-                    entry[name].append(value)
-                rows.append(entry)
-            self.logger.table(columns, rows)
+        runs = self._combinations(testset_name, testset, endpoint_name, endpoint)
+        skipped = [0]
+        if self.resumed or (self.selection is not None and self.selection.request_ids is not None):
+            runs = self._filter(testset_name, endpoint_name, runs, skipped)
+
+        scheduler = self._scheduler(testset, endpoint)
+
+        requests = self.engine.run(
+            runs,
+            scheduler,
+            lambda combination: self._prepare_request(testset_name, testset, endpoint_name, endpoint, combination),
+            self._store_response,
+            lambda prepared, stored: self._complete_request(testset, prepared, stored)
+        )
+
+        # the table is written while the requests are made, so they are never all in memory
+        columns = ['request id'] + endpoint.uses
+        table = TableWriter(self.logger, columns)
+        made_requests = 0
+        for rid, params in requests:
+            entry = dict({k: list([]) for k in columns})
+            entry['request id'] = [rid]
+            for name, value in params:
+                entry[name].append(value)
+            table.row(entry)
+            made_requests += 1
+        table.close()
+
+        if made_requests > 0:
+            self.logger.writeln(scheduler.describe())
+        if skipped[0] > 0:
+            self.logger.writeln(f'Skipped {skipped[0]} requests which were made before the run was interrupted')
 
         _coalesce_fns(self.spec.hooks.after_endpoint, testset.hooks.after_endpoint)(testset_name, endpoint_name, self.vars)
 
-    @enrich_err
-    def _run_testset(self, testset_name: str, testset: TestSet):
-        _coalesce_fns(testset.hooks.before_testset, self.spec.hooks.before_testset)(testset_name, self.vars)
-
-        # set and/or override endpoints
-        endpoints = _merge(self.spec.endpoints, testset.endpoints)
-
-        for endpoint_name, endpoint in endpoints.items():
-            self._run_endpoint(testset_name, testset, endpoint_name, endpoint)
-
-        _coalesce_fns(testset.hooks.after_testset, self.spec.hooks.after_testset)(testset_name, self.vars)
+    def _before_testset(self, testset_name: str, testset: TestSet) -> None:
+        # the variables of a resumed run are restored from after the hook
+        if testset_name == self.restored_testset:
+            return
+        super()._before_testset(testset_name, testset)
+        self._checkpoint(testset_name)
 
     @_exit_on_exception(FlooterError)
     def run(self):
@@ -195,10 +260,42 @@ class FlooterRun(Command):
 
         self.logger.begin()
 
-        _coalesce_fns(self.spec.hooks.before_all)(self.vars)
+        if self.selection is not None and self.selection.request_ids is not None:
+            self.logger.writeln(f'Selected {len(self.selection.request_ids)} requests')
+
+        testsets = list(self.spec.testsets.items())
+        checkpoint = self.run_storage.meta.get('checkpoint') if self.resumed else None
+        if checkpoint is not None and checkpoint['vars'] is not None:
+            self.vars = checkpoint['vars']
+            self.restored_testset = checkpoint['testset']
+            # the testsets before the one the run was interrupted in are complete
+            if self.restored_testset is not None:
+                names = [name for name, _ in testsets]
+                if self.restored_testset not in names:
+                    raise FlooterRunError(f'The run was interrupted in the testset {self.restored_testset} '
+                                          f'which is not specified anymore')
+                testsets = testsets[names.index(self.restored_testset):]
+        else:
+            _coalesce_fns(self.spec.hooks.before_all)(self.vars)
+            self._checkpoint(None)
+
+        # a cancelled CI job should still keep what was stored so far
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
 
-        for name, testset in self.spec.testsets.items():
-            self._run_testset(name, testset)
+        try:
+            with self.engine:
+                for name, testset in testsets:
+                    self._run_testset(name, testset)
+            self.run_storage.meta['complete'] = True
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            self.run_storage.close()
+
+        stats = self.engine.stats
+        self.logger.writeln(f'Made {stats.requests} requests with {stats.connections} connections, '
+                            f'{stats.reused} requests reused a connection')
+        if self.not_modified > 0:
+            self.logger.writeln(f'{self.not_modified} responses were not modified since main and refer to it')
 
         _coalesce_fns(self.spec.hooks.after_all)(self.vars)
 
@@ -42,16 +42,14 @@ class FlooterShow(Command):
 
         self.logger.writeln(f"Executed at: {storage.meta['created']}")
 
-        for testset_name, endpoints in storage.meta['testsets'].items():
-            for endpoint_name, requests in endpoints.items():
-                for request_id, info in requests.items():
-                    self.logger.it(bold(f'{name} > {testset_name} > {endpoint_name} > {request_id}'))
-
-                    if verbosity >= FlooterShowVerbosity.HEADER:
-                        self.logger.response(storage.load(request_id), info['parameters'],
-                                             brief = verbosity == FlooterShowVerbosity.HEADER
-                                             )
-                        self.logger.writeln('-'*40)
+        for testset_name, endpoint_name, request_id, parameters in storage.meta.iter_requests():
+            self.logger.it(bold(f'{name} > {testset_name} > {endpoint_name} > {request_id}'))
+
+            if verbosity >= FlooterShowVerbosity.HEADER:
+                self.logger.response(storage.load(request_id), parameters,
+                                     brief = verbosity == FlooterShowVerbosity.HEADER
+                                     )
+                self.logger.writeln('-'*40)
 
 
     @_exit_on_exception(FlooterError)
@@ -0,0 +1,104 @@
+import heapq
+import sys
+
+from typing import Dict, List, Sequence, Tuple
+
+from commands.command import Command
+from errors import FlooterError
+from latency import PERCENTILES, by_endpoint, percentile, throughput
+from loggers import Logger, TableWriter, bold
+from spec.floot_spec import FlootSpec
+from spec.meta import Timing
+from spec.storage import Storage
+from util import _exit_on_exception, format_seconds, format_size
+
+class FlooterStats(Command):
+    """
+    Reports the latencies and the throughput of the requests of a run, for
+    every endpoint and for the entire run, and the slowest requests.
+    """
+    def __init__(self, spec: FlootSpec, logger: Logger) -> None:
+        self.spec = spec
+        self.logger = logger
+
+    def _row(self, testset_name: str, endpoint_name: str, timings: Sequence[Timing]) -> Dict[str, List[str]]:
+        totals = sorted(t.total for t in timings)
+        first_bytes = sorted(t.first_byte for t in timings)
+        rates = throughput(timings)
+
+        row = {
+            'testset':          [testset_name],
+            'endpoint':         [endpoint_name],
+            'requests':         [str(len(timings))],
+            'errors':           [str(sum(1 for t in timings if t.status >= 400))],
+        }
+        for p in PERCENTILES:
+            row[f'p{p}'] = [format_seconds(percentile(totals, p))]
+        row['max'] = [format_seconds(totals[-1])]
+        row['first byte p50'] = [format_seconds(percentile(first_bytes, 50))]
+        row['requests/s'] = [f'{rates[0]:.1f}' if rates is not None else '']
+        row['received/s'] = [format_size(rates[1]) if rates is not None else '']
+        return row
+
+    def stats(self, storage: Storage, slowest: int) -> None:
+        self.logger.writeln(f"Executed at: {storage.meta['created']}")
+
+        endpoints, missing = by_endpoint(storage.meta)
+        if missing > 0:
+            self.logger.warn(f'{missing} requests have no timings, they were stored before timings were recorded')
+        if len(endpoints) == 0:
+            self.logger.writeln('There are no timings to report')
+            return
+
+        self.logger.it(bold('Latency per endpoint'))
+        columns = ['testset', 'endpoint', 'requests', 'errors'] + [f'p{p}' for p in PERCENTILES] + \
+                  ['max', 'first byte p50', 'requests/s', 'received/s']
+        table = TableWriter(self.logger, columns)
+        for (testset_name, endpoint_name), timings in endpoints.items():
+            table.row(self._row(testset_name, endpoint_name, timings))
+        table.row(self._row('all', '', [t for timings in endpoints.values() for t in timings]))
+        table.close()
+
+        if slowest <= 0:
+            return
+
+        # the timings do not know their request, they are kept with it
+        slowest_requests: List[Tuple[float, int, str, str, str, Timing]] = list()
+        for count, (testset_name, endpoint_name, req_id, timing) in enumerate(storage.meta.iter_timings()):
+            if timing is None:
+                continue
+            item = (timing.total, count, testset_name, endpoint_name, req_id, timing)
+            if len(slowest_requests) < slowest:
+                heapq.heappush(slowest_requests, item)
+            else:
+                heapq.heappushpop(slowest_requests, item)
+
+        self.logger.it(bold(f'The {len(slowest_requests)} slowest requests'))
+        columns = ['total', 'first byte', 'connect', 'status', 'received', 'testset', 'endpoint', 'request id']
+        table = TableWriter(self.logger, columns)
+        for _, _, testset_name, endpoint_name, req_id, timing in sorted(slowest_requests, reverse=True):
+            table.row({
+                'total':        [format_seconds(timing.total)],
+                'first byte':   [format_seconds(timing.first_byte)],
+                'connect':      [format_seconds(timing.connect) if timing.connect is not None else ''],
+                'status':       [str(timing.status)],
+                'received':     [format_size(timing.received)],
+                'testset':      [testset_name],
+                'endpoint':     [endpoint_name],
+                'request id':   [req_id],
+            })
+        table.close()
+
+    @_exit_on_exception(FlooterError)
+    def run(self,
+            name: str,  # rid or main
+            slowest: int
+            ):
+        self.logger.begin()
+
+        if name == 'main':
+            self.stats(self.spec.storages.main, slowest)
+        else:
+            self.stats(self.spec.storages.get_run_storage(name), slowest)
+
+        sys.exit(0)
@@ -0,0 +1,230 @@
+import abc
+import re
+import fnmatch
+import hashlib
+import inspect
+
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Type
+
+from commands.command import Command
+from engines.engine import Engine, PreparedRequest
+from engines.scheduler import Scheduler, TokenBucket
+from engines.thread_engine import ThreadEngine
+from loggers import Logger
+from spec.strategies import STRATEGY_MAPPING
+from util import _coalesce_fns, _merge
+from spec.floot_spec import FlootSpec
+from spec.endpoint import Endpoint
+from spec.testset import TestSet
+from spec.selection import Selection
+from errors import FlooterError, FlooterRunError
+
+def enrich_err(func: Callable) -> Callable:
+    """
+    This decorator enriches a FlooterError with the content of parameters
+
+    @enrich_err
+    def x(a_name, a_content, b_name, b_content):
+        raise FlooterError('.... details')
+
+    try:
+        x('A', None, 'b', None)
+    except FlooterError as err:
+        err.message() == 'A > b: .... details
+    """
+    sig = inspect.signature(func)
+    idxs = [idx for idx, name in enumerate(sig.parameters) if name.endswith('_name')]
+
+    def _inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except FlooterError as err:
+            # only enrich if not enriched already
+            if not err.is_enriched:
+                # print what the named params are
+                raise err.enrich(' > '.join([a for idx, a in enumerate(args) if idx in idxs]) + ':')
+            else:
+                raise err
+
+    return _inner
+
+class RequestCommand(Command):
+    """
+    Makes the requests the strategies of the spec plan and calls the hooks
+    around them, what happens with the responses is up to the command
+    """
+    TEMPLATE_RE: re.Pattern = re.compile(r'^\{\{(\w+)\}\}$')
+
+    def __init__(self,
+                 spec: FlootSpec,
+                 logger: Logger,
+                 concurrency: int = 1,
+                 engine: Type[Engine] = ThreadEngine,
+                 rate: Optional[float] = None,
+                 adaptive: bool = False) -> None:
+        self.spec = spec
+        self.logger = logger
+        self.concurrency = concurrency
+        self.adaptive = adaptive
+        # shared by all endpoints
+        self.rate_limit = TokenBucket(rate) if rate is not None else None
+
+        # header fields without interpolation are set once for the session
+        static_headers = {k: v for k, v in spec.request.header.items()
+                          if RequestCommand.TEMPLATE_RE.match(v) is None}
+        self.engine = engine(spec.request,
+                             spec.request.pool_size or self._max_concurrency(),
+                             static_headers)
+
+        self.selection: Optional[Selection] = None
+        self.vars = dict()
+
+    def _check_selection(self, selection: Optional[Selection]) -> Optional[Selection]:
+        """ errors if the selection names testsets or endpoints the spec does not have """
+        if selection is not None and selection.testsets is not None:
+            ukn_testsets = sorted(selection.testsets.difference(self.spec.testsets.keys()))
+            if len(ukn_testsets):
+                raise FlooterRunError(f'Selected undefined testsets {ukn_testsets} '
+                                      f'available are {list(self.spec.testsets.keys())}')
+        if selection is not None and selection.endpoints is not None:
+            endpoint_names = {endpoint_name for testset in self.spec.testsets.values()
+                              for endpoint_name in _merge(self.spec.endpoints, testset.endpoints)}
+            for pattern in selection.endpoints:
+                if not any(fnmatch.fnmatchcase(name, pattern) for name in endpoint_names):
+                    raise FlooterRunError(f'No endpoint matches {pattern}, '
+                                          f'available are {sorted(endpoint_names)}')
+        return selection
+
+    def _max_concurrency(self) -> int:
+        concurrencies = [self.concurrency]
+        for testset in self.spec.testsets.values():
+            concurrencies.append(testset.concurrency)
+            concurrencies.extend(e.concurrency for e in _merge(self.spec.endpoints, testset.endpoints).values())
+        return max(c for c in concurrencies if c is not None)
+
+    def _generate_request_id(self,
+                             testset_name: str,
+                             endpoint_name: str,
+                             param_combination: List[Tuple[str, Any]]) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(endpoint_name.encode())
+        hasher.update(testset_name.encode())
+        for name, value in param_combination:
+            hasher.update(name.encode())
+            hasher.update(str(value).encode()) # Any to str -> must always be the same
+        return hasher.hexdigest()
+
+    def _enrich(self, name: str) -> str:
+        template_match = RequestCommand.TEMPLATE_RE.match(name)
+
+        if template_match is not None:
+            var_name = template_match.group(1)
+
+            if var_name not in self.vars:
+                self.logger.warn(f'{var_name} is not a known variable!!')
+            return self.vars.get(var_name, '')
+
+        return name
+
+    def _enrich_param(self, param: Tuple[str, str]) -> Tuple[str, str]:
+        return (param[0], self._enrich(param[1]))
+
+    def _prepare_request(self,
+                         testset_name: str,
+                         testset: TestSet,
+                         endpoint_name: str,
+                         endpoint: Endpoint,
+                         param_combination: List[Tuple[str, str]]) -> PreparedRequest:
+        """
+        Runs the before_request hook and resolves everything that depends on
+        the variables. This happens in order on the calling thread, so the hooks
+        and the interpolation see the variables just like in a sequential run.
+        """
+        before_req_hook = _coalesce_fns(testset.hooks.before_request, self.spec.hooks.before_request)
+        before_req_hook(testset_name, endpoint_name, param_combination, self.vars)
+
+        req_id = self._generate_request_id(testset_name, endpoint_name, param_combination)
+
+        # if a transformer is specified, it must exist!
+        if endpoint.transformer is not None and endpoint.transformer not in self.spec.transformers:
+            raise FlooterRunError(f'uses the {endpoint.transformer} transformer but it was never defiend!')
+        transformer = self.spec.transformers.get(endpoint.transformer, lambda tn, en, resp: resp)
+
+        # do string interpolation
+        param_combination = [self._enrich_param(param) for param in param_combination]
+        interpolated_endpoint_name = '/'.join(map(self._enrich, endpoint_name.split('/')))
+
+        return PreparedRequest(
+            testset_name    = testset_name,
+            endpoint_name   = endpoint_name,
+            req_id          = req_id,
+            method          = endpoint.type.lower(),
+            url             = f'{self.spec.host}/{interpolated_endpoint_name}',
+            params          = param_combination,
+            headers         = {k: self._enrich(v) for k, v in self.spec.request.header.items()
+                               if k not in self.engine.headers},
+            transformer     = transformer,
+            stream_above    = 0 if endpoint.stream else self.spec.request.stream_threshold,
+        )
+
+    def _after_request(self, testset: TestSet, prepared: PreparedRequest) -> None:
+        after_req_hook = _coalesce_fns(testset.hooks.after_request, self.spec.hooks.after_request)
+        after_req_hook(prepared.testset_name, prepared.endpoint_name, prepared.params, self.vars)
+
+    def _combinations(self,
+                      testset_name:     str,
+                      testset:          TestSet,
+                      endpoint_name:    str,
+                      endpoint:         Endpoint
+                      ) -> Iterable[List[Tuple[str, Any]]]:
+        """ the parameter combinations the strategy of the endpoint creates """
+        avail_params = _merge(self.spec.parameters, testset.parameters, endpoint.parameters)
+
+        # error if a param is used that is not defined
+        ukn_params = [p for p in endpoint.uses if p not in avail_params]
+        if len(ukn_params):
+            raise FlooterRunError(f'Endpoint uses undefined parameters '
+                                  f'{ukn_params} available are {list(avail_params.keys())}')
+
+        # get used params
+        params = {k: v for k, v in avail_params.items() if k in endpoint.uses}
+
+        # generate requests based on strategy
+        strategy = _merge(STRATEGY_MAPPING, self.spec.strategies).get(endpoint.strategy.name)
+        if strategy is None:
+            raise FlooterRunError(f'Strategy {endpoint.strategy} is not known')
+        return strategy(testset_name, endpoint_name, self.vars, endpoint.strategy.args, params)
+
+    def _scheduler(self, testset: TestSet, endpoint: Endpoint) -> Scheduler:
+        # the endpoint overrides the testset which overrides the command line
+        concurrency = next(c for c in (endpoint.concurrency, testset.concurrency, self.concurrency) if c is not None)
+        rate_limits = [self.rate_limit, TokenBucket(endpoint.rate) if endpoint.rate is not None else None]
+        return Scheduler(concurrency, [r for r in rate_limits if r is not None], self.adaptive)
+
+    @abc.abstractmethod
+    def _run_endpoint(self,
+                      testset_name:     str,
+                      testset:          TestSet,
+                      endpoint_name:    str,
+                      endpoint:         Endpoint
+                      ) -> None:
+        pass
+
+    def _before_testset(self, testset_name: str, testset: TestSet) -> None:
+        _coalesce_fns(testset.hooks.before_testset, self.spec.hooks.before_testset)(testset_name, self.vars)
+
+    @enrich_err
+    def _run_testset(self, testset_name: str, testset: TestSet) -> None:
+        if self.selection is not None and not self.selection.selects_testset(testset_name):
+            return
+        self._before_testset(testset_name, testset)
+
+        # set and/or override endpoints
+        endpoints = _merge(self.spec.endpoints, testset.endpoints)
+
+        for endpoint_name, endpoint in endpoints.items():
+            if self.selection is not None and not self.selection.selects_endpoint(testset_name, endpoint_name):
+                continue
+            self._run_endpoint(testset_name, testset, endpoint_name, endpoint)
+
+        _coalesce_fns(testset.hooks.after_testset, self.spec.hooks.after_testset)(testset_name, self.vars)
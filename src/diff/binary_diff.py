@@ -0,0 +1,83 @@
+import os
+import tempfile
+import zipfile
+
+from itertools import zip_longest
+from typing import IO, Dict, Iterable, Iterator, Tuple
+
+from util import format_size
+
+# bodies up to this size are kept in memory when they are read as a zip file
+SPOOL_SIZE = 8 << 20
+
+
+def _fixed(chunks: Iterable[bytes], size: int) -> Iterator[bytes]:
+    """ the same bytes in chunks of the size, only the last one may be shorter """
+    buffer = bytearray()
+    for chunk in chunks:
+        if not buffer and len(chunk) == size:
+            yield bytes(chunk)
+            continue
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def chunk_diff(a_chunks: Iterable[bytes], b_chunks: Iterable[bytes], chunk_size: int) -> Iterator[str]:
+    """ yields lines about how the bodies differ, nothing if they are the same """
+    a_size, b_size = 0, 0
+    chunks, changed = 0, 0
+    first = None
+
+    for a, b in zip_longest(_fixed(a_chunks, chunk_size), _fixed(b_chunks, chunk_size), fillvalue=b''):
+        if a != b:
+            if first is None:
+                first = a_size + len(os.path.commonprefix([a, b]))
+            changed += 1
+        chunks += 1
+        a_size += len(a)
+        b_size += len(b)
+
+    if first is None:
+        return
+    if a_size != b_size:
+        yield f'~ size: {a_size} -> {b_size}'
+    yield f'~ first difference at byte {first}'
+    yield f'~ {changed} of {chunks} chunks of {format_size(chunk_size)} differ'
+
+
+def _spool(chunks: Iterable[bytes]) -> IO[bytes]:
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    for chunk in chunks:
+        f.write(chunk)
+    f.seek(0)
+    return f
+
+
+def _members(f: IO[bytes]) -> Dict[str, Tuple[int, int]]:
+    """ name -> crc and size, only the central directory is read """
+    with zipfile.ZipFile(f) as archive:
+        return {info.filename: (info.CRC, info.file_size) for info in archive.infolist()}
+
+
+def zip_diff(a_chunks: Iterable[bytes], b_chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    yields a line for every member that differs, raises zipfile.BadZipFile if a
+    body is not a zip archive
+    """
+    with _spool(a_chunks) as f:
+        a_members = _members(f)
+    with _spool(b_chunks) as f:
+        b_members = _members(f)
+
+    for name in sorted(a_members.keys() | b_members.keys()):
+        if name not in b_members:
+            yield f'- {name}: {format_size(a_members[name][1])}'
+        elif name not in a_members:
+            yield f'+ {name}: {format_size(b_members[name][1])}'
+        elif a_members[name] != b_members[name]:
+            (a_crc, a_size), (b_crc, b_size) = a_members[name], b_members[name]
+            yield f'~ {name}: crc {a_crc:08x} -> {b_crc:08x}, {format_size(a_size)} -> {format_size(b_size)}'
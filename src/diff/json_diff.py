@@ -0,0 +1,180 @@
+import hashlib
+import json
+import math
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from spec.compare import JsonCompare
+
+# longest value that is printed in a change
+MAX_VALUE_LENGTH = 80
+# unmatched items of unordered arrays are paired by comparing each with each,
+# up to this many comparisons
+MAX_PAIRINGS = 10000
+
+_encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+# the encoder of the json module in C, built once instead of for every value
+_c_encoder = json.encoder.c_make_encoder and \
+             json.encoder.c_make_encoder(None, _encoder.default, json.encoder.encode_basestring_ascii, None,
+                                         ':', ',', True, False, True)
+_CONTAINERS = (dict, list)
+# stands for an object or array in the members of an object or array, no scalar is encoded like it
+_NESTED: List[Any] = []
+# starts what is hashed of values that are encoded with all their members
+_WHOLE = b'w'
+
+
+def _encode(value: Any) -> bytes:
+    if _c_encoder is None or not isinstance(value, _CONTAINERS):
+        return _encoder.encode(value).encode('ascii')
+    return ''.join(_c_encoder(value, 0)).encode('ascii')
+
+
+def _is_flat(value: Any) -> bool:
+    """ an object or array of scalars """
+    members = value.values() if isinstance(value, dict) else value
+    return not any(isinstance(member, _CONTAINERS) for member in members)
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _pointer(parent: str, key: Any) -> str:
+    return f"{parent}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _show(value: Any) -> str:
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    if len(text) > MAX_VALUE_LENGTH:
+        return text[:MAX_VALUE_LENGTH - 3] + '...'
+    return text
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class JsonDiff:
+    def __init__(self, options: Optional[JsonCompare] = None) -> None:
+        self.options = options or JsonCompare()
+        self.has_tolerance = self.options.tolerance > 0 or self.options.relative_tolerance > 0
+        # id of an object or array -> its hash, only while both documents of a diff are alive
+        self._hashes: Dict[int, bytes] = dict()
+
+    def diff(self, a: Any, b: Any) -> Iterator[str]:
+        """ yields a line for every change, nothing if the documents are the same """
+        # most documents are the same, which their canonical encodings tell at once
+        if _encode(a) == _encode(b):
+            return
+        self._hashes = dict()
+        try:
+            yield from self._diff(a, b, '')
+        finally:
+            self._hashes = dict()
+
+    def _hash(self, value: Any) -> bytes:
+        """
+        Same hashes mean same values, different hashes may still be the same values
+        like 1 and 1.0. Nested objects and arrays are hashed from their hashes.
+        """
+        if not isinstance(value, _CONTAINERS):
+            return _digest(_encode(value))
+        cached = self._hashes.get(id(value))
+        if cached is not None:
+            return cached
+
+        members = value.values() if isinstance(value, dict) else value
+        if all(_is_flat(member) for member in members if isinstance(member, _CONTAINERS)):
+            digest = _digest(_WHOLE + _encode(value))
+        else:
+            if isinstance(value, dict):
+                nested = [value[key] for key in sorted(value) if isinstance(value[key], _CONTAINERS)]
+                members = {key: _NESTED if isinstance(member, _CONTAINERS) else member
+                           for key, member in value.items()}
+            else:
+                nested = [member for member in value if isinstance(member, _CONTAINERS)]
+                members = [_NESTED if isinstance(member, _CONTAINERS) else member for member in value]
+            digest = _digest(b''.join([_encode(members), *map(self._hash, nested)]))
+        self._hashes[id(value)] = digest
+        return digest
+
+    def _same_number(self, a: Any, b: Any) -> bool:
+        if a == b:
+            return True
+        return self.has_tolerance and math.isclose(a, b,
+                                                   rel_tol=self.options.relative_tolerance,
+                                                   abs_tol=self.options.tolerance)
+
+    def _diff(self, a: Any, b: Any, pointer: str) -> Iterator[str]:
+        if isinstance(a, dict) and isinstance(b, dict):
+            if self._hash(a) == self._hash(b):
+                return
+            for key in sorted(a.keys() | b.keys()):
+                child = _pointer(pointer, key)
+                if key not in b:
+                    yield f'- {child}: {_show(a[key])}'
+                elif key not in a:
+                    yield f'+ {child}: {_show(b[key])}'
+                else:
+                    yield from self._diff(a[key], b[key], child)
+
+        elif isinstance(a, list) and isinstance(b, list):
+            if self.options.is_unordered(pointer):
+                yield from self._diff_unordered(a, b, pointer)
+            elif self._hash(a) != self._hash(b):
+                yield from self._diff_ordered(a, b, pointer)
+
+        elif _is_number(a) and _is_number(b):
+            if not self._same_number(a, b):
+                yield f'~ {pointer or "/"}: {_show(a)} -> {_show(b)}'
+
+        elif type(a) != type(b) or a != b:
+            yield f'~ {pointer or "/"}: {_show(a)} -> {_show(b)}'
+
+    def _diff_ordered(self, a: List, b: List, pointer: str) -> Iterator[str]:
+        for i in range(min(len(a), len(b))):
+            yield from self._diff(a[i], b[i], _pointer(pointer, i))
+        for i in range(len(b), len(a)):
+            yield f'- {_pointer(pointer, i)}: {_show(a[i])}'
+        for i in range(len(a), len(b)):
+            yield f'+ {_pointer(pointer, i)}: {_show(b[i])}'
+
+    def _diff_unordered(self, a: List, b: List, pointer: str) -> Iterator[str]:
+        # items with the same hash are the same, no matter where they are
+        b_by_hash: Dict[bytes, List[int]] = dict()
+        for i, item in enumerate(b):
+            b_by_hash.setdefault(self._hash(item), []).append(i)
+
+        a_left: List[int] = list()
+        for i, item in enumerate(a):
+            same = b_by_hash.get(self._hash(item))
+            if same:
+                same.pop()
+            else:
+                a_left.append(i)
+        b_left = sorted(i for indices in b_by_hash.values() for i in indices)
+
+        # what is left may still be the same, within the tolerance or in
+        # another order of nested unordered arrays
+        if 0 < len(a_left) * len(b_left) <= MAX_PAIRINGS:
+            a_left, b_left = self._pair(a, a_left, b, b_left, pointer)
+
+        for i in a_left:
+            yield f'- {_pointer(pointer, i)}: {_show(a[i])}'
+        for i in b_left:
+            yield f'+ {_pointer(pointer, i)}: {_show(b[i])}'
+
+    def _pair(self,
+              a: List, a_left: List[int],
+              b: List, b_left: List[int],
+              pointer: str) -> Tuple[List[int], List[int]]:
+        unpaired: List[int] = list()
+        for i in a_left:
+            for j in b_left:
+                if next(self._diff(a[i], b[j], _pointer(pointer, i)), None) is None:
+                    b_left.remove(j)
+                    break
+            else:
+                unpaired.append(i)
+        return unpaired, b_left
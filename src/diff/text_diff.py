@@ -0,0 +1,235 @@
+import bisect
+import difflib
+
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from spec.compare import TextCompare
+
+Block = Tuple[int, int, int]
+
+# changed ranges listed in a summary
+SUMMARY_RANGES = 20
+
+
+def _intern(a_lines: Sequence[str], b_lines: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: Dict[str, int] = dict()
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+def _myers(a: List[int], alo: int, ahi: int,
+           b: List[int], blo: int, bhi: int,
+           max_d: int) -> Optional[List[Block]]:
+    """ matching blocks of the shortest edit script, None if it is longer than max_d """
+    n, m = ahi - alo, bhi - blo
+    max_d = min(max_d, n + m)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace: List[List[int]] = list()
+
+    for d in range(max_d + 1):
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, d, n, m, alo, blo)
+    return None
+
+
+def _backtrack(trace: List[List[int]], d: int, x: int, y: int, alo: int, blo: int) -> List[Block]:
+    blocks: List[Block] = list()
+    for d in range(d, -1, -1):
+        # trace[d] holds v of the step before, k from -d-1 to d+1
+        v = trace[d]
+        k = x - y
+        if d == 0:
+            prev_x, prev_y = 0, 0
+        else:
+            if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+                prev_k = k + 1
+            else:
+                prev_k = k - 1
+            prev_x = v[prev_k + d + 1]
+            prev_y = prev_x - prev_k
+        # the snake after the step is a match
+        mid_x, mid_y = (prev_x, prev_y) if d == 0 else ((prev_x, prev_y + 1) if prev_k == k + 1 else (prev_x + 1, prev_y))
+        if x > mid_x:
+            blocks.append((alo + mid_x, blo + mid_y, x - mid_x))
+        x, y = prev_x, prev_y
+    blocks.reverse()
+    return blocks
+
+
+def _anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """ the longest increasing sequence of lines that are unique in both regions """
+    a_count = Counter(a[alo:ahi])
+    b_count = Counter(b[blo:bhi])
+    b_pos = {line: j for j, line in enumerate(b[blo:bhi], blo) if b_count[line] == 1}
+    pairs = [(i, b_pos[line]) for i, line in enumerate(a[alo:ahi], alo)
+             if a_count[line] == 1 and line in b_pos]
+
+    # patience sorting
+    tails: List[int] = list()
+    tail_index: List[int] = list()
+    prev: List[int] = [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(index)
+        else:
+            tails[pos] = j
+            tail_index[pos] = index
+        prev[index] = tail_index[pos - 1] if pos > 0 else -1
+
+    result: List[Tuple[int, int]] = list()
+    index = tail_index[-1] if tail_index else -1
+    while index != -1:
+        result.append(pairs[index])
+        index = prev[index]
+    result.reverse()
+    return result
+
+
+def matching_blocks(a: List[int], b: List[int], max_d: int) -> List[Block]:
+    blocks: List[Block] = list()
+    # regions to compare and matches, in reverse order
+    stack: List[Tuple] = [('region', 0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if item[0] == 'match':
+            blocks.append(item[1:])
+            continue
+
+        _, alo, ahi, blo, bhi = item
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            blocks.append((start, blo - (alo - start), alo - start))
+
+        end = ahi
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        suffix = ('match', ahi, bhi, end - ahi) if end > ahi else None
+
+        if alo < ahi and blo < bhi:
+            anchors = _anchors(a, alo, ahi, b, blo, bhi)
+            if anchors:
+                todo: List[Tuple] = list()
+                i, j = alo, blo
+                for ai, bj in anchors:
+                    todo.append(('region', i, ai, j, bj))
+                    todo.append(('match', ai, bj, 1))
+                    i, j = ai + 1, bj + 1
+                todo.append(('region', i, ahi, j, bhi))
+                if suffix is not None:
+                    todo.append(suffix)
+                stack.extend(reversed(todo))
+                continue
+
+            # treated as replaced if it differs too much
+            blocks.extend(_myers(a, alo, ahi, b, blo, bhi, max_d) or [])
+
+        if suffix is not None:
+            blocks.append(suffix[1:])
+
+    # join adjacent blocks
+    joined: List[Block] = list()
+    for i, j, size in blocks:
+        if size == 0:
+            continue
+        if joined and joined[-1][0] + joined[-1][2] == i and joined[-1][1] + joined[-1][2] == j:
+            joined[-1] = (joined[-1][0], joined[-1][1], joined[-1][2] + size)
+        else:
+            joined.append((i, j, size))
+    joined.append((len(a), len(b), 0))
+    return joined
+
+
+class _Opcodes(difflib.SequenceMatcher):
+    """ lets difflib group opcodes that were not created by difflib """
+    def __init__(self, a: List[int], b: List[int], blocks: List[Block]) -> None:
+        super().__init__(None, a, b, autojunk=False)
+        self.matching_blocks = [difflib.Match(*block) for block in blocks]
+
+
+def _range(start: int, stop: int) -> str:
+    """ range of lines as unified diffs write it """
+    length = stop - start
+    beginning = start + 1
+    if length == 1:
+        return f'{beginning}'
+    if length == 0:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+
+def _unified(a_lines: Sequence[str], b_lines: Sequence[str], opcodes: _Opcodes,
+             a_name: str, b_name: str) -> Iterator[str]:
+    first = True
+    for group in opcodes.get_grouped_opcodes(3):
+        if first:
+            yield f'--- {a_name}\n'
+            yield f'+++ {b_name}\n'
+            first = False
+        i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+        yield f'@@ -{_range(i1, i2)} +{_range(j1, j2)} @@\n'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a_lines[i1:i2]:
+                    yield f' {line}\n'
+                continue
+            for line in a_lines[i1:i2]:
+                yield f'-{line}\n'
+            for line in b_lines[j1:j2]:
+                yield f'+{line}\n'
+
+
+def _summary(opcodes: _Opcodes, a_name: str, b_name: str) -> Iterator[str]:
+    changes = [op for op in opcodes.get_opcodes() if op[0] != 'equal']
+    removed = sum(i2 - i1 for _, i1, i2, _, _ in changes)
+    added = sum(j2 - j1 for _, _, _, j1, j2 in changes)
+
+    yield f'--- {a_name}\n'
+    yield f'+++ {b_name}\n'
+    yield f'@@ too many changes to show: {removed} lines removed and {added} added in {len(changes)} ranges @@\n'
+    for _, i1, i2, j1, j2 in changes[:SUMMARY_RANGES]:
+        yield f'@@ -{_range(i1, i2)} +{_range(j1, j2)} @@\n'
+    if len(changes) > SUMMARY_RANGES:
+        yield f'@@ and {len(changes) - SUMMARY_RANGES} more ranges @@\n'
+
+
+def text_diff(a_lines: Sequence[str],
+              b_lines: Sequence[str],
+              a_name: str,
+              b_name: str,
+              options: Optional[TextCompare] = None) -> List[str]:
+    """ lines of a unified diff, empty if the texts are the same """
+    options = options or TextCompare()
+
+    if len(a_lines) + len(b_lines) <= options.fast_diff_lines:
+        return [line if line.endswith('\n') else f'{line}\n'
+                for line in difflib.unified_diff(a_lines, b_lines, fromfile=a_name, tofile=b_name)]
+
+    a, b = _intern(a_lines, b_lines)
+    opcodes = _Opcodes(a, b, matching_blocks(a, b, options.max_edit_distance))
+
+    diff: List[str] = list()
+    for line in _unified(a_lines, b_lines, opcodes, a_name, b_name):
+        diff.append(line)
+        if len(diff) > options.max_diff_lines:
+            return list(_summary(opcodes, a_name, b_name))
+    return diff
@@ -0,0 +1,218 @@
+import asyncio
+import collections
+import datetime
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Callable, Iterable, Optional, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from engines.engine import Engine, PreparedRequest, Result
+from engines.scheduler import Scheduler
+from errors import FlooterRunError
+from spec.codecs import CHUNK_SIZE
+from spec.meta import Timing
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None
+
+
+def _to_response(resp: 'aiohttp.ClientResponse', body: Union[bytes, IO[bytes]], elapsed: float) -> requests.Response:
+    """
+    Builds a requests.Response so transformers and comperators do not
+    have to care about the engine that made the request. A streamed body is
+    a temporary file, which the response reads like a body that was not
+    downloaded yet.
+    """
+    headers = CaseInsensitiveDict()
+    for name, value in resp.headers.items():
+        # requests joins repeated header fields the same way
+        headers[name] = f'{headers[name]}, {value}' if name in headers else value
+
+    response = requests.Response()
+    response.status_code = resp.status
+    response.reason = resp.reason
+    response.headers = headers
+    response.url = str(resp.url)
+    response.encoding = get_encoding_from_headers(headers)
+    response.elapsed = datetime.timedelta(seconds=elapsed)
+    if isinstance(body, bytes):
+        response._content = body
+        response._content_consumed = True
+    else:
+        response.raw = body
+    return response
+
+
+async def _count(counter: Callable) -> None:
+    counter()
+
+
+async def _connection_started(session, context, params) -> None:
+    context.connect_started = time.perf_counter()
+
+
+async def _connection_created(session, context, params) -> None:
+    # the context of the request the connection was opened for
+    context.trace_request_ctx['connect'] = time.perf_counter() - context.connect_started
+
+
+class AsyncEngine(Engine):
+    """
+    Makes the requests with aiohttp on an event loop. The hooks are synchronous,
+    so they run on a single thread executor which keeps them in order and
+    never concurrent. Transformers and storing run on the default executor.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        if aiohttp is None:
+            raise FlooterRunError('The async engine requires aiohttp to be installed')
+        super().__init__(*args, **kwargs)
+        self.loop = None
+        self.session = None
+        self.hook_executor = None
+
+    def open(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.hook_executor = ThreadPoolExecutor(max_workers=1)
+        self.session = self.loop.run_until_complete(self._open_session())
+
+    def close(self) -> None:
+        self.loop.run_until_complete(self._close_session())
+        self.hook_executor.shutdown()
+        self.loop.close()
+
+    async def _open_session(self) -> 'aiohttp.ClientSession':
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(lambda *_: _count(self.stats.count_request))
+        trace.on_connection_create_end.append(lambda *_: _count(self.stats.count_connection))
+        trace.on_connection_create_start.append(_connection_started)
+        trace.on_connection_create_end.append(_connection_created)
+
+        connector = aiohttp.TCPConnector(limit=self.pool_size,
+                                         force_close=not self.request.keep_alive,
+                                         use_dns_cache=self.request.dns_cache is not None,
+                                         ttl_dns_cache=self.request.dns_cache)
+
+        # the default headers are the ones of requests, so the server sees no difference
+        headers = requests.utils.default_headers()
+        headers.update(self.headers)
+        if not self.request.keep_alive:
+            headers['Connection'] = 'close'
+
+        return aiohttp.ClientSession(connector=connector,
+                                     headers=headers,
+                                     skip_auto_headers=['User-Agent'],
+                                     trace_configs=[trace])
+
+    async def _close_session(self) -> None:
+        # requests that are still pending when a run is aborted
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.session.close()
+
+    async def _spool(self, resp: 'aiohttp.ClientResponse') -> IO[bytes]:
+        """ writes the body to a temporary file while it arrives """
+        f = tempfile.TemporaryFile()
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                await self.loop.run_in_executor(None, f.write, chunk)
+            f.seek(0)
+            return f
+        except BaseException:
+            f.close()
+            raise
+
+    async def _hook(self, func: Callable, *args) -> Any:
+        return await self.loop.run_in_executor(self.hook_executor, func, *args)
+
+    async def _send(self,
+                    scheduler: Scheduler,
+                    slots: asyncio.Condition,
+                    prepared: PreparedRequest,
+                    store: Callable[[PreparedRequest, requests.Response], Any],
+                    failed: Optional[Callable[[PreparedRequest, Exception], Any]]
+                    ) -> Any:
+        async with slots:
+            await slots.wait_for(scheduler.try_acquire)
+        await asyncio.sleep(scheduler.delay())
+
+        sent, start = time.time(), time.perf_counter()
+        status = None
+        error = None
+        trace = dict()
+        try:
+            async with self.session.request(prepared.method,
+                                            yarl.URL(prepared.full_url(), encoded=True),
+                                            headers=prepared.headers,
+                                            trace_request_ctx=trace) as resp:
+                first_byte = time.perf_counter() - start
+                # the size of streamed bodies is known once they are stored
+                if prepared.streams(resp.headers):
+                    body = await self._spool(resp)
+                    received = 0
+                else:
+                    body = await resp.read()
+                    received = len(body)
+            status = resp.status
+        except Exception as err:
+            if failed is None:
+                raise
+            error = err
+        finally:
+            scheduler.release(time.perf_counter() - start, status)
+            async with slots:
+                slots.notify_all()
+        if error is not None:
+            return await self.loop.run_in_executor(None, failed, prepared, error)
+
+        elapsed = time.perf_counter() - start
+        prepared.timing = Timing(sent, elapsed, first_byte, trace.get('connect'), received, status)
+        response = _to_response(resp, body, elapsed)
+
+        return await self.loop.run_in_executor(None, store, prepared, response)
+
+    def run(self,
+            combinations: Iterable[Any],
+            scheduler:    Scheduler,
+            prepare:      Callable[[Any], PreparedRequest],
+            store:        Callable[[PreparedRequest, requests.Response], Any],
+            complete:     Callable[[PreparedRequest, Any], Result],
+            failed:       Optional[Callable[[PreparedRequest, Exception], Any]] = None
+            ) -> Iterable[Result]:
+        # a sequential run must call the after hook before the next before hook
+        max_pending = 1 if scheduler.concurrency == 1 else 2 * scheduler.concurrency
+        slots = asyncio.Condition()
+
+        # the loop only runs while waiting for a hook or a result, pending
+        # requests make progress during that time
+        pending = collections.deque()
+        try:
+            for combination in combinations:
+                prepared = self.loop.run_until_complete(self._hook(prepare, combination))
+                pending.append((prepared, self.loop.create_task(self._send(scheduler, slots, prepared, store, failed))))
+
+                if len(pending) >= max_pending:
+                    prepared, task = pending.popleft()
+                    stored = self.loop.run_until_complete(task)
+                    yield self.loop.run_until_complete(self._hook(complete, prepared, stored))
+
+            while pending:
+                prepared, task = pending.popleft()
+                stored = self.loop.run_until_complete(task)
+                yield self.loop.run_until_complete(self._hook(complete, prepared, stored))
+        finally:
+            # requests still pending when a request failed, only the first error is reported
+            if pending:
+                for _, task in pending:
+                    task.cancel()
+                self.loop.run_until_complete(asyncio.gather(*(task for _, task in pending), return_exceptions=True))
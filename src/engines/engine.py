@@ -0,0 +1,131 @@
+import abc
+import dataclasses
+import threading
+import urllib.parse
+
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, TypeVar
+
+import requests
+
+from engines.scheduler import Scheduler
+from spec.meta import Timing
+from spec.request import Request
+
+Result = TypeVar('Result')
+
+@dataclasses.dataclass
+class PreparedRequest:
+    """
+    Everything needed to make a request, resolved before it is handed to an engine
+    """
+    testset_name:   str
+    endpoint_name:  str
+    req_id:         str
+    method:         str
+    url:            str
+    params:         List[Tuple[str, str]]
+    headers:        Dict[str, str]
+    transformer:    Callable
+    # digests of the response in main, if the request is conditional on it
+    baseline:       Optional[Tuple[str, Optional[str]]] = None
+    # bodies of more bytes are not read into memory, 0 streams all of them
+    stream_above:   Optional[int] = None
+    # set by the engine once the response arrived
+    timing:         Optional[Timing] = None
+
+    def query(self) -> List[Tuple[str, str]]:
+        """ the parameters as they are sent """
+        return [(name, urllib.parse.quote_plus(str(value))) for name, value in self.params]
+
+    def streams(self, headers: Mapping[str, str]) -> bool:
+        """ if the body of the response with these header fields is streamed """
+        if self.stream_above is None:
+            return False
+        length = headers.get('Content-Length')
+        # the size of chunked bodies is not known in advance
+        return length is None or int(length) > self.stream_above
+
+    def full_url(self) -> str:
+        """ the url including the query, encoded the same way requests does it """
+        p = requests.models.PreparedRequest()
+        p.prepare_url(self.url, self.query())
+        return p.url
+
+
+class ConnectionStats:
+    """ Counts the requests and the connections that were opened for them """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        # a thread makes one request at a time, the connection it opened is for that request
+        self.local = threading.local()
+
+    def count_request(self) -> None:
+        with self.lock:
+            self.requests += 1
+
+    def count_connection(self) -> None:
+        with self.lock:
+            self.connections += 1
+
+    def connected(self, seconds: float) -> None:
+        self.local.connect = seconds
+
+    def take_connect(self) -> Optional[float]:
+        """ the seconds the current thread took to open a connection since it was last asked """
+        seconds = getattr(self.local, 'connect', None)
+        self.local.connect = None
+        return seconds
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.connections, 0)
+
+
+class Engine(abc.ABC):
+    """
+    An engine makes the requests of an endpoint. The steps of a single request are:
+        prepare:  runs the before_request hook and resolves the request
+        store:    applies the transformer and saves the response
+        complete: writes the meta information and runs the after_request hook
+
+    prepare and complete are never called concurrently and always in the order
+    of the combinations. The results are returned in that same order. The
+    scheduler decides when a request is actually sent. A request that fails
+    ends the run, unless there is a failed callback which takes the place of
+    store for it.
+    """
+
+    def __init__(self, request: Request, pool_size: int, headers: Dict[str, str]) -> None:
+        """
+        headers are the header fields that are the same for every request
+        """
+        self.request = request
+        self.pool_size = pool_size
+        self.headers = headers
+        self.stats = ConnectionStats()
+
+    def __enter__(self) -> 'Engine':
+        self.open()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def run(self,
+            combinations: Iterable[Any],
+            scheduler:    Scheduler,
+            prepare:      Callable[[Any], PreparedRequest],
+            store:        Callable[[PreparedRequest, requests.Response], Any],
+            complete:     Callable[[PreparedRequest, Any], Result],
+            failed:       Optional[Callable[[PreparedRequest, Exception], Any]] = None
+            ) -> Iterable[Result]:
+        pass
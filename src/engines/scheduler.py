@@ -0,0 +1,119 @@
+import statistics
+import threading
+import time
+
+from typing import List, Optional
+
+class TokenBucket:
+    """
+    Allows rate requests per second. Taking a token never blocks, instead the
+    caller is told how long to wait until the token it took is due.
+    """
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.lock = threading.Lock()
+        # a single token, the requests are spread evenly over a second
+        self.tokens = 1.0
+        self.last = time.monotonic()
+
+    def take(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(1.0, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+
+            # tokens in debt are paid off by waiting
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AdaptiveLimit:
+    """
+    Additive increase, multiplicative decrease of the amount of requests in
+    flight. Starting at one, the limit grows by one for every window of
+    requests that went fine. When too many requests were rejected with
+    429/503 or the median latency doubled compared to the best window,
+    the limit is halved.
+    """
+    OVERLOAD_STATUS = [429, 503]
+    MAX_ERROR_RATE  = 0.05
+    MAX_SLOWDOWN    = 2.0
+    MIN_WINDOW      = 8
+
+    def __init__(self, max_limit: int) -> None:
+        self.max_limit = max_limit
+        self.limit = 1
+        self.baseline: Optional[float] = None
+        self.latencies: List[float] = list()
+        self.errors = 0
+
+    def update(self, latency: float, status: Optional[int]) -> None:
+        self.latencies.append(latency)
+        if status is None or status in AdaptiveLimit.OVERLOAD_STATUS:
+            self.errors += 1
+
+        # judge once per window, a window being about one round of the current limit
+        if len(self.latencies) < max(self.limit, AdaptiveLimit.MIN_WINDOW):
+            return
+
+        median = statistics.median(self.latencies)
+        error_rate = self.errors / len(self.latencies)
+        self.baseline = median if self.baseline is None else min(self.baseline, median)
+
+        if error_rate > AdaptiveLimit.MAX_ERROR_RATE or median > self.baseline * AdaptiveLimit.MAX_SLOWDOWN:
+            self.limit = max(1, self.limit // 2)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+        self.latencies = list()
+        self.errors = 0
+
+
+class Scheduler:
+    """
+    Decides when a request of an endpoint may be sent. A request needs a free
+    slot of the concurrency, which is either fixed or adaptive, and a token of
+    every rate limit.
+    """
+    def __init__(self,
+                 concurrency: int,
+                 buckets: List[TokenBucket],
+                 adaptive: bool = False) -> None:
+        self.concurrency = concurrency
+        self.buckets = buckets
+        self.adaptive = AdaptiveLimit(concurrency) if adaptive else None
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.started = time.monotonic()
+
+    @property
+    def limit(self) -> int:
+        return self.adaptive.limit if self.adaptive is not None else self.concurrency
+
+    def try_acquire(self) -> bool:
+        """ takes a slot if one is free """
+        with self.lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def delay(self) -> float:
+        """ takes a token of every rate limit and returns how long to wait for them """
+        return max([bucket.take() for bucket in self.buckets], default=0.0)
+
+    def release(self, latency: float, status: Optional[int]) -> None:
+        """ frees the slot, a status of None means the request failed """
+        with self.lock:
+            self.in_flight -= 1
+            self.completed += 1
+            if self.adaptive is not None:
+                self.adaptive.update(latency, status)
+
+    def describe(self) -> str:
+        rate = self.completed / max(time.monotonic() - self.started, 1e-9)
+        if self.adaptive is not None:
+            return f'Settled at {self.limit} parallel requests with {rate:.1f} requests per second'
+        return f'Made {rate:.1f} requests per second'
@@ -0,0 +1,111 @@
+import socket
+import threading
+import time
+
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from engines.engine import ConnectionStats
+from spec.request import Request
+
+class DnsCache:
+    """ Remembers resolved addresses for ttl seconds """
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: Dict[Tuple[str, int], Tuple[float, str]] = dict()
+
+    def resolve(self, host: str, port: int) -> str:
+        with self.lock:
+            expires, address = self.entries.get((host, port), (0, None))
+            if expires > time.monotonic():
+                return address
+
+        # resolving can take a while, do not block the others
+        address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+        with self.lock:
+            self.entries[(host, port)] = (time.monotonic() + self.ttl, address)
+        return address
+
+
+def _pool_classes(stats: ConnectionStats, dns_cache: DnsCache) -> Dict[str, type]:
+    """
+    The pools of urllib3 create their connections from a class, this creates
+    the classes that count and time new connections and use the dns cache
+    """
+    def _new_conn(base: type):
+        def _inner(self):
+            stats.count_connection()
+            if dns_cache is None:
+                return base._new_conn(self)
+
+            # only the socket is connected to the address, tls still uses the host name
+            host = self._dns_host
+            self._dns_host = dns_cache.resolve(host, self.port)
+            try:
+                return base._new_conn(self)
+            finally:
+                self._dns_host = host
+        return _inner
+
+    def _connect(base: type):
+        # includes the tls handshake, unlike _new_conn
+        def _inner(self):
+            start = time.perf_counter()
+            try:
+                return base.connect(self)
+            finally:
+                stats.connected(time.perf_counter() - start)
+        return _inner
+
+    http_conn = type('FlooterHTTPConnection', (HTTPConnection,),
+                     {'_new_conn': _new_conn(HTTPConnection), 'connect': _connect(HTTPConnection)})
+    https_conn = type('FlooterHTTPSConnection', (HTTPSConnection,),
+                      {'_new_conn': _new_conn(HTTPSConnection), 'connect': _connect(HTTPSConnection)})
+
+    return {
+        'http':  type('FlooterHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_conn}),
+        'https': type('FlooterHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_conn}),
+    }
+
+
+class FlooterAdapter(HTTPAdapter):
+    def __init__(self, stats: ConnectionStats, dns_cache: DnsCache, **kwargs) -> None:
+        self.stats = stats
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _pool_classes(self.stats, self.dns_cache)
+
+    def send(self, *args, **kwargs) -> requests.Response:
+        self.stats.count_request()
+        return super().send(*args, **kwargs)
+
+
+class FlooterSession(requests.Session):
+    """
+    A session for the host of a spec. The connections are kept in a pool and
+    the header fields that do not need interpolation are set once.
+    """
+    def __init__(self,
+                 request: Request,
+                 pool_size: int,
+                 static_headers: Dict[str, str],
+                 stats: ConnectionStats) -> None:
+        super().__init__()
+
+        adapter = FlooterAdapter(stats,
+                                 DnsCache(request.dns_cache) if request.dns_cache is not None else None,
+                                 pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+        self.headers.update(static_headers)
+        if not request.keep_alive:
+            self.headers['Connection'] = 'close'
@@ -0,0 +1,98 @@
+import collections
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+
+import requests
+
+from engines.engine import Engine, PreparedRequest, Result
+from engines.scheduler import Scheduler
+from engines.session import FlooterSession
+from spec.meta import Timing
+
+class ThreadEngine(Engine):
+    """
+    Makes the requests with requests on a pool of threads. The hooks run on the
+    calling thread.
+    """
+
+    def open(self) -> None:
+        self.session = FlooterSession(self.request, self.pool_size, self.headers, self.stats)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def send(self, prepared: PreparedRequest) -> requests.Response:
+        # a connection opened by an earlier request of this thread does not count
+        self.stats.take_connect()
+        sent, start = time.time(), time.perf_counter()
+        resp = self.session.request(prepared.method,
+                                    prepared.url,
+                                    params=prepared.query(),
+                                    headers=prepared.headers,
+                                    stream=True)
+        first_byte = time.perf_counter() - start
+        # streamed bodies are read while they are stored
+        received = 0
+        if not prepared.streams(resp.headers):
+            received = len(resp.content)
+        prepared.timing = Timing(sent, time.perf_counter() - start, first_byte,
+                                 self.stats.take_connect(), received, resp.status_code)
+        return resp
+
+    def _schedule(self,
+                  scheduler: Scheduler,
+                  slots: threading.Condition,
+                  prepared: PreparedRequest
+                  ) -> requests.Response:
+        with slots:
+            slots.wait_for(scheduler.try_acquire)
+        time.sleep(scheduler.delay())
+
+        start = time.perf_counter()
+        status = None
+        try:
+            resp = self.send(prepared)
+            status = resp.status_code
+            return resp
+        finally:
+            scheduler.release(time.perf_counter() - start, status)
+            with slots:
+                slots.notify_all()
+
+    def run(self,
+            combinations: Iterable[Any],
+            scheduler:    Scheduler,
+            prepare:      Callable[[Any], PreparedRequest],
+            store:        Callable[[PreparedRequest, requests.Response], Any],
+            complete:     Callable[[PreparedRequest, Any], Result],
+            failed:       Optional[Callable[[PreparedRequest, Exception], Any]] = None
+            ) -> Iterable[Result]:
+        # a sequential run must call the after hook before the next before hook
+        max_pending = 1 if scheduler.concurrency == 1 else 2 * scheduler.concurrency
+        slots = threading.Condition()
+
+        def make(prepared: PreparedRequest) -> Any:
+            try:
+                resp = self._schedule(scheduler, slots, prepared)
+            except Exception as err:
+                if failed is None:
+                    raise
+                return failed(prepared, err)
+            return store(prepared, resp)
+
+        with ThreadPoolExecutor(max_workers=scheduler.concurrency) as pool:
+            pending = collections.deque()
+            for combination in combinations:
+                prepared = prepare(combination)
+                pending.append((prepared, pool.submit(make, prepared)))
+
+                if len(pending) >= max_pending:
+                    prepared, future = pending.popleft()
+                    yield complete(prepared, future.result())
+
+            while pending:
+                prepared, future = pending.popleft()
+                yield complete(prepared, future.result())
@@ -0,0 +1,109 @@
+import math
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from spec.meta import Meta, Timing
+
+PERCENTILES = [50, 90, 99]
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """ the nearest rank percentile of sorted values """
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+# latencies are counted in microseconds, exactly up to 2 ** SIGNIFICANT_BITS and
+# above that in buckets whose width is a fixed fraction of their value, so the
+# percentiles of a histogram are off by less than half a percent
+SIGNIFICANT_BITS = 8
+_HALF = 1 << (SIGNIFICANT_BITS - 1)
+
+
+def _bucket(micros: int) -> int:
+    if micros < 2 * _HALF:
+        return micros
+    shift = micros.bit_length() - SIGNIFICANT_BITS
+    return (shift + 1) * _HALF + (micros >> shift) - _HALF
+
+
+def _bounds(bucket: int) -> Tuple[int, int]:
+    """ the lowest and highest microseconds counted in the bucket """
+    if bucket < 2 * _HALF:
+        return bucket, bucket
+    shift = bucket // _HALF - 1
+    mantissa = bucket - shift * _HALF
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """ Counts latencies in seconds, with bounded memory """
+    def __init__(self) -> None:
+        self.counts: Dict[int, int] = dict()
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        bucket = _bucket(max(int(seconds * 1e6), 0))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: 'Histogram') -> None:
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """ the nearest rank percentile, as the middle of its bucket but at most the maximum """
+        if self.count == 0:
+            return 0.0
+        rank = max(math.ceil(p / 100 * self.count), 1)
+        if rank >= self.count:
+            return self.max
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                low, high = _bounds(bucket)
+                return min((low + high) / 2e6, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def buckets(self) -> Iterator[Tuple[float, int]]:
+        """ the highest latency of every bucket that counted any, and its count """
+        for bucket in sorted(self.counts):
+            yield _bounds(bucket)[1] / 1e6, self.counts[bucket]
+
+
+def by_endpoint(meta: Meta) -> Tuple[Dict[Tuple[str, str], List[Timing]], int]:
+    """
+    The timings of every testset and endpoint, and the amount of requests
+    which were stored before there were timings
+    """
+    timings: Dict[Tuple[str, str], List[Timing]] = dict()
+    missing = 0
+    for testset_name, endpoint_name, _, timing in meta.iter_timings():
+        if timing is None:
+            missing += 1
+            continue
+        timings.setdefault((testset_name, endpoint_name), []).append(timing)
+    return timings, missing
+
+
+def throughput(timings: Sequence[Timing]) -> Optional[Tuple[float, float]]:
+    """
+    Requests and bytes per second from the first request being sent until the
+    last one was complete, None if that took no time
+    """
+    span = max(t.sent + t.total for t in timings) - min(t.sent for t in timings)
+    if span <= 0:
+        return None
+    return len(timings) / span, sum(t.received for t in timings) / span
+
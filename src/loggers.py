@@ -2,7 +2,7 @@ import sys
 import requests
 from abc import abstractmethod
 
-from typing import Any, Dict, Iterable, List, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 from termcolor import colored
 
@@ -108,7 +108,7 @@ class Logger:
             self.writeln('-'*(40 + len('BODY')))
 
 
-    def table(self, columns: List[str], rows: List[Dict[str, List[str]]]):
+    def table(self, columns: List[str], rows: Iterable[Dict[str, List[str]]]):
         """
         combination1: {
             application: 1, 2
@@ -116,25 +116,62 @@ class Logger:
         }
         rows is a list of multiValue Dicts
         """
-
+        writer = TableWriter(self, columns)
+        for row in rows:
+            writer.row(row)
+        writer.close()
+
+class TableWriter:
+    """
+    Writes a table while its rows are still created. The width of the columns is
+    taken from the first rows, longer values of later rows widen only their line.
+    """
+    PREFETCH = 100
+
+    def __init__(self, logger: Logger, columns: List[str]):
+        self.logger = logger
+        self.columns = columns
+        self.buffered: List[Dict[str, str]] = list()
+        self.row_fmt: Optional[str] = None
+        self.seperator = ''
+
+    def row(self, row: Dict[str, List[str]]):
         # rewrite rows to be presentable, multimap to single one
-        rows = [dict({k: ', '.join(v) for k, v in row.items()}) for row in rows]
+        row = dict({k: ', '.join(v) for k, v in row.items()})
+
+        if self.row_fmt is not None:
+            self.logger.writeln(self.row_fmt.format(**row))
+            return
+
+        self.buffered.append(row)
+        if len(self.buffered) >= TableWriter.PREFETCH:
+            self._flush()
+
+    def _flush(self):
+        columns = self.columns
+        rows = self.buffered
 
         # find largetst entry for every column
         column_lengths = list(map(lambda col: max(len(col), max(map(len, map(lambda row: row[col], rows)))), columns))
 
-        sperator = '-'*(sum(column_lengths) + (len(columns) * 3) + 3)
+        self.seperator = '-'*(sum(column_lengths) + (len(columns) * 3) + 3)
         header_fmt = '||' + '|'.join(map(lambda cl: ' {:^' + str(cl) + '} ', column_lengths)) + '||'
-        row_fmt = '||' + '|'.join(map(lambda col_w_len: ' {'+col_w_len[0]+':^' + str(col_w_len[1]) + '} ',  zip(columns, column_lengths))) + '||'
+        self.row_fmt = '||' + '|'.join(map(lambda col_w_len: ' {'+col_w_len[0]+':^' + str(col_w_len[1]) + '} ',  zip(columns, column_lengths))) + '||'
 
-        self.writeln(sperator)
-        self.writeln(header_fmt.format(*columns))
-        self.writeln(sperator)
+        self.logger.writeln(self.seperator)
+        self.logger.writeln(header_fmt.format(*columns))
+        self.logger.writeln(self.seperator)
 
         for row in rows:
-            self.writeln(row_fmt.format(**row))
+            self.logger.writeln(self.row_fmt.format(**row))
+        self.buffered = list()
 
-        self.writeln(sperator)
+    def close(self):
+        """ a table without rows is not written at all """
+        if self.row_fmt is None and len(self.buffered) > 0:
+            self._flush()
+        if self.row_fmt is not None:
+            self.logger.writeln(self.seperator)
 
 class StdoutLogger(Logger):
     def __init__(self, no_banner: bool = False):
@@ -153,6 +190,27 @@ class StdoutLogger(Logger):
     def warn(self, msg: str):
         self.writeln(colored(msg, color='yellow'))
 
+class BufferedLogger(Logger):
+    """
+    Records everything that is written, to write it later with another logger.
+    Used by worker processes, the records can be pickled.
+    """
+    def __init__(self):
+        super().__init__(no_banner = True)
+        self.records: List[Tuple[str, tuple]] = list()
+    def write(self, msg, attrs: List[str] = []):
+        self.records.append(('write', (msg, attrs)))
+    def writeln(self, msg, attrs: List[str] = []):
+        self.records.append(('writeln', (msg, attrs)))
+    def it(self, iterable: Iterable[str]):
+        self.records.append(('it', (list(iterable),)))
+    def warn(self, msg: str):
+        self.records.append(('warn', (msg,)))
+
+def replay(records: List[Tuple[str, tuple]], logger: Logger):
+    for method, args in records:
+        getattr(logger, method)(*args)
+
 class NullLogger(Logger):
     def __init__(self, no_banner: bool = False):
         super().__init__(no_banner = no_banner)
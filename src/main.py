@@ -9,11 +9,15 @@ from errors import FlooterError
 
 from util import _exit_on_exception
 from spec.floot_spec import FlootSpec
+from spec.selection import Selection
 from commands.flooter_cmp import FlooterCompare
 from commands.flooter_rm import FlooterRm
 from commands.flooter_accept import FlooterAccept
 from commands.flooter_run import FlooterRun
 from commands.flooter_list import FlooterList
+from commands.flooter_migrate import FlooterMigrate
+from commands.flooter_stats import FlooterStats
+from commands.flooter_load import FlooterLoad
 
 
 from loggers import NullLogger, StdoutLogger, Logger
@@ -22,6 +26,13 @@ LOGGERS = {
     'null': NullLogger
 }
 
+from engines.thread_engine import ThreadEngine
+from engines.async_engine import AsyncEngine
+ENGINES = {
+    'thread': ThreadEngine,
+    'async': AsyncEngine,
+}
+
 def file_path(p: str) -> Path:
     fpath = Path(p)
     if not fpath.exists():
@@ -35,13 +46,51 @@ def dir_path(p: str) -> Path:
     dpath.mkdir(exist_ok=True, parents=True)
     return dpath
 
+def positive_int(v: str) -> int:
+    i = int(v)
+    if i < 1:
+        raise argparse.ArgumentTypeError(f'Expected a positive number but got >{v}<')
+    return i
+
+def positive_float(v: str) -> float:
+    f = float(v)
+    if f <= 0:
+        raise argparse.ArgumentTypeError(f'Expected a positive number but got >{v}<')
+    return f
+
 def add_run_parser(subparsers: argparse._SubParsersAction):
     parser = subparsers.add_parser('run', help='run help')
     parser.add_argument('--id-only', action='store_true')
+    parser.add_argument('--concurrency', type=positive_int, default=1,
+                        help='The amount of requests made in parallel, unless the testset or endpoint overrides it')
+    parser.add_argument('--engine', choices=list(ENGINES), default='thread',
+                        help='Makes the requests on a thread pool or an asyncio event loop')
+    parser.add_argument('--rate', type=positive_float,
+                        help='The maximum amount of requests per second of the entire run')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Adapts the amount of parallel requests to the latency and rejections of the host, '
+                             'the concurrency is the upper bound')
+    parser.add_argument('--resume', type=str, metavar='RID',
+                        help='Continues the interrupted run with this id, the requests it made already are skipped')
+    parser.add_argument('--testset', action='append', metavar='NAME',
+                        help='Runs only this testset, can be given multiple times')
+    parser.add_argument('--endpoint', action='append', metavar='GLOB',
+                        help='Runs only the endpoints matching this pattern, like "project/*", can be given multiple times')
+    parser.add_argument('--request-id', action='append', metavar='ID',
+                        help='Makes only the request with this id, can be given multiple times')
+    parser.add_argument('--rerun-changed', type=str, metavar='RID',
+                        help='Makes only the requests which differ from main or are missing in the run with this id')
     parser.set_defaults(
         func = lambda args: FlooterRun(
             FlootSpec.load_from_file(args.config),
-            NullLogger() if args.id_only else StdoutLogger()
+            NullLogger() if args.id_only else StdoutLogger(),
+            args.concurrency,
+            ENGINES[args.engine],
+            args.rate,
+            args.adaptive,
+            args.resume,
+            Selection.of(args.testset, args.endpoint, args.request_id),
+            args.rerun_changed
             ).run())
 
 def add_list_parser(subparsers: argparse._SubParsersAction):
@@ -58,10 +107,14 @@ def add_rm_parser(subparsers: argparse._SubParsersAction):
 def add_compare_parser(subparsers: argparse._SubParsersAction):
     parser = subparsers.add_parser('cmp', help='cmp help')
     parser.add_argument('--brief', action='store_true')
+    parser.add_argument('--jobs', type=positive_int, default=1,
+                        help='Amount of processes which compare the requests')
+    parser.add_argument('--perf', action='store_true',
+                        help='Also compares the latencies of the endpoints, exits with 4 if one got slower')
     parser.add_argument('a', type=str, help='The id of the run to compare with [main/other run]')
     parser.add_argument('b', type=str, nargs='?', help='The id of the run to compare with')
     parser.set_defaults(
-        func = lambda args: FlooterCompare(FlootSpec.load_from_file(args.config), StdoutLogger(), args.brief).run(args.a, args.b))
+        func = lambda args: FlooterCompare(FlootSpec.load_from_file(args.config), StdoutLogger(), args.brief, args.jobs, args.perf).run(args.a, args.b))
 
 def add_accept_parser(subparsers: argparse._SubParsersAction):
     parser = subparsers.add_parser('accept', help='accept help')
@@ -77,6 +130,54 @@ def add_show_parser(subparsers: argparse._SubParsersAction):
     parser.set_defaults(
         func = lambda args: FlooterShow(FlootSpec.load_from_file(args.config), StdoutLogger()).run(args.id, args.verbosity))
 
+def add_migrate_parser(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser('migrate', help='migrate help')
+    parser.add_argument('id', type=str, nargs='?', help='The id of the run to migrate or "main", all when omitted')
+    parser.set_defaults(
+        func = lambda args: FlooterMigrate(FlootSpec.load_from_file(args.config), StdoutLogger(no_banner=True)).run(args.id))
+
+def add_stats_parser(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser('stats', help='stats help')
+    parser.add_argument('id', type=str, help='The id of the run to report on or "main"')
+    parser.add_argument('--slowest', type=positive_int, default=10, metavar='N',
+                        help='The amount of slowest requests to list')
+    parser.set_defaults(
+        func = lambda args: FlooterStats(FlootSpec.load_from_file(args.config), StdoutLogger()).run(args.id, args.slowest))
+
+def add_load_parser(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser('load', help='load help')
+    parser.add_argument('--concurrency', type=positive_int, default=1,
+                        help='The amount of requests made in parallel, unless the testset or endpoint overrides it')
+    parser.add_argument('--engine', choices=list(ENGINES), default='thread',
+                        help='Makes the requests on a thread pool or an asyncio event loop')
+    parser.add_argument('--rate', type=positive_float,
+                        help='The maximum amount of requests per second')
+    parser.add_argument('--iterations', type=positive_int,
+                        help='How often the requests of the spec are made, once if there is no duration either')
+    parser.add_argument('--duration', type=positive_float, metavar='SECONDS',
+                        help='Makes the requests over and over for this many seconds')
+    parser.add_argument('--interval', type=positive_float, default=10, metavar='SECONDS',
+                        help='The latencies and the throughput are reported after every interval')
+    parser.add_argument('--output', type=Path, metavar='FILE',
+                        help='Writes the histograms and the intervals as JSON to this file')
+    parser.add_argument('--testset', action='append', metavar='NAME',
+                        help='Makes only the requests of this testset, can be given multiple times')
+    parser.add_argument('--endpoint', action='append', metavar='GLOB',
+                        help='Makes only the requests of the endpoints matching this pattern, can be given multiple times')
+    parser.set_defaults(
+        func = lambda args: FlooterLoad(
+            FlootSpec.load_from_file(args.config),
+            StdoutLogger(),
+            args.concurrency,
+            ENGINES[args.engine],
+            args.rate,
+            args.iterations,
+            args.duration,
+            args.interval,
+            args.output,
+            Selection.of(args.testset, args.endpoint)
+            ).run())
+
 
 def main():
     parser = ArgumentParser('Floot')
@@ -94,6 +195,9 @@ def main():
     add_compare_parser(subparsers)
     add_accept_parser(subparsers)
     add_show_parser(subparsers)
+    add_migrate_parser(subparsers)
+    add_stats_parser(subparsers)
+    add_load_parser(subparsers)
 
     args = parser.parse_args()
 
@@ -0,0 +1,97 @@
+import lzma
+import struct
+import zlib
+
+from typing import IO, Callable, Dict, Iterable, Iterator, Tuple
+
+from errors import FlooterRunError
+
+MAGIC = b'\x89FLB'
+# every blob starts with the magic, the id of its codec and the size of the uncompressed content
+_HEADER = struct.Struct('<4sBQ')
+HEADER_SIZE = _HEADER.size
+# also the most that is decompressed at once
+CHUNK_SIZE = 1 << 20
+
+# name -> (id in the header, compressor factory, decompressor factory)
+CODECS: Dict[str, tuple] = {
+    'none': (0, None, None),
+    # fast, good enough for json and text
+    'zlib': (1, lambda: zlib.compressobj(1), zlib.decompressobj),
+    # slow, but about a third smaller than zlib
+    'lzma': (2, lambda: lzma.LZMACompressor(preset=6), lzma.LZMADecompressor),
+}
+CODEC_NAMES = list(CODECS.keys())
+_BY_ID = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+
+def header(codec: str, size: int) -> bytes:
+    return _HEADER.pack(MAGIC, CODECS[codec][0], size)
+
+def parse_header(head: bytes) -> Tuple[str, int]:
+    """ the codec and the size of the content from the first HEADER_SIZE bytes of a blob """
+    if len(head) < HEADER_SIZE or not head.startswith(MAGIC):
+        raise ValueError('it does not start with a blob header')
+    _, codec_id, size = _HEADER.unpack_from(head)
+    if codec_id not in _BY_ID:
+        raise ValueError(f'the codec {codec_id} is unknown')
+    return _BY_ID[codec_id], size
+
+def compress(chunks: Iterable[bytes], codec: str) -> Iterator[bytes]:
+    """ compresses the chunks as a stream, the header is not included """
+    make = CODECS[codec][1]
+    if make is None:
+        yield from chunks
+        return
+
+    compressor = make()
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+def decompress(chunks: Iterable[bytes], codec: str, size: int) -> Iterator[bytes]:
+    """
+    decompresses the chunks as a stream, the header has to be stripped. Raises
+    FlooterRunError if the content does not have the size it was stored with.
+    """
+    produced = 0
+    def checked(out: bytes) -> bytes:
+        nonlocal produced
+        produced += len(out)
+        if produced > size:
+            raise FlooterRunError(f'A blob decompresses to more than the {size} bytes it had, it is corrupt')
+        return out
+
+    make = CODECS[codec][2]
+    if make is None:
+        for chunk in chunks:
+            yield checked(chunk)
+    else:
+        decompressor = make()
+        for chunk in chunks:
+            data = chunk
+            while not decompressor.eof:
+                out = decompressor.decompress(data, CHUNK_SIZE)
+                if out:
+                    yield checked(out)
+                # zlib returns the input it did not get to, lzma keeps it until it is asked again
+                data = getattr(decompressor, 'unconsumed_tail', b'')
+                if not data and len(out) < CHUNK_SIZE and getattr(decompressor, 'needs_input', True):
+                    break
+        # only zlib holds back data until the end
+        flush: Callable[[], bytes] = getattr(decompressor, 'flush', bytes)
+        rest = flush()
+        if rest:
+            yield checked(rest)
+
+    if produced < size:
+        raise FlooterRunError(f'A blob decompresses to {produced} of the {size} bytes it had, it is corrupt')
+
+def read_chunks(f: IO[bytes], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,151 @@
+import dataclasses
+
+from typing import Dict, List, Union
+from pathlib import Path
+
+from errors import FlootSpecSyntaxError
+from util import _get_or, _get_positive_or, _error_if_ukn, _call_if_exists_or
+from spec.spec_item import SpecItem
+
+def _get_non_negative_or(content: Dict, path: str, default: float) -> float:
+    val = _get_or(content, path, default=default, T=(int, float))
+    if val < 0:
+        raise FlootSpecSyntaxError(f'Expected {path} not to be negative')
+    return val
+
+@dataclasses.dataclass(init=False)
+class JsonCompare(SpecItem):
+    ITEMS = ['unordered_arrays', 'tolerance', 'relative_tolerance']
+
+    # all arrays or the JSON pointers of arrays, * matches any key or index
+    unordered_arrays:   Union[bool, List[str]]
+    tolerance:          float   # absolute difference of numbers that is ignored
+    relative_tolerance: float
+
+    def __init__(self, **kwargs) -> None:
+        self.unordered_arrays   = kwargs.get('unordered_arrays',    False)
+        self.tolerance          = kwargs.get('tolerance',           0.0)
+        self.relative_tolerance = kwargs.get('relative_tolerance',  0.0)
+
+    def is_unordered(self, pointer: str) -> bool:
+        if isinstance(self.unordered_arrays, bool):
+            return self.unordered_arrays
+        parts = pointer.split('/')
+        for pattern in self.unordered_arrays:
+            pattern_parts = pattern.split('/')
+            if len(parts) == len(pattern_parts) and \
+               all(p == '*' or p == part for p, part in zip(pattern_parts, parts)):
+                return True
+        return False
+
+    @classmethod
+    def parse(cls, spec_path: Path, content: Dict, path: str) -> 'JsonCompare':
+        _error_if_ukn(content, path, JsonCompare.ITEMS)
+
+        return JsonCompare(unordered_arrays     = _get_or(content, f'{path}.unordered_arrays', T=(bool, list), default=False),
+                           tolerance            = _get_non_negative_or(content, f'{path}.tolerance', 0.0),
+                           relative_tolerance   = _get_non_negative_or(content, f'{path}.relative_tolerance', 0.0))
+
+@dataclasses.dataclass(init=False)
+class TextCompare(SpecItem):
+    ITEMS = ['fast_diff_lines', 'max_diff_lines', 'max_edit_distance']
+
+    fast_diff_lines:    int     # texts with more lines are compared by the fast diff
+    max_diff_lines:     int     # longer diffs are summarized
+    max_edit_distance:  int     # regions of the fast diff with more changes count as replaced
+
+    def __init__(self, **kwargs) -> None:
+        self.fast_diff_lines    = kwargs.get('fast_diff_lines',     10000)
+        self.max_diff_lines     = kwargs.get('max_diff_lines',      2000)
+        self.max_edit_distance  = kwargs.get('max_edit_distance',   1000)
+
+    @classmethod
+    def parse(cls, spec_path: Path, content: Dict, path: str) -> 'TextCompare':
+        _error_if_ukn(content, path, TextCompare.ITEMS)
+
+        return TextCompare(fast_diff_lines      = _get_positive_or(content, f'{path}.fast_diff_lines', default=10000),
+                           max_diff_lines       = _get_positive_or(content, f'{path}.max_diff_lines', default=2000),
+                           max_edit_distance    = _get_positive_or(content, f'{path}.max_edit_distance', default=1000))
+
+@dataclasses.dataclass(init=False)
+class BinaryCompare(SpecItem):
+    ITEMS = ['chunk_size']
+
+    chunk_size: int     # bytes of the chunks binary bodies are compared in
+
+    def __init__(self, **kwargs) -> None:
+        self.chunk_size = kwargs.get('chunk_size', 1 << 16)
+
+    @classmethod
+    def parse(cls, spec_path: Path, content: Dict, path: str) -> 'BinaryCompare':
+        _error_if_ukn(content, path, BinaryCompare.ITEMS)
+
+        return BinaryCompare(chunk_size = _get_positive_or(content, f'{path}.chunk_size', default=1 << 16))
+
+@dataclasses.dataclass(init=False)
+class PerfCompare(SpecItem):
+    ITEMS = ['percentile', 'max_increase', 'min_samples', 'min_difference']
+
+    percentile:     float   # of the latencies that is compared
+    max_increase:   float   # fraction the percentile may grow before it is a regression
+    min_samples:    int     # endpoints with fewer requests in either run are not judged
+    min_difference: float   # seconds the percentile may grow in any case
+
+    def __init__(self, **kwargs) -> None:
+        self.percentile     = kwargs.get('percentile',      95)
+        self.max_increase   = kwargs.get('max_increase',    0.2)
+        self.min_samples    = kwargs.get('min_samples',     30)
+        self.min_difference = kwargs.get('min_difference',  0.01)
+
+    def is_regression(self, old: float, new: float) -> bool:
+        return new - old > max(old * self.max_increase, self.min_difference)
+
+    @classmethod
+    def parse(cls, spec_path: Path, content: Dict, path: str) -> 'PerfCompare':
+        _error_if_ukn(content, path, PerfCompare.ITEMS)
+
+        percentile = _get_or(content, f'{path}.percentile', default=95, T=(int, float))
+        if not 0 < percentile <= 100:
+            raise FlootSpecSyntaxError(f'Expected {path}.percentile to be above 0 and at most 100')
+
+        return PerfCompare(percentile       = percentile,
+                           max_increase     = _get_non_negative_or(content, f'{path}.max_increase', 0.2),
+                           min_samples      = _get_positive_or(content, f'{path}.min_samples', default=30),
+                           min_difference   = _get_non_negative_or(content, f'{path}.min_difference', 0.01))
+
+@dataclasses.dataclass(init=False)
+class Compare(SpecItem):
+    """ options of the default comperator """
+    ITEMS = ['json', 'text', 'binary', 'perf']
+
+    json:   JsonCompare
+    text:   TextCompare
+    binary: BinaryCompare
+    perf:   PerfCompare     # of cmp --perf
+
+    def __init__(self, **kwargs) -> None:
+        self.json = kwargs.get('json', JsonCompare())
+        self.text = kwargs.get('text', TextCompare())
+        self.binary = kwargs.get('binary', BinaryCompare())
+        self.perf = kwargs.get('perf', PerfCompare())
+
+    @classmethod
+    def parse(cls, spec_path: Path, content: Dict, path: str) -> 'Compare':
+        _error_if_ukn(content, path, Compare.ITEMS)
+
+        return Compare(json = _call_if_exists_or(content,
+                                                 f'{path}.json',
+                                                 lambda: JsonCompare.parse(spec_path, content, f'{path}.json'),
+                                                 lambda: JsonCompare()),
+                       text = _call_if_exists_or(content,
+                                                 f'{path}.text',
+                                                 lambda: TextCompare.parse(spec_path, content, f'{path}.text'),
+                                                 lambda: TextCompare()),
+                       binary = _call_if_exists_or(content,
+                                                   f'{path}.binary',
+                                                   lambda: BinaryCompare.parse(spec_path, content, f'{path}.binary'),
+                                                   lambda: BinaryCompare()),
+                       perf = _call_if_exists_or(content,
+                                                 f'{path}.perf',
+                                                 lambda: PerfCompare.parse(spec_path, content, f'{path}.perf'),
+                                                 lambda: PerfCompare()))
@@ -4,7 +4,7 @@ import dataclasses
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from util import _get, _get_or, _call_if_exists_or, _call_if
+from util import _get, _get_or, _get_positive_or, _call_if_exists_or, _call_if
 from errors import FlootSpecSyntaxError
 from spec.strategies import Strategy
 from spec.parameter import Parameters
@@ -13,7 +13,7 @@ from spec.spec_item import SpecItem
 
 @dataclasses.dataclass
 class Endpoint(SpecItem):
-    ITEM_NAMES = ['transformer', 'comperator', 'uses', 'strategy', 'parameters']
+    ITEM_NAMES = ['transformer', 'comperator', 'uses', 'strategy', 'parameters', 'concurrency', 'rate', 'stream']
 
     strategy:       Strategy
     transformer:    Optional[str]
@@ -21,6 +21,9 @@ class Endpoint(SpecItem):
     comperator:     Optional[str]
     uses:           Optional[List[str]]
     parameters:     Optional[Parameters]
+    concurrency:    Optional[int]
+    rate:           Optional[float]
+    stream:         bool            # writes the bodies to the storage while they arrive
 
     @classmethod
     def parse(cls, spec_path: Path, content: Dict, path: str) -> 'Endpoint':
@@ -50,7 +53,10 @@ class Endpoint(SpecItem):
                                                         ),
                         parameters  =_call_if(content,
                                               f'{path}.parameters',
-                                              lambda: Parameters.parse(spec_path, content, f'{path}.parameters')))
+                                              lambda: Parameters.parse(spec_path, content, f'{path}.parameters')),
+                        concurrency =_get_positive_or(content, f'{path}.concurrency'),
+                        rate        =_get_positive_or(content, f'{path}.rate', T=(int, float)),
+                        stream      =_get_or(content, f'{path}.stream', T=bool, default=False))
 
 class Endpoints(dict):
     @classmethod
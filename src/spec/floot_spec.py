@@ -12,6 +12,7 @@ from spec.function_mapper import FunctionMapper
 from spec.endpoint import Endpoints
 from spec.parameter import Parameters
 from spec.storage import Storages
+from spec.compare import Compare
 
 @dataclasses.dataclass
 class FlootSpec:
@@ -26,6 +27,7 @@ class FlootSpec:
     comperators:    Optional[FunctionMapper]
     endpoints:      Optional[Endpoints]
     parameters:     Optional[Parameters]
+    compare:        Compare
 
     @classmethod
     def load_from_file(cls, spec_path: Path) -> 'FlootSpec':
@@ -73,5 +75,10 @@ class FlootSpec:
                                                 lambda: Parameters.parse(spec_path, content, 'parameters'),
                                                 lambda: Parameters()
                                                 ),
+                compare     =_call_if_exists_or(content,
+                                                'compare',
+                                                lambda: Compare.parse(spec_path, content, 'compare'),
+                                                lambda: Compare()
+                                                ),
             )
 
@@ -10,7 +10,7 @@ from spec.spec_item import SpecItem
 
 @dataclasses.dataclass(init=False)
 class Hooks(SpecItem):
-    ITEMS = ['before_all', 'before_testset', 'before_each', 'after_each', 'after_testset', 'after_all', 'source']
+    ITEMS = ['before_all', 'before_testset', 'before_endpoint', 'before_request', 'after_request', 'after_endpoint', 'after_testset', 'after_all', 'source']
     before_all:         Optional[Callable]
     before_testset:     Optional[Callable]
     before_endpoint:    Optional[Callable]
@@ -0,0 +1,253 @@
+import dataclasses
+import datetime
+import json
+import sqlite3
+import time
+import yaml
+
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    name        TEXT PRIMARY KEY,
+    value       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS requests (
+    id          INTEGER PRIMARY KEY,
+    testset     TEXT NOT NULL,
+    endpoint    TEXT NOT NULL,
+    req_id      TEXT NOT NULL,
+    body_digest     TEXT,
+    header_digest   TEXT,
+    UNIQUE (testset, endpoint, req_id)
+);
+CREATE INDEX IF NOT EXISTS requests_by_req_id ON requests (req_id);
+CREATE TABLE IF NOT EXISTS parameters (
+    request     INTEGER NOT NULL REFERENCES requests (id) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,
+    name        TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    PRIMARY KEY (request, position)
+);
+CREATE TABLE IF NOT EXISTS timings (
+    request     INTEGER PRIMARY KEY REFERENCES requests (id) ON DELETE CASCADE,
+    sent        REAL NOT NULL,
+    total       REAL NOT NULL,
+    first_byte  REAL NOT NULL,
+    connect     REAL,
+    received    INTEGER NOT NULL,
+    status      INTEGER NOT NULL
+);
+"""
+
+# added requests are committed after this many requests or seconds
+COMMIT_EVERY    = 100
+COMMIT_INTERVAL = 1.0
+
+Parameters = List[Tuple[str, Any]]
+# of the body and of the compared header fields
+Digests = Tuple[str, Optional[str]]
+
+
+@dataclasses.dataclass
+class Timing:
+    """ How long a request took, in seconds """
+    sent:       float           # seconds since the epoch
+    total:      float           # until the body was received, or stored if it was streamed
+    first_byte: float           # until the header was received
+    connect:    Optional[float] # opening a new connection, None if one was reused
+    received:   int             # bytes of the body
+    status:     int
+
+
+class Meta:
+    """
+    The properties of a storage and the testset, endpoint and parameters of every
+    request. Storages from before are converted from their .meta YAML file.
+    """
+    FILE        = '.meta.db'
+    LEGACY_FILE = '.meta'
+
+    def __init__(self, base_dir: Path) -> None:
+        self.path = Path(base_dir, self.FILE)
+        is_new = not self.path.is_file()
+
+        # requests are completed one after the other, but maybe not on the
+        # thread which opened the storage
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        # a commit is durable once the log is synced at a checkpoint, an
+        # interrupted process does not lose it though
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+        if is_new:
+            legacy = Path(base_dir, self.LEGACY_FILE)
+            if legacy.is_file():
+                self._import_legacy(legacy)
+            if 'created' not in self:
+                self['created'] = datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+            self.commit()
+
+    def _import_legacy(self, p: Path) -> None:
+        with open(p, 'rt') as f:
+            content = yaml.load(f, Loader=yaml.FullLoader) or {}
+
+        for testset_name, endpoints in (content.pop('testsets', None) or {}).items():
+            for endpoint_name, req_ids in endpoints.items():
+                for req_id, info in req_ids.items():
+                    self.add_request(testset_name, endpoint_name, req_id, info.get('parameters', []))
+        for name, value in content.items():
+            self[name] = value
+
+    # properties of the storage
+
+    def __getitem__(self, name: str) -> Any:
+        row = self.conn.execute('SELECT value FROM properties WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self.conn.execute('INSERT OR REPLACE INTO properties (name, value) VALUES (?, ?)',
+                          (name, json.dumps(value)))
+
+    def __contains__(self, name: str) -> bool:
+        return self.conn.execute('SELECT 1 FROM properties WHERE name = ?', (name,)).fetchone() is not None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self[name] if name in self else default
+
+    # requests
+
+    def add_request(self,
+                    testset_name: str,
+                    endpoint_name: str,
+                    req_id: str,
+                    parameters: Parameters,
+                    digests: Optional[Digests] = None,
+                    timing: Optional[Timing] = None) -> None:
+        body_digest, header_digest = digests or (None, None)
+        cur = self.conn.execute('INSERT OR REPLACE INTO requests (testset, endpoint, req_id, body_digest, header_digest) '
+                                'VALUES (?, ?, ?, ?, ?)',
+                                (testset_name, endpoint_name, req_id, body_digest, header_digest))
+        self.conn.executemany('INSERT INTO parameters (request, position, name, value) VALUES (?, ?, ?, ?)',
+                              ((cur.lastrowid, i, name, json.dumps(value))
+                               for i, (name, value) in enumerate(parameters)))
+        if timing is not None:
+            self.conn.execute('INSERT OR REPLACE INTO timings (request, sent, total, first_byte, connect, received, status) '
+                              'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                              (cur.lastrowid, *dataclasses.astuple(timing)))
+
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY or time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+            self.commit()
+
+    def remove_request(self, testset_name: str, endpoint_name: str, req_id: str) -> None:
+        self.conn.execute('DELETE FROM requests WHERE testset = ? AND endpoint = ? AND req_id = ?',
+                          (testset_name, endpoint_name, req_id))
+
+    def testsets(self) -> List[str]:
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT testset FROM requests ORDER BY testset')]
+
+    def endpoints(self, testset_name: str) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            'SELECT DISTINCT endpoint FROM requests WHERE testset = ? ORDER BY endpoint', (testset_name,))]
+
+    def requests(self, testset_name: str, endpoint_name: str) -> List[str]:
+        """ the request ids in the order they were made """
+        return [row[0] for row in self.conn.execute(
+            'SELECT req_id FROM requests WHERE testset = ? AND endpoint = ? ORDER BY id',
+            (testset_name, endpoint_name))]
+
+    def parameters(self, testset_name: str, endpoint_name: str, req_id: str) -> Parameters:
+        return [(name, json.loads(value)) for name, value in self.conn.execute(
+            'SELECT p.name, p.value FROM parameters p JOIN requests r ON p.request = r.id '
+            'WHERE r.testset = ? AND r.endpoint = ? AND r.req_id = ? ORDER BY p.position',
+            (testset_name, endpoint_name, req_id))]
+
+    def digests(self, testset_name: str, endpoint_name: str, req_id: str) -> Optional[Digests]:
+        """ None for requests that were stored before there were digests """
+        row = self.conn.execute('SELECT body_digest, header_digest FROM requests '
+                                'WHERE testset = ? AND endpoint = ? AND req_id = ?',
+                                (testset_name, endpoint_name, req_id)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return tuple(row)
+
+    def timing(self, testset_name: str, endpoint_name: str, req_id: str) -> Optional[Timing]:
+        """ None for requests that were stored before there were timings """
+        row = self.conn.execute('SELECT t.sent, t.total, t.first_byte, t.connect, t.received, t.status '
+                                'FROM timings t JOIN requests r ON t.request = r.id '
+                                'WHERE r.testset = ? AND r.endpoint = ? AND r.req_id = ?',
+                                (testset_name, endpoint_name, req_id)).fetchone()
+        return Timing(*row) if row is not None else None
+
+    def iter_timings(self) -> Iterator[Tuple[str, str, str, Optional[Timing]]]:
+        """ the timing of every request, grouped by testset and endpoint """
+        rows = self.conn.execute(
+            'SELECT r.testset, r.endpoint, r.req_id, t.sent, t.total, t.first_byte, t.connect, t.received, t.status '
+            'FROM requests r LEFT JOIN timings t ON t.request = r.id ORDER BY r.testset, r.endpoint, r.id')
+        for testset_name, endpoint_name, req_id, *timing in rows:
+            yield testset_name, endpoint_name, req_id, Timing(*timing) if timing[0] is not None else None
+
+    def find(self, req_id: str) -> Optional[Tuple[str, str]]:
+        """ the testset and endpoint of the request """
+        return self.conn.execute('SELECT testset, endpoint FROM requests WHERE req_id = ?', (req_id,)).fetchone()
+
+    def iter_requests(self) -> Iterator[Tuple[str, str, str, Parameters]]:
+        """ every request as testset, endpoint, request id and parameters, grouped by testset and endpoint """
+        rows = self.conn.execute(
+            'SELECT r.testset, r.endpoint, r.req_id, p.name, p.value FROM requests r '
+            'LEFT JOIN parameters p ON p.request = r.id ORDER BY r.testset, r.endpoint, r.id, p.position')
+
+        current, parameters = None, []
+        for testset_name, endpoint_name, req_id, name, value in rows:
+            if current != (testset_name, endpoint_name, req_id):
+                if current is not None:
+                    yield (*current, parameters)
+                current, parameters = (testset_name, endpoint_name, req_id), []
+            if name is not None:
+                parameters.append((name, json.loads(value)))
+        if current is not None:
+            yield (*current, parameters)
+
+    def replace_with(self, other: 'Meta') -> None:
+        """ makes this the same as the other meta information """
+        self.commit()
+        other.commit()
+        self.conn.execute('ATTACH DATABASE ? AS other', (str(other.path),))
+        try:
+            for table in ['properties', 'requests', 'parameters', 'timings']:
+                self.conn.execute(f'DELETE FROM main.{table}')
+                self.conn.execute(f'INSERT INTO main.{table} SELECT * FROM other.{table}')
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.execute('DETACH DATABASE other')
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.commit()
+            # compacts the log into the database
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self.conn.close()
+            self.conn = None
+
+    def __del__(self):
+        # requests of storages that are not closed must not be lost
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -4,7 +4,7 @@ import dataclasses
 import itertools
 from pathlib import Path
 
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
 
 from util import _get, _get_or
 from errors import FlootSpecSyntaxError
@@ -31,12 +31,13 @@ class Parameter(SpecItem):
             max_occurrence=max_o,
         )
 
-    def get_combinations(self) -> List[List[Tuple[str, str]]]:
-        combinations = itertools.chain.from_iterable(
-            itertools.product(map(str, self.values), repeat=i)
+    def get_combinations(self) -> Iterable[Tuple[str, ...]]:
+        """ every way the values can occur, created lazily """
+        values = list(map(str, self.values))
+        return itertools.chain.from_iterable(
+            itertools.product(values, repeat=i)
             for i in range(self.min_occurrence, self.max_occurrence+1)
         )
-        return list(combinations)
 
 
 class Parameters(dict):
@@ -0,0 +1,176 @@
+import datetime
+import hashlib
+import json
+import struct
+
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+MAGIC           = b'FLTR'
+VERSION         = 1
+KIND_RESPONSE   = 0
+KIND_OBJECT     = 1
+
+# magic, version, kind and the sha256 digest of the body or of the pickled object
+_HEAD = struct.Struct('<4sBB32s')
+# responses only: status and elapsed seconds, followed by reason, url, encoding
+# and the header fields as length prefixed utf-8 strings
+_RESPONSE = struct.Struct('<Hd')
+_LEN = struct.Struct('<I')
+
+
+def is_record(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    raw = (value or '').encode('utf-8')
+    return _LEN.pack(len(raw)) + raw
+
+
+def _unpack_str(data: memoryview, offset: int) -> Tuple[str, int]:
+    length, = _LEN.unpack_from(data, offset)
+    offset += _LEN.size
+    return str(data[offset:offset+length], 'utf-8'), offset + length
+
+
+def encode_response(response: requests.Response, digest: str) -> bytes:
+    parts = [
+        _HEAD.pack(MAGIC, VERSION, KIND_RESPONSE, bytes.fromhex(digest)),
+        _RESPONSE.pack(response.status_code, response.elapsed.total_seconds()),
+        _pack_str(response.reason),
+        _pack_str(response.url),
+        _pack_str(response.encoding),
+        _LEN.pack(len(response.headers)),
+    ]
+    for name, value in response.headers.items():
+        parts.append(_pack_str(name))
+        parts.append(_pack_str(value))
+    return b''.join(parts)
+
+
+def encode_object(digest: str) -> bytes:
+    return _HEAD.pack(MAGIC, VERSION, KIND_OBJECT, bytes.fromhex(digest))
+
+
+def digest_of(data: bytes) -> str:
+    """ the digest the record refers to, without decoding the rest of it """
+    magic, version, _, digest = _HEAD.unpack_from(data, 0)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(f'Unknown record format {magic}/{version}')
+    return digest.hex()
+
+
+def decode(data: bytes) -> Tuple[int, str, Optional[dict]]:
+    """
+    Returns the kind, the digest and for responses the fields of a StoredResponse
+    """
+    data = memoryview(data)
+    magic, version, kind, digest = _HEAD.unpack_from(data, 0)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(f'Unknown record format {magic}/{version}')
+    if kind == KIND_OBJECT:
+        return kind, digest.hex(), None
+
+    offset = _HEAD.size
+    status_code, elapsed = _RESPONSE.unpack_from(data, offset)
+    offset += _RESPONSE.size
+    reason, offset = _unpack_str(data, offset)
+    url, offset = _unpack_str(data, offset)
+    encoding, offset = _unpack_str(data, offset)
+
+    count, = _LEN.unpack_from(data, offset)
+    offset += _LEN.size
+    headers = CaseInsensitiveDict()
+    for _ in range(count):
+        name, offset = _unpack_str(data, offset)
+        headers[name], offset = _unpack_str(data, offset)
+
+    return kind, digest.hex(), dict(
+        status_code = status_code,
+        elapsed     = datetime.timedelta(seconds=elapsed),
+        reason      = reason,
+        url         = url,
+        encoding    = encoding or None,
+        headers     = headers,
+    )
+
+
+def header_info(response: requests.Response) -> List[str]:
+    """ the header fields cmp compares """
+    return [
+        f'Status-Code: {response.status_code}',
+        f'Reason: {response.reason}',
+        f"Content-Type: {response.headers.get('Content-Type', '')}",
+        f"Connection: {response.headers.get('Connection', '')}",
+    ]
+
+
+def header_digest(response: requests.Response) -> str:
+    return hashlib.sha256('\n'.join(header_info(response)).encode('utf-8')).hexdigest()
+
+
+class StoredResponse:
+    """
+    Behaves like the requests.Response it was created from. The body is only
+    read from the blob store when it is accessed.
+    """
+    def __init__(self,
+                 digest: str,
+                 load_body: Callable[[str], bytes],
+                 stream_body: Callable[[str, int], Iterator[bytes]],
+                 status_code: int,
+                 elapsed: datetime.timedelta,
+                 reason: str,
+                 url: str,
+                 encoding: Optional[str],
+                 headers: CaseInsensitiveDict) -> None:
+        self.digest = digest
+        self._load_body = load_body
+        self._stream_body = stream_body
+        self._content: Optional[bytes] = None
+
+        self.status_code = status_code
+        self.elapsed = elapsed
+        self.reason = reason
+        self.url = url
+        self.encoding = encoding
+        self.headers = headers
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self._load_body(self.digest)
+        return self._content
+
+    @content.setter
+    def content(self, value: bytes) -> None:
+        self._content = value
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def json(self, **kwargs) -> Any:
+        return json.loads(self.content, **kwargs)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterable[bytes]:
+        """ streams the body from the blob store if it was not read yet """
+        if self._content is None:
+            yield from self._stream_body(self.digest, chunk_size)
+            return
+        content = self._content
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start+chunk_size]
+
+    def __repr__(self) -> str:
+        return f'<StoredResponse [{self.status_code}]>'
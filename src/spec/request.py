@@ -1,19 +1,37 @@
 import dataclasses
 
-from typing import Dict
+from typing import Dict, Optional
 from pathlib import Path
 
-from util import _get_or
+from util import _get_or, _get_positive_or, _error_if_ukn
 from spec.spec_item import SpecItem
 
 @dataclasses.dataclass(init=False)
 class Request(SpecItem):
+    ITEMS = ['header', 'pool_size', 'keep_alive', 'dns_cache', 'conditional', 'stream_threshold']
 
-    header: Dict[str, str]
+    header:     Dict[str, str]
+    pool_size:  Optional[int]       # defaults to the highest concurrency of the run
+    keep_alive: bool
+    dns_cache:  Optional[int]       # seconds a resolved address is reused
+    conditional: bool               # sends the validators of the response in main
+    stream_threshold: Optional[int] # bodies of more bytes are streamed to the storage
 
     def __init__(self, **kwargs) -> None:
-        self.header = kwargs.get('header', dict())
+        self.header     = kwargs.get('header',      dict())
+        self.pool_size  = kwargs.get('pool_size',   None)
+        self.keep_alive = kwargs.get('keep_alive',  True)
+        self.dns_cache  = kwargs.get('dns_cache',   None)
+        self.conditional = kwargs.get('conditional', False)
+        self.stream_threshold = kwargs.get('stream_threshold', None)
 
     @classmethod
     def parse(cls, spec_path: Path, content: Dict, path: str) -> 'Request':
-        return Request(header = _get_or(content, f'{path}.header', T=dict, default=dict()))
\ No newline at end of file
+        _error_if_ukn(content, path, Request.ITEMS)
+
+        return Request(header       = _get_or(content, f'{path}.header', T=dict, default=dict()),
+                       pool_size    = _get_positive_or(content, f'{path}.pool_size'),
+                       keep_alive   = _get_or(content, f'{path}.keep_alive', T=bool, default=True),
+                       dns_cache    = _get_positive_or(content, f'{path}.dns_cache'),
+                       conditional  = _get_or(content, f'{path}.conditional', T=bool, default=False),
+                       stream_threshold = _get_positive_or(content, f'{path}.stream_threshold'))
\ No newline at end of file
@@ -0,0 +1,74 @@
+import dataclasses
+import fnmatch
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from spec.meta import Meta
+
+
+@dataclasses.dataclass
+class Selection:
+    """ the requests a run makes when it is not a full run """
+    # None selects all of them
+    testsets:       Optional[Set[str]]  = None
+    endpoints:      Optional[List[str]] = None     # glob patterns
+    request_ids:    Optional[Set[str]]  = None
+    # testset and endpoint of the selected requests, narrows both down further
+    requests_in:    Optional[Set[Tuple[str, str]]] = None
+
+    @classmethod
+    def of(cls,
+           testsets: Optional[Iterable[str]] = None,
+           endpoints: Optional[Iterable[str]] = None,
+           request_ids: Optional[Iterable[str]] = None) -> Optional['Selection']:
+        """ None if everything is selected """
+        if testsets is None and endpoints is None and request_ids is None:
+            return None
+        return Selection(testsets       = set(testsets) if testsets is not None else None,
+                         endpoints      = list(endpoints) if endpoints is not None else None,
+                         request_ids    = set(request_ids) if request_ids is not None else None)
+
+    @classmethod
+    def of_requests(cls, requests: Iterable[Tuple[str, str, str]]) -> 'Selection':
+        """ selects exactly these requests, given as testset, endpoint and request id """
+        requests = list(requests)
+        return Selection(request_ids = {req_id for _, _, req_id in requests},
+                         requests_in = {(testset_name, endpoint_name) for testset_name, endpoint_name, _ in requests})
+
+    def selects_testset(self, testset_name: str) -> bool:
+        if self.testsets is not None and testset_name not in self.testsets:
+            return False
+        return self.requests_in is None or any(t == testset_name for t, _ in self.requests_in)
+
+    def selects_endpoint(self, testset_name: str, endpoint_name: str) -> bool:
+        if not self.selects_testset(testset_name):
+            return False
+        if self.endpoints is not None and \
+           not any(fnmatch.fnmatchcase(endpoint_name, pattern) for pattern in self.endpoints):
+            return False
+        return self.requests_in is None or (testset_name, endpoint_name) in self.requests_in
+
+    def selects(self, testset_name: str, endpoint_name: str, req_id: str) -> bool:
+        if not self.selects_endpoint(testset_name, endpoint_name):
+            return False
+        return self.request_ids is None or req_id in self.request_ids
+
+    def save(self, meta: Meta) -> None:
+        meta['selection'] = {
+            'testsets':     sorted(self.testsets) if self.testsets is not None else None,
+            'endpoints':    self.endpoints,
+            'request_ids':  sorted(self.request_ids) if self.request_ids is not None else None,
+            'requests_in':  sorted(self.requests_in) if self.requests_in is not None else None,
+        }
+
+    @classmethod
+    def load(cls, meta: Meta) -> Optional['Selection']:
+        """ None for a full run """
+        content: Optional[Dict[str, Any]] = meta.get('selection')
+        if content is None:
+            return None
+        optional = lambda name, f: f(content[name]) if content.get(name) is not None else None
+        return Selection(testsets       = optional('testsets', set),
+                         endpoints      = optional('endpoints', list),
+                         request_ids    = optional('request_ids', set),
+                         requests_in    = optional('requests_in', lambda l: {tuple(item) for item in l}))
@@ -1,131 +1,509 @@
-import datetime
+import hashlib
+import os
 import time
 import dataclasses
 import shutil
 import pickle
-import yaml
+import re
+import tempfile
+import mmap
+import struct
+import threading
+import requests
 
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from errors import FlooterRunError
-from util import _get, _to_absolute_path
+from errors import FlootSpecSyntaxError, FlooterRunError
+from util import _error_if_ukn, _get, _get_or, _to_absolute_path
+from spec import codecs, record
+from spec.meta import Digests, Meta
 from spec.spec_item import SpecItem
 
-def _dump(p: Path, content: Any):
-    with open(p, 'wb') as f:
-        pickle.dump(content, f)
 
-def _load(p: Path):
-    with open(p, 'rb') as f:
-        return pickle.load(f)
+class BlobStore:
+    """
+    Stores content under its sha256 digest, the same content is only stored once
+    no matter how many runs refer to it. The digest is over the uncompressed
+    content, so it does not change with the codec.
+    """
+    _DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+    # prefix of files which are written and renamed to their blob afterwards
+    _TEMPORARY = 'tmp'
 
-def _dump_as_yaml(p: Path, content: Any):
-    with open(p, 'wt') as f:
-        yaml.dump(content, f)
-
-def _load_from_yaml(p: Path):
-    with open(p, 'rt') as f:
-        return yaml.load(f, Loader=yaml.FullLoader)
-
-class PersistedDict():
-    def __init__(self, path: Path, autosave = True):
-        self.path = path
-        self.autosave = autosave
-
-        self.props: Dict[str, Any] = dict({'created': datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')})
-
-        if self.path.is_file() and self.path.exists():
-            self.props = _load_from_yaml(self.path)
-
-    def noautosave(self) -> None:
-        self.autosave = False
-
-    def keys(self) -> Iterable[Any]:
-        return self.props.keys()
-
-    def values(self) -> Iterable[Any]:
-        return self.props.values()
-
-    def items(self) -> Iterable[Tuple[Any, Any]]:
-        return self.props.items()
-
-    def __getitem__(self, name: str):
-        return self.props[name]
-
-    def __setitem__(self, name: str, value: Any):
-        self.props[name] = value
-
-    def __contains__(self, name: str):
-        return name in self.props
+    def __init__(self, base_dir: Path) -> None:
+        self.base_dir = base_dir
 
-    def __del__(self):
-        if self.autosave:
-            self.path.parent.mkdir(exist_ok=True, parents=True)
-            _dump_as_yaml(self.path, self.props)
+    def path(self, digest: str) -> Path:
+        return Path(self.base_dir, digest[:2], digest[2:])
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def _reuse(self, p: Path) -> bool:
+        """ touches the blob if it exists, it was just referred to again """
+        try:
+            os.utime(p)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write_temporary(self, directory: Path, chunks: Iterable[bytes], codec: str) -> str:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=self._TEMPORARY)
+        try:
+            size = 0
+            def counted() -> Iterator[bytes]:
+                nonlocal size
+                for chunk in chunks:
+                    size += len(chunk)
+                    yield chunk
+
+            with os.fdopen(fd, 'wb') as f:
+                # the size is only known at the end
+                f.write(codecs.header(codec, 0))
+                for chunk in codecs.compress(counted(), codec):
+                    f.write(chunk)
+                f.seek(0)
+                f.write(codecs.header(codec, size))
+            return tmp
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _write(self, p: Path, chunks: Iterable[bytes], codec: str) -> None:
+        # write to a temporary file first, a blob is either complete or missing
+        os.replace(self._write_temporary(p.parent, chunks, codec), p)
+
+    def put(self, content: bytes, codec: str = 'none') -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        p = self.path(digest)
+        if not self._reuse(p):
+            view = memoryview(content)
+            self._write(p, (view[i:i + codecs.CHUNK_SIZE]
+                            for i in range(0, len(content), codecs.CHUNK_SIZE)), codec)
+        return digest
+
+    def put_stream(self, chunks: Iterable[bytes], codec: str = 'none') -> Tuple[str, int]:
+        """
+        Stores the content while it arrives, only a chunk of it is in memory
+        at a time. The digest and the size are only known at the end.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        def hashed() -> Iterator[bytes]:
+            nonlocal size
+            for chunk in chunks:
+                hasher.update(chunk)
+                size += len(chunk)
+                yield chunk
+
+        tmp = self._write_temporary(self.base_dir, hashed(), codec)
+        digest = hasher.hexdigest()
+        p = self.path(digest)
+        if self._reuse(p):
+            os.unlink(tmp)
+        else:
+            p.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, p)
+        return digest, size
+
+    def _read_header(self, digest: str, f: BinaryIO) -> Tuple[str, int]:
+        try:
+            return codecs.parse_header(f.read(codecs.HEADER_SIZE))
+        except ValueError as err:
+            raise FlooterRunError(f'The blob {digest} is corrupt: {err}') from err
+
+    def codec(self, digest: str) -> str:
+        with open(self._existing_path(digest), 'rb') as f:
+            return self._read_header(digest, f)[0]
+
+    def iter_content(self, digest: str, chunk_size: int = codecs.CHUNK_SIZE) -> Iterator[bytes]:
+        """ yields the uncompressed content without holding all of it in memory """
+        with open(self._existing_path(digest), 'rb') as f:
+            codec, size = self._read_header(digest, f)
+            yield from codecs.decompress(codecs.read_chunks(f, chunk_size), codec, size)
+
+    def get(self, digest: str) -> bytes:
+        return b''.join(self.iter_content(digest))
+
+    def recompress(self, digest: str, codec: str) -> None:
+        """ stores the blob again with the codec, if it does not use it already """
+        if self.codec(digest) == codec:
+            return
+        self._write(self.path(digest), self.iter_content(digest), codec)
+
+    def _existing_path(self, digest: str) -> Path:
+        p = self.path(digest)
+        if not p.is_file():
+            raise FlooterRunError(f'There is no blob with the digest {digest}')
+        return p
+
+    def sweep(self, referenced: Set[str], before: float) -> Tuple[int, int]:
+        """
+        Removes the blobs which are not referenced and were last written or
+        touched before the given time, and what interrupted writes left behind
+        by then. Returns the amount of removed blobs and their bytes.
+        """
+        if not self.base_dir.is_dir():
+            return 0, 0
+        removed, size = 0, 0
+        for p in [*self.base_dir.glob('*/*'), *self.base_dir.glob(f'{self._TEMPORARY}*')]:
+            digest = p.parent.name + p.name
+            is_blob = self._DIGEST_RE.fullmatch(digest) is not None
+            if (is_blob and digest in referenced) or \
+               (not is_blob and not p.name.startswith(self._TEMPORARY)):
+                continue
+            try:
+                stat = p.stat()
+                if stat.st_mtime >= before:
+                    continue
+                p.unlink()
+            except FileNotFoundError:
+                continue
+            if is_blob:
+                removed += 1
+                size += stat.st_size
+        return removed, size
 
 
 class Storage:
-    def __init__(self, base_dir: Path) -> None:
+    def __init__(self, base_dir: Path, blobs: BlobStore, codec: str = 'none') -> None:
         self.base_dir = base_dir
+        self.blobs = blobs
+        # how the bodies saved by this storage are compressed
+        self.codec = codec
 
         if not self.base_dir.is_dir():
             self.base_dir.mkdir(parents=True)
 
-        self.meta = PersistedDict(Path(base_dir, '.meta'))
+        self.meta = Meta(base_dir)
 
     def exists(self, name: str) -> bool:
         p = Path(self.base_dir, name)
         return p.exists() and p.is_file()
 
-    def path(self, name: str) -> Path:
-        return Path(self.base_dir, name)
-
-    def load(self, name: str) -> Any:
+    def read(self, name: str) -> bytes:
+        """ the stored record of the request as it is """
         p = Path(self.base_dir, name)
         if not p.is_file():
             raise FlooterRunError(f'There is no request with the id {name}')
-        return _load(p)
+        with open(p, 'rb') as f:
+            return f.read()
 
-    def save(self, name: str, content: Any) -> None:
-        p = Path(self.base_dir, name)
-        _dump(p, content)
+    def write(self, name: str, data: bytes) -> None:
+        with open(Path(self.base_dir, name), 'wb') as f:
+            f.write(data)
+
+    def load(self, name: str) -> Any:
+        data = self.read(name)
+        # runs from before the records hold a pickled requests.Response
+        if not record.is_record(data):
+            return pickle.loads(data)
+
+        kind, digest, fields = record.decode(data)
+        if kind == record.KIND_OBJECT:
+            return pickle.loads(self.blobs.get(digest))
+        return record.StoredResponse(digest, self.blobs.get, self.blobs.iter_content, **fields)
+
+    def save_body(self, response: requests.Response, codec: Optional[str] = None) -> Tuple[record.StoredResponse, int]:
+        """
+        Writes the body of a response which was not read yet to the blob store.
+        The returned response reads it from there when it is accessed, the size
+        of the body is returned with it.
+        """
+        try:
+            digest, size = self.blobs.put_stream(response.iter_content(codecs.CHUNK_SIZE), codec or self.codec)
+        finally:
+            response.close()
+        return record.StoredResponse(digest, self.blobs.get, self.blobs.iter_content,
+                                     status_code    = response.status_code,
+                                     elapsed        = response.elapsed,
+                                     reason         = response.reason,
+                                     url            = response.url,
+                                     encoding       = response.encoding,
+                                     headers        = response.headers), size
+
+    def save(self, name: str, content: Any, codec: Optional[str] = None) -> Digests:
+        """
+        Returns the digest of the body and of the header fields that are
+        compared, objects that are no responses do not have the latter
+        """
+        codec = codec or self.codec
+
+        if isinstance(content, record.StoredResponse) and content._content is None:
+            # the body is in the blob store already
+            digests = (content.digest, record.header_digest(content))
+            data = record.encode_response(content, content.digest)
+        elif isinstance(content, (requests.Response, record.StoredResponse)):
+            digests = (self.blobs.put(content.content, codec), record.header_digest(content))
+            data = record.encode_response(content, digests[0])
+        else:
+            digests = (self.blobs.put(pickle.dumps(content), codec), None)
+            data = record.encode_object(digests[0])
+
+        self.write(name, data)
+        return digests
+
+    def recompress(self, name: str, codec: Optional[str] = None) -> None:
+        """ compresses the body of the request with the codec of this storage """
+        data = self.read(name)
+        if not record.is_record(data):
+            return
+        _, digest, _ = record.decode(data)
+        self.blobs.recompress(digest, codec or self.codec)
+
+    def is_legacy(self, name: str) -> bool:
+        """ if the request was stored as pickle, before there were records """
+        return not record.is_record(self.read(name))
 
     def list_requests(self) -> List[str]:
         """ returns list of request ids """
-        return list(filter(
-            lambda p: not p.stem.startswith('.'),
-            self.base_dir.iterdir()))
+        return [p.name for p in self.base_dir.iterdir() if not p.name.startswith('.')]
+
+    def digests(self) -> Iterator[str]:
+        """ the digests of the blobs the requests refer to """
+        for name in self.list_requests():
+            data = self.read(name)
+            if record.is_record(data):
+                yield record.digest_of(data)
+            else:
+                # a pickled response refers to no blob, but it must be readable
+                pickle.loads(data)
+
+    def close(self) -> None:
+        self.meta.close()
+
+
+class PackedStorage(Storage):
+    """
+    Appends the records to segment files, an append-only index maps every request
+    id to the segment, offset and length of its record. The last entry of an id wins.
+    """
+    INDEX           = '.index'
+    SEGMENT_SIZE    = 64 << 20
+    # length of the request id, segment, offset, length of the record
+    _ENTRY          = struct.Struct('<HIQI')
+
+    def __init__(self, base_dir: Path, blobs: BlobStore, codec: str = 'none') -> None:
+        super().__init__(base_dir, blobs, codec)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, int, int]] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._segment: Optional[BinaryIO] = None
+        self._segment_no = 0
+        self._index: Optional[BinaryIO] = None
+        # bytes of the index which hold complete entries
+        self._index_size = 0
+        self._read_index()
+
+    @classmethod
+    def is_packed(cls, base_dir: Path) -> bool:
+        return Path(base_dir, cls.INDEX).is_file()
+
+    def _segment_path(self, no: int) -> Path:
+        return Path(self.base_dir, f'segment-{no:06d}')
+
+    def _read_index(self) -> None:
+        p = Path(self.base_dir, self.INDEX)
+        if not p.is_file():
+            return
+        with open(p, 'rb') as f:
+            data = f.read()
+
+        sizes: Dict[int, int] = {}
+        offset = 0
+        while offset + self._ENTRY.size <= len(data):
+            name_len, segment, start, length = self._ENTRY.unpack_from(data, offset)
+            end = offset + self._ENTRY.size + name_len
+            if end > len(data):
+                break
+            if segment not in sizes:
+                p_segment = self._segment_path(segment)
+                sizes[segment] = p_segment.stat().st_size if p_segment.is_file() else 0
+            # the record did not make it to the segment
+            if start + length > sizes[segment]:
+                break
+            name = str(data[offset + self._ENTRY.size:end], 'utf-8')
+            self._entries[name] = (segment, start, length)
+            self._segment_no = max(self._segment_no, segment)
+            offset = end
+        self._index_size = offset
+
+    def exists(self, name: str) -> bool:
+        return name in self._entries
+
+    def read(self, name: str) -> memoryview:
+        if name not in self._entries:
+            raise FlooterRunError(f'There is no request with the id {name}')
+        segment, start, length = self._entries[name]
+
+        with self._lock:
+            m = self._maps.get(segment)
+            # the segment grew since it was mapped
+            if m is None or len(m) < start + length:
+                if self._segment is not None:
+                    self._segment.flush()
+                with open(self._segment_path(segment), 'rb') as f:
+                    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = m
+        return memoryview(m)[start:start + length]
+
+    def write(self, name: str, data: bytes) -> None:
+        raw_name = name.encode('utf-8')
+        with self._lock:
+            if self._segment is None:
+                # drop what an interrupted run wrote only partially, opening the
+                # storage only to read it leaves a run that is still going alone
+                p = Path(self.base_dir, self.INDEX)
+                if p.is_file() and p.stat().st_size > self._index_size:
+                    os.truncate(p, self._index_size)
+                self._index = open(p, 'ab')
+                self._segment = open(self._segment_path(self._segment_no), 'ab')
+            start = self._segment.tell()
+            if start > 0 and start + len(data) > self.SEGMENT_SIZE:
+                self._segment.close()
+                self._segment_no += 1
+                self._segment = open(self._segment_path(self._segment_no), 'ab')
+                start = 0
+
+            # the record first, an entry in the index means it is complete
+            self._segment.write(data)
+            self._segment.flush()
+            self._index.write(self._ENTRY.pack(len(raw_name), self._segment_no, start, len(data)) + raw_name)
+            self._index.flush()
+            self._entries[name] = (self._segment_no, start, len(data))
+
+    def list_requests(self) -> List[str]:
+        return list(self._entries.keys())
+
+    def close(self) -> None:
+        with self._lock:
+            for m in self._maps.values():
+                try:
+                    m.close()
+                except BufferError:
+                    # a record that was read is still in use, the map closes once it is released
+                    pass
+            self._maps.clear()
+            if self._segment is not None:
+                self._segment.close()
+                self._index.close()
+                self._segment = self._index = None
+        super().close()
+
+
+LAYOUTS = {
+    'files':    Storage,
+    'packed':   PackedStorage,
+}
+
+def open_storage(base_dir: Path, blobs: BlobStore, codec: str, layout: str) -> Storage:
+    """
+    Opens the storage in the layout it was written in, new or empty
+    storages get the given layout
+    """
+    if PackedStorage.is_packed(base_dir):
+        return PackedStorage(base_dir, blobs, codec)
+    if base_dir.is_dir() and any(not p.name.startswith('.') for p in base_dir.iterdir()):
+        return Storage(base_dir, blobs, codec)
+    return LAYOUTS[layout](base_dir, blobs, codec)
 
 @dataclasses.dataclass
 class Storages(SpecItem):
     main: Storage
     runs_dir: Path
+    blobs: BlobStore
+    runs_codec: str = 'none'
+    # how new runs are stored, see LAYOUTS
+    layout: str = 'files'
+    # endpoint name -> codec, overrides the codec of the storages
+    endpoint_codecs: Dict[str, str] = dataclasses.field(default_factory=dict)
+
+    # seconds a blob is kept after it was written or touched, even if nothing refers to it
+    GC_GRACE = 600
 
     @classmethod
     def parse(cls, spec_path: Path, content: Dict, path: str) -> 'Storages':
         main_dir  = _to_absolute_path(spec_path, _get(content, f'{path}.main', T=str))
         runs_dir    = _to_absolute_path(spec_path, _get(content, f'{path}.runs', T=str))
+        # shared by main and all runs
+        blobs_dir   = _to_absolute_path(spec_path, _get_or(content, f'{path}.blobs', T=str,
+                                                           default=str(Path(runs_dir, '.blobs'))))
+        blobs = BlobStore(blobs_dir)
+        layout      = _get_or(content, f'{path}.layout', default='files', choices=list(LAYOUTS.keys()))
+
+        # a single codec for everything or one per storage
+        compression = _get_or(content, f'{path}.compression', T=(str, dict), default='none')
+        endpoint_codecs = {}
+        if isinstance(compression, str):
+            if compression not in codecs.CODEC_NAMES:
+                raise FlootSpecSyntaxError(f'Expected {path}.compression to be one of {codecs.CODEC_NAMES}')
+            main_codec = runs_codec = compression
+        else:
+            _error_if_ukn(content, f'{path}.compression', ['main', 'runs', 'endpoints'])
+            main_codec = _get_or(content, f'{path}.compression.main', default='none', choices=codecs.CODEC_NAMES)
+            runs_codec = _get_or(content, f'{path}.compression.runs', default='none', choices=codecs.CODEC_NAMES)
+            for name, codec in _get_or(content, f'{path}.compression.endpoints', default={}, T=dict).items():
+                if codec not in codecs.CODEC_NAMES:
+                    raise FlootSpecSyntaxError(f'Expected {path}.compression.endpoints.{name} '
+                                               f'to be one of {codecs.CODEC_NAMES}')
+                endpoint_codecs[name] = codec
+
         return Storages(
-            main      = Storage(main_dir),
-            runs_dir    = runs_dir,
+            main            = open_storage(main_dir, blobs, main_codec, layout),
+            runs_dir        = runs_dir,
+            blobs           = blobs,
+            runs_codec      = runs_codec,
+            layout          = layout,
+            endpoint_codecs = endpoint_codecs,
         )
 
+    def codec_for(self, storage: Storage, endpoint_name: str) -> str:
+        return self.endpoint_codecs.get(endpoint_name, storage.codec)
+
     def make_run_storage(self, rid: str) -> Storage:
         p = Path(self.runs_dir, rid)
         if p.is_dir():
             raise FlooterRunError(f'Tried to create run, but a run with the id {rid} exists already')
-        return Storage(Path(self.runs_dir, rid))
+        return open_storage(p, self.blobs, self.runs_codec, self.layout)
 
     def get_run_storage(self, rid: str) -> Storage:
         p = Path(self.runs_dir, rid)
         if not p.is_dir():
             raise FlooterRunError(f'Tried to use storage of {rid} but it does not exist! '
                                    'You might want to use the "list" command.')
-        return Storage(p)
+        return open_storage(p, self.blobs, self.runs_codec, self.layout)
 
     def list_runs(self) -> List[str]:
-        return [p.name for p in self.runs_dir.iterdir()]
+        return [p.name for p in self.runs_dir.iterdir() if not p.name.startswith('.')]
 
-    def rm_run(self, rid):
+    def rm_run(self, rid) -> Tuple[int, int]:
+        """ removes the run and the bodies only it referred to, see collect_garbage """
         shutil.rmtree(Path(self.runs_dir, rid))
+        return self.collect_garbage()
+
+    def collect_garbage(self) -> Tuple[int, int]:
+        """
+        Removes the blobs neither main nor any run refers to anymore. Blobs
+        written or touched shortly before are kept, a run that is going on
+        meanwhile might not have written the records for them yet. Returns
+        the amount of removed blobs and their bytes.
+        """
+        before = time.time() - self.GC_GRACE
+
+        def digests(name: str, storage: Storage) -> Iterator[str]:
+            # a blob is only removed if every storage could be read
+            try:
+                yield from storage.digests()
+            except Exception as err:
+                raise FlooterRunError(f'Could not read the requests of {name}, no bodies were removed: {err}') from err
+
+        referenced = set(digests('main', self.main))
+        for rid in self.list_runs():
+            storage = self.get_run_storage(rid)
+            try:
+                referenced.update(digests(rid, storage))
+            finally:
+                storage.close()
+        return self.blobs.sweep(referenced, before)
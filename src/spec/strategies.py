@@ -1,13 +1,15 @@
 import abc
+import collections
 import itertools
-import operator
+import random
+import sys
 import dataclasses
 
-from functools import reduce
 from pathlib import Path
 from typing import Any, Tuple, Iterable, Dict, List, Union
 
-from util import _get, _get_or
+from util import _get, _get_or, _get_positive_or
+from errors import FlootSpecSyntaxError
 from spec.parameter import Parameters
 from spec.spec_item import SpecItem
 
@@ -39,16 +41,157 @@ def permutations_strategy(testset_name: str,
                           vars: Dict[str, str],
                           args: Dict[str, YAML_TYPES],
                           parameters: Parameters
-                          ) -> List[List[Tuple[str, str]]]:
+                          ) -> Iterable[List[Tuple[str, str]]]:
     # 'application': [[], [('application', 1)], [('application', 2)], [('application', 1), ('application', 1)].....
     # 'limit': [[('limit', 1000)], [('limit', 0)], [('limit', 'None')]]}
+    # only the combinations of a single parameter are kept, the product of them is created lazily
     names_with_values = [
-            list(list(zip(itertools.repeat(name), comb)) for comb in parameter.get_combinations())
+            list(tuple(zip(itertools.repeat(name), comb)) for comb in parameter.get_combinations())
             for name, parameter in parameters.items()
     ]
 
-    return list(map(lambda comb: reduce(operator.add, comb, list()), itertools.product(*names_with_values)))
+    for comb in itertools.product(*names_with_values):
+        yield list(itertools.chain.from_iterable(comb))
+
+def _covering_array(levels: List[int], t: int) -> List[List[int]]:
+    """
+    Creates rows of level indices in which every combination of levels of
+    any t columns occurs at least once. This is done with IPOG: the full
+    product of the first t columns is extended one column at a time, first
+    by choosing the level that covers the most missing combinations for every
+    existing row and then by adding rows for the combinations still missing.
+    Nothing is random, the same levels always give the same rows.
+    """
+    # larger columns first, this keeps the array small
+    order = sorted(range(len(levels)), key=lambda c: -levels[c])
+    sorted_levels = [levels[c] for c in order]
+
+    rows = [list(row) for row in itertools.product(*map(range, sorted_levels[:t]))]
+
+    for k in range(t, len(sorted_levels)):
+        # missing[columns][levels of columns] = levels of k not yet combined with them
+        missing = {
+            columns: {key: set(range(sorted_levels[k])) for key in itertools.product(*(range(sorted_levels[c]) for c in columns))}
+            for columns in itertools.combinations(range(k), t-1)
+        }
+
+        # horizontal growth
+        for idx, row in enumerate(rows):
+            gains = collections.Counter()
+            for columns, keys in missing.items():
+                key = tuple(row[c] for c in columns)
+                if None not in key:
+                    gains.update(keys[key])
+
+            if idx < sorted_levels[k]:
+                # the first rows take every level once, as in the product of the first columns
+                level = idx
+            elif len(gains) > 0:
+                # the lowest level wins a tie
+                level = max(gains.items(), key=lambda level_gain: (level_gain[1], -level_gain[0]))[0]
+            else:
+                level = None
+
+            row.append(level)
+            if level is None:
+                continue
+            for columns, keys in missing.items():
+                key = tuple(row[c] for c in columns)
+                if None not in key:
+                    keys[key].discard(level)
+
+        # vertical growth
+        incomplete = [row for row in rows if None in row]
+        for columns, keys in missing.items():
+            for key, missing_levels in keys.items():
+                for level in sorted(missing_levels):
+                    for row in incomplete:
+                        if row[k] in (None, level) and all(row[c] in (None, v) for c, v in zip(columns, key)):
+                            break
+                    else:
+                        row = [None] * (k+1)
+                        rows.append(row)
+                        incomplete.append(row)
+
+                    row[k] = level
+                    for c, v in zip(columns, key):
+                        row[c] = v
+
+    # any level covers the columns that are not needed by a row, back to the original order
+    position = {c: idx for idx, c in enumerate(order)}
+    return [[(row[position[c]] or 0) for c in range(len(levels))] for row in rows]
+
+def pairwise_strategy(testset_name: str,
+                      endpoint_name: str,
+                      vars: Dict[str, str],
+                      args: Dict[str, YAML_TYPES],
+                      parameters: Parameters
+                      ) -> Iterable[List[Tuple[str, str]]]:
+    """
+    Every combination of the values of any two parameters is requested at least
+    once, the arg t changes this to any t parameters.
+    """
+    t = _get_positive_or(args, 't', default=2)
+
+    names_with_values = [
+            list(tuple(zip(itertools.repeat(name), comb)) for comb in parameter.get_combinations())
+            for name, parameter in parameters.items()
+    ]
+    # parameters without a single combination cannot be part of a request
+    if any(len(combs) == 0 for combs in names_with_values):
+        return
+
+    # covering every t-tuple of fewer than t parameters is the full product
+    if t >= len(names_with_values):
+        yield from permutations_strategy(testset_name, endpoint_name, vars, args, parameters)
+        return
+
+    for row in _covering_array([len(combs) for combs in names_with_values], t):
+        yield list(itertools.chain.from_iterable(combs[level] for combs, level in zip(names_with_values, row)))
+
+def sample_strategy(testset_name: str,
+                    endpoint_name: str,
+                    vars: Dict[str, str],
+                    args: Dict[str, YAML_TYPES],
+                    parameters: Parameters
+                    ) -> Iterable[List[Tuple[str, str]]]:
+    """
+    Requests at most budget of the permutations, drawn uniformly with the seed.
+    Permutations are addressed by their index, so they are never enumerated.
+    """
+    budget = _get_positive_or(args, 'budget')
+    if budget is None:
+        raise FlootSpecSyntaxError('The sample strategy requires a budget')
+    seed = _get_or(args, 'seed', default=0, T=(int, str))
+
+    names_with_values = [
+            list(tuple(zip(itertools.repeat(name), comb)) for comb in parameter.get_combinations())
+            for name, parameter in parameters.items()
+    ]
+
+    total = 1
+    for combs in names_with_values:
+        total *= len(combs)
+
+    rng = random.Random(seed)
+    if total <= sys.maxsize:
+        indices = rng.sample(range(total), min(budget, total))
+    else:
+        # too many to be sampled as a range, but a duplicate is very unlikely
+        indices = set()
+        while len(indices) < budget:
+            indices.add(rng.randrange(total))
+
+    # in the order of the permutations, the last parameter changes fastest
+    for idx in sorted(indices):
+        run = list()
+        for combs in reversed(names_with_values):
+            idx, level = divmod(idx, len(combs))
+            run.append(combs[level])
+        yield list(itertools.chain.from_iterable(reversed(run)))
 
 STRATEGY_MAPPING = {
-    'permutations': permutations_strategy
+    'permutations': permutations_strategy,
+    'pairwise': pairwise_strategy,
+    'sample': sample_strategy,
 }
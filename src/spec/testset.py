@@ -6,7 +6,7 @@ from pathlib import Path
 from typing import Dict, Optional
 
 
-from util import _call_if, _get
+from util import _call_if, _call_if_exists_or, _get, _get_positive_or
 from spec.hooks import Hooks
 from spec.parameter import Parameters
 from spec.endpoint import Endpoints
@@ -17,13 +17,19 @@ class TestSet:
     hooks:      Optional[Hooks]
     parameters: Optional[Parameters]
     endpoints:  Optional[Endpoints]
+    concurrency: Optional[int]
 
     @classmethod
     def parse(cls, spec_path: Path, content: Dict, path: str) -> 'TestSet':
         return TestSet(
-            hooks       =_call_if(content, f'{path}.hooks',     lambda: Hooks.parse(spec_path, content, f'{path}.hooks')),
+            hooks       =_call_if_exists_or(content,
+                                            f'{path}.hooks',
+                                            lambda: Hooks.parse(spec_path, content, f'{path}.hooks'),
+                                            lambda: Hooks()
+                                            ),
             parameters  =_call_if(content, f'{path}.parameters',lambda: Parameters.parse(spec_path, content, f'{path}.parameters')),
             endpoints   =_call_if(content, f'{path}.endpoints', lambda: Endpoints.parse(spec_path, content, f'{path}.endpoints')),
+            concurrency =_get_positive_or(content, f'{path}.concurrency'),
         )
 
 class TestSets(dict, SpecItem):
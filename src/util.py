@@ -1,7 +1,7 @@
 import importlib.util
 import sys
 
-from typing import Iterable, List, Type, Any, Dict, Callable, Union
+from typing import Iterable, List, Optional, Type, Any, Dict, Callable, Union
 from types import ModuleType
 from pathlib import Path
 
@@ -51,6 +51,11 @@ def _set(d: Dict[str, Union[Dict, Any]], path: str, value: str) -> None:
 
     d[parts[-1]] = value
 
+def _type_name(T: Union[Type, tuple]) -> str:
+    if isinstance(T, tuple):
+        return ' or '.join(t.__name__ for t in T)
+    return T.__name__
+
 def _get(d: Dict, path: str, T: Type = None, choices: List[str]=None) -> Any:
     if len(path.strip()) == 0: return d
 
@@ -60,7 +65,7 @@ def _get(d: Dict, path: str, T: Type = None, choices: List[str]=None) -> Any:
         d = d[part]
 
     if T is not None and not isinstance(d, T):
-        raise FlooterError(f'Expected {path} to be of type {T.__name__}')
+        raise FlooterError(f'Expected {path} to be of type {_type_name(T)}')
     if choices is not None and d not in choices:
         raise FlooterError(f'Expected {path} to be one of {choices}')
     return d
@@ -83,11 +88,21 @@ def _get_or(d: Dict, path: str, default: Any = None, T: Type = None, choices: Li
 
     val = d[parts[-1]]
     if T is not None and not isinstance(val, T):
-        raise FlooterError(f'Expected {path} to be of type {T.__name__}')
+        raise FlooterError(f'Expected {path} to be of type {_type_name(T)}')
     if choices is not None and val not in choices:
         raise FlooterError(f'Expected {path} to be one of {choices}')
     return d[parts[-1]]
 
+def _get_positive_or(d: Dict, path: str, default: Optional[int] = None, T: Type = int) -> Optional[int]:
+    """
+    Same as _get_or but the value must be a positive number
+    """
+    val = _get_or(d, path, default=default, T=T)
+    # bool is an int, but true is not a count
+    if isinstance(val, bool) or (val is not None and val <= 0):
+        raise FlootSpecSyntaxError(f'Expected {path} to be a positive number')
+    return val
+
 def _box(before: Any, mid: Iterable, after: Any) -> Iterable:
     first = True
     for x in mid:
@@ -150,4 +165,14 @@ def _coalesce_fns(*funcs: List[Callable], default=lambda *args, **kwargs: None):
 
     return default
 
-
+def format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f'{seconds * 1000:.1f} ms'
+    return f'{seconds:.2f} s'
+
+def format_size(size: float) -> str:
+    for unit in ['B', 'KiB', 'MiB']:
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
@@ -0,0 +1,58 @@
+import io
+import sys
+import unittest
+import zipfile
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from diff.binary_diff import chunk_diff, zip_diff
+
+
+def _chunks(data: bytes, size: int):
+    """ data in chunks of the size, like a stream delivers them """
+    return (data[i:i+size] for i in range(0, len(data), size))
+
+
+def _zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+class ChunkDiffTest(unittest.TestCase):
+    def test_same_bodies(self):
+        data = bytes(range(256)) * 10
+        self.assertEqual(list(chunk_diff(_chunks(data, 7), _chunks(data, 100), 64)), [])
+
+    def test_first_difference_and_changed_chunks(self):
+        a = bytes(1000)
+        b = bytearray(a)
+        b[70] = b[900] = 1
+        self.assertEqual(list(chunk_diff(_chunks(a, 33), _chunks(bytes(b), 1000), 256)),
+                         ['~ first difference at byte 70', '~ 2 of 4 chunks of 256 B differ'])
+
+    def test_size_change(self):
+        self.assertEqual(list(chunk_diff([b'abc'], [b'ab', b'cd'], 1024)),
+                         ['~ size: 3 -> 4', '~ first difference at byte 3', '~ 1 of 1 chunks of 1.0 KiB differ'])
+
+
+class ZipDiffTest(unittest.TestCase):
+    def test_members(self):
+        a = _zip({'same.txt': b'same', 'data.csv': b'1,2', 'gone.txt': b'x'})
+        b = _zip({'same.txt': b'same', 'data.csv': b'1,2,3', 'new.txt': b'y' * 2048})
+        lines = list(zip_diff(_chunks(a, 10), _chunks(b, 10)))
+        self.assertEqual(len(lines), 3)
+        self.assertRegex(lines[0], r'^~ data.csv: crc [0-9a-f]{8} -> [0-9a-f]{8}, 3 B -> 5 B$')
+        self.assertEqual(lines[1:], ['- gone.txt: 1 B', '+ new.txt: 2.0 KiB'])
+
+    def test_not_a_zip(self):
+        with self.assertRaises(zipfile.BadZipFile):
+            list(zip_diff([b'not a zip'], [_zip({})]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import datetime
+import sys
+import tempfile
+import unittest
+import uuid
+
+from pathlib import Path
+from typing import List
+
+import requests
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from commands.flooter_cmp import PERF_EXIT_CODE, FlooterCompare
+from loggers import NullLogger
+from spec.compare import PerfCompare
+from spec.floot_spec import FlootSpec
+from spec.meta import Timing
+
+
+def _response(req_id: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.url = f'http://host/items?id={req_id}'
+    response.elapsed = datetime.timedelta(milliseconds=10)
+    response.headers = requests.structures.CaseInsensitiveDict({'Content-Type': 'application/json'})
+    response._content = f'{{"id": {req_id}}}'.encode()
+    return response
+
+
+class IsRegressionTest(unittest.TestCase):
+    def test_relative_and_absolute_increase(self):
+        perf = PerfCompare()
+        self.assertFalse(perf.is_regression(1.0, 1.2))
+        self.assertTrue(perf.is_regression(1.0, 1.21))
+        # jitter of fast endpoints
+        self.assertFalse(perf.is_regression(0.001, 0.011))
+        self.assertTrue(perf.is_regression(0.001, 0.0111))
+        self.assertFalse(perf.is_regression(1.0, 0.5))
+
+
+class CmpPerfTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        path = self.dir / 'spec.yaml'
+        path.write_text(yaml.dump({
+            'host': 'http://127.0.0.1',
+            'storage': {'main': 'main', 'runs': 'runs'},
+            'compare': {'perf': {'percentile': 50, 'min_samples': 3}},
+            'endpoints': {'items': {}},
+            'testsets': {'set': {}},
+        }))
+        self.spec = FlootSpec.load_from_file(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, totals: List[float], extra: bool = False) -> str:
+        """ a run of a request per total, all with the same responses """
+        rid = str(uuid.uuid4())
+        storage = self.spec.storages.make_run_storage(rid)
+        req_ids = [str(i) for i in range(len(totals) + (1 if extra else 0))]
+        for req_id, total in zip(req_ids, totals + [0.01]):
+            digests = storage.save(req_id, _response(req_id))
+            timing = Timing(sent=1.0, total=total, first_byte=total / 2, connect=None, received=9, status=200)
+            storage.meta.add_request('set', 'items', req_id, [('id', req_id)], digests, timing)
+        storage.close()
+        return rid
+
+    def _exit_code(self, old: str, new: str) -> int:
+        with self.assertRaises(SystemExit) as exit:
+            FlooterCompare(self.spec, NullLogger(), True, perf=True).run(old, new)
+        return exit.exception.code
+
+    def test_same_latencies(self):
+        self.assertEqual(self._exit_code(self._run([0.1] * 3), self._run([0.1] * 3)), 0)
+
+    def test_slower(self):
+        self.assertEqual(self._exit_code(self._run([0.1] * 3), self._run([0.2] * 3)), PERF_EXIT_CODE)
+        self.assertEqual(self._exit_code(self._run([1.0] * 3), self._run([1.15] * 3)), 0)
+        self.assertEqual(self._exit_code(self._run([0.001] * 3), self._run([0.005] * 3)), 0)
+
+    def test_too_few_requests(self):
+        self.assertEqual(self._exit_code(self._run([0.1] * 2), self._run([1.0] * 2)), 0)
+        # three requests are enough to be judged
+        self.assertEqual(self._exit_code(self._run([0.1] * 3), self._run([0.1, 1.0, 1.0])), PERF_EXIT_CODE)
+
+    def test_slower_and_different(self):
+        self.assertEqual(self._exit_code(self._run([0.1] * 3), self._run([0.1] * 3, extra=True)), 1)
+        self.assertEqual(self._exit_code(self._run([0.1] * 3), self._run([0.2] * 3, extra=True)), 1 | PERF_EXIT_CODE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from errors import FlooterRunError
+from spec import codecs
+from spec.storage import BlobStore
+
+
+def _compressed(content: bytes, codec: str) -> bytes:
+    return b''.join(codecs.compress([content], codec))
+
+
+class DecompressTest(unittest.TestCase):
+    def test_round_trip(self):
+        content = b''.join(b'%d,' % i for i in range(300000))
+        for codec in codecs.CODEC_NAMES:
+            with self.subTest(codec=codec):
+                out = list(codecs.decompress([_compressed(content, codec)], codec, len(content)))
+                self.assertEqual(b''.join(out), content)
+
+    def test_at_most_a_chunk_at_once(self):
+        # 64 MiB of zeros compress to a few KiB, a single call would expand all of it
+        content = bytes(64 << 20)
+        for codec in ['zlib', 'lzma']:
+            with self.subTest(codec=codec):
+                size = 0
+                for out in codecs.decompress([_compressed(content, codec)], codec, len(content)):
+                    self.assertLessEqual(len(out), codecs.CHUNK_SIZE)
+                    size += len(out)
+                self.assertEqual(size, len(content))
+
+    def test_more_than_size(self):
+        content = bytes(10 << 20)
+        for codec in codecs.CODEC_NAMES:
+            with self.subTest(codec=codec):
+                out = codecs.decompress([_compressed(content, codec)], codec, 1 << 20)
+                with self.assertRaises(FlooterRunError):
+                    for _ in out:
+                        pass
+
+    def test_less_than_size(self):
+        with self.assertRaises(FlooterRunError):
+            list(codecs.decompress([_compressed(b'short', 'zlib')], 'zlib', 6))
+
+
+class BlobHeaderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.blobs = BlobStore(Path(self.dir.name))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _overwrite(self, digest: str, data: bytes) -> None:
+        with open(self.blobs.path(digest), 'wb') as f:
+            f.write(data)
+
+    def test_size_in_header(self):
+        for codec in codecs.CODEC_NAMES:
+            digest = self.blobs.put(b'x' * 1000 + codec.encode(), codec)
+            with open(self.blobs.path(digest), 'rb') as f:
+                self.assertEqual(codecs.parse_header(f.read(codecs.HEADER_SIZE)), (codec, 1000 + len(codec)))
+            self.assertEqual(self.blobs.codec(digest), codec)
+            self.assertEqual(self.blobs.get(digest), b'x' * 1000 + codec.encode())
+
+    def test_corrupt_size(self):
+        digest = self.blobs.put(bytes(1 << 20), 'zlib')
+        with open(self.blobs.path(digest), 'rb') as f:
+            data = f.read()
+        self._overwrite(digest, codecs.header('zlib', 1000) + data[codecs.HEADER_SIZE:])
+        with self.assertRaises(FlooterRunError):
+            self.blobs.get(digest)
+
+    def test_recompress(self):
+        content = b'abc' * 1000
+        digest = self.blobs.put(content)
+        self.blobs.recompress(digest, 'lzma')
+        self.assertEqual(self.blobs.codec(digest), 'lzma')
+        self.assertEqual(self.blobs.get(digest), content)
+
+    def test_unknown_codec(self):
+        digest = self.blobs.put(b'content')
+        with open(self.blobs.path(digest), 'rb') as f:
+            data = bytearray(f.read())
+        data[len(codecs.MAGIC)] = 7
+        self._overwrite(digest, bytes(data))
+        with self.assertRaises(FlooterRunError):
+            self.blobs.get(digest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import json
+import socket
+import sys
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from engines.async_engine import AsyncEngine, aiohttp
+from engines.engine import PreparedRequest
+from engines.scheduler import Scheduler
+from engines.thread_engine import ThreadEngine
+from spec.request import Request
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = dict(parse_qsl(urlparse(self.path).query))
+        # later requests answer first, so responses arrive out of order
+        time.sleep(0.002 * (10 - int(query['id']) % 10))
+        body = json.dumps(query).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class EngineTest:
+    """ runs against both engines, ENGINE is set by the subclasses """
+    ENGINE = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _run(self, ids, concurrency, port=None, with_failed=False):
+        port = port or self.server.server_address[1]
+        hooks = []
+
+        def prepare(i):
+            hooks.append(('before', i))
+            return PreparedRequest('set', 'items/get', str(i), 'GET',
+                                   f'http://127.0.0.1:{port}/items', [('id', i)], {}, None)
+
+        def store(prepared, resp):
+            return resp.json()
+
+        def complete(prepared, body):
+            hooks.append(('after', int(prepared.req_id)))
+            return prepared.req_id, body
+
+        def failed(prepared, err):
+            return type(err).__name__
+
+        with self.ENGINE(Request(), concurrency, {}) as engine:
+            results = list(engine.run(ids, Scheduler(concurrency, []), prepare, store, complete,
+                                      failed if with_failed else None))
+        return results, hooks
+
+    def test_results_in_order(self):
+        results, _ = self._run(range(30), 8)
+        self.assertEqual(results, [(str(i), {'id': str(i)}) for i in range(30)])
+
+    def test_hooks_in_order(self):
+        _, hooks = self._run(range(30), 8)
+        self.assertEqual([i for when, i in hooks if when == 'before'], list(range(30)))
+        self.assertEqual([i for when, i in hooks if when == 'after'], list(range(30)))
+        # a request completes after it was prepared
+        for i in range(30):
+            self.assertLess(hooks.index(('before', i)), hooks.index(('after', i)))
+
+    def test_sequential_hooks_alternate(self):
+        _, hooks = self._run(range(5), 1)
+        self.assertEqual(hooks, [(when, i) for i in range(5) for when in ('before', 'after')])
+
+    def test_failed_on_connection_error(self):
+        results, hooks = self._run(range(3), 2, port=_closed_port(), with_failed=True)
+        self.assertEqual([req_id for req_id, _ in results], ['0', '1', '2'])
+        for _, outcome in results:
+            self.assertIn('Connect', outcome)
+        self.assertEqual([i for when, i in hooks if when == 'after'], [0, 1, 2])
+
+    def test_connection_error_without_failed(self):
+        with self.assertRaises(Exception):
+            self._run(range(3), 2, port=_closed_port())
+
+
+class ThreadEngineTest(EngineTest, unittest.TestCase):
+    ENGINE = ThreadEngine
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class AsyncEngineTest(EngineTest, unittest.TestCase):
+    ENGINE = AsyncEngine
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import sys
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from diff import json_diff
+from diff.json_diff import JsonDiff
+from spec.compare import JsonCompare
+
+
+def _diff(a, b, **options):
+    return list(JsonDiff(JsonCompare(**options)).diff(a, b))
+
+
+def _chain(depth: int, leaf):
+    """ an object nested depth times around leaf """
+    for i in range(depth):
+        leaf = {'level': i, 'names': ['a', 'b'], 'child': leaf}
+    return leaf
+
+
+class JsonDiffTest(unittest.TestCase):
+    def test_key_order_and_copies_are_same(self):
+        a = {'b': [1, {'y': 2, 'x': [3]}], 'a': {'q': None, 'p': 'text'}}
+        b = json.loads('{"a": {"p": "text", "q": null}, "b": [1, {"x": [3], "y": 2}]}')
+        self.assertEqual(_diff(a, b), [])
+
+    def test_pointers_of_changes(self):
+        a = {'a': {'b': [1, {'c': 'x', 'd/e': 1}]}, 'gone': 1}
+        b = {'a': {'b': [1, {'c': 'y', 'd/e': 1}, 2]}, 'new': True}
+        self.assertEqual(_diff(a, b), ['~ /a/b/1/c: "x" -> "y"',
+                                       '+ /a/b/2: 2',
+                                       '- /gone: 1',
+                                       '+ /new: true'])
+
+    def test_deep_change(self):
+        a, b = _chain(200, {'v': 1}), _chain(200, {'v': 2})
+        self.assertEqual(_diff(a, b), ['~ ' + '/child' * 200 + '/v: 1 -> 2'])
+
+    def test_types(self):
+        self.assertEqual(_diff({'a': 1}, {'a': 1.0}), [])
+        self.assertEqual(_diff({'a': 1}, {'a': True}), ['~ /a: 1 -> true'])
+        self.assertEqual(_diff({'a': []}, {'a': {}}), ['~ /a: [] -> {}'])
+        self.assertEqual(_diff([[]], [[None]]), ['+ /0/0: null'])
+
+    def test_tolerance(self):
+        self.assertEqual(_diff({'a': [1.0, 2.0]}, {'a': [1.05, 2.0]}, tolerance=0.1), [])
+        self.assertEqual(_diff({'a': 100}, {'a': 101}, relative_tolerance=0.001), ['~ /a: 100 -> 101'])
+
+    def test_unordered(self):
+        a = {'items': [{'id': 1, 'tags': ['x']}, {'id': 2, 'tags': ['y']}, {'id': 3, 'tags': []}]}
+        b = {'items': [{'tags': [], 'id': 3}, {'id': 1, 'tags': ['x']}, {'id': 2, 'tags': ['z']}]}
+        self.assertEqual(_diff(a, b, unordered_arrays=['/items']),
+                         ['- /items/1: {"id": 2, "tags": ["y"]}', '+ /items/2: {"id": 2, "tags": ["z"]}'])
+        self.assertEqual(len(_diff(a, b)), 6)
+
+    def test_unordered_repeated_items(self):
+        self.assertEqual(_diff([1, 1, 2], [2, 1, 1], unordered_arrays=True), [])
+        self.assertEqual(_diff([1, 1, 2], [2, 2, 1], unordered_arrays=True), ['- /1: 1', '+ /0: 2'])
+
+    def test_nested_unordered_within_tolerance(self):
+        a = [{'v': [1.0, 2.0]}, {'v': [3.0]}]
+        b = [{'v': [3.01]}, {'v': [2.0, 1.0]}]
+        self.assertEqual(_diff(a, b, unordered_arrays=True, tolerance=0.1), [])
+
+    def test_every_value_encoded_a_few_times(self):
+        # comparing a subtree takes a lookup, it is not encoded again for every level above it
+        a, b = _chain(300, {'v': 1}), _chain(300, {'v': 2})
+        size = len(json.dumps(a, separators=(',', ':'))) + len(json.dumps(b, separators=(',', ':')))
+        encoded = []
+        encode = json_diff._encode
+        with mock.patch.object(json_diff, '_encode', lambda value: encoded.append(encode(value)) or encoded[-1]):
+            self.assertEqual(len(_diff(a, b)), 1)
+        self.assertLessEqual(sum(map(len, encoded)), 3 * size)
+
+    def test_same_documents_are_not_hashed(self):
+        a = _chain(50, {'v': 1, 'w': [1, 2]})
+        b = json.loads(json.dumps(_chain(50, {'w': [1, 2], 'v': 1}), indent=1))
+        with mock.patch.object(json_diff, '_digest', side_effect=AssertionError('hashed')):
+            self.assertEqual(_diff(a, b), [])
+            with self.assertRaises(AssertionError):
+                _diff({'a': 1}, {'a': 1.0})
+
+    def test_hashes_are_not_kept(self):
+        differ = JsonDiff()
+        self.assertEqual(len(list(differ.diff(_chain(10, 1), _chain(10, 2)))), 1)
+        self.assertEqual(differ._hashes, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from latency import Histogram, _bounds, _bucket, by_endpoint, percentile, throughput
+from spec.meta import Meta, Timing
+from util import format_seconds, format_size
+
+
+def _timing(sent: float, total: float, received: int = 100) -> Timing:
+    return Timing(sent=sent, total=total, first_byte=total / 2, connect=None, received=received, status=200)
+
+
+class LatencyTest(unittest.TestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([3.0], 50), 3.0)
+        self.assertEqual(percentile([1, 2, 3], 0), 1)
+
+    def test_throughput(self):
+        timings = [_timing(10.0, 1.0), _timing(10.5, 1.5, 300)]
+        self.assertEqual(throughput(timings), (1.0, 200.0))
+        self.assertIsNone(throughput([_timing(10.0, 0.0)]))
+
+    def test_by_endpoint(self):
+        with tempfile.TemporaryDirectory() as d:
+            meta = Meta(Path(d))
+            meta.add_request('set', 'a', '1', [], timing=_timing(1.0, 0.1))
+            meta.add_request('set', 'a', '2', [], timing=_timing(2.0, 0.2))
+            meta.add_request('set', 'b', '3', [])
+            timings, missing = by_endpoint(meta)
+            meta.close()
+
+        self.assertEqual(timings, {('set', 'a'): [_timing(1.0, 0.1), _timing(2.0, 0.2)]})
+        self.assertEqual(missing, 1)
+
+    def test_format(self):
+        self.assertEqual(format_seconds(0.0123), '12.3 ms')
+        self.assertEqual(format_seconds(2.5), '2.50 s')
+        self.assertEqual(format_size(1000), '1000 B')
+        self.assertEqual(format_size(1536), '1.5 KiB')
+        self.assertEqual(format_size(3 << 30), '3.0 GiB')
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_hold_their_values(self):
+        for micros in list(range(1000)) + [1 << 20, (1 << 20) + 12345, 10 ** 9]:
+            low, high = _bounds(_bucket(micros))
+            self.assertLessEqual(low, micros)
+            self.assertLessEqual(micros, high)
+        # adjacent buckets leave no gaps
+        for bucket in range(1, 4000):
+            self.assertEqual(_bounds(bucket - 1)[1] + 1, _bounds(bucket)[0])
+
+    def test_exact_below_256_microseconds(self):
+        for micros in range(256):
+            self.assertEqual(_bounds(_bucket(micros)), (micros, micros))
+
+    def test_relative_error(self):
+        for micros in [300, 4321, 99999, 1234567, 987654321]:
+            low, high = _bounds(_bucket(micros))
+            self.assertLess(abs((low + high) / 2 - micros) / micros, 0.005)
+
+    def test_percentile(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.percentile(50), 0.0)
+        self.assertEqual(histogram.mean(), 0.0)
+
+        for ms in range(1, 101):
+            histogram.record(ms / 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 0.05, delta=0.05 * 0.005)
+        self.assertAlmostEqual(histogram.percentile(99), 0.099, delta=0.099 * 0.005)
+        self.assertEqual(histogram.percentile(100), 0.1)
+        self.assertAlmostEqual(histogram.mean(), 0.0505)
+        for p in range(101):
+            self.assertLessEqual(histogram.percentile(p), histogram.max)
+
+    def test_merge(self):
+        a, b, both = Histogram(), Histogram(), Histogram()
+        for i, seconds in enumerate([0.001, 0.02, 0.3, 0.004, 5.0]):
+            (a if i % 2 else b).record(seconds)
+            both.record(seconds)
+        a.merge(b)
+        self.assertEqual(a.counts, both.counts)
+        self.assertEqual((a.count, a.max), (both.count, both.max))
+        self.assertAlmostEqual(a.sum, both.sum)
+        self.assertEqual(list(a.buckets()), list(both.buckets()))
+
+
+if __name__ == '__main__':
+    unittest.main()
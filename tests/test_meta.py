@@ -0,0 +1,143 @@
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from spec import meta
+from spec.meta import Meta
+from spec.storage import BlobStore, Storage
+
+
+def _committed(base_dir: Path) -> int:
+    """ the requests another process sees """
+    with sqlite3.connect(Path(base_dir, Meta.FILE)) as conn:
+        return conn.execute('SELECT COUNT(*) FROM requests').fetchone()[0]
+
+
+class MetaTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.dir.name)
+        self.meta = Meta(self.base)
+
+    def tearDown(self):
+        self.meta.close()
+        self.dir.cleanup()
+
+    def test_properties(self):
+        self.assertIn('created', self.meta)
+        self.meta['rid'] = 'abc'
+        self.meta['checkpoint'] = {'testset': 'set', 'vars': {'token': 1}}
+        self.meta.close()
+
+        self.meta = Meta(self.base)
+        self.assertEqual(self.meta['rid'], 'abc')
+        self.assertEqual(self.meta['checkpoint'], {'testset': 'set', 'vars': {'token': 1}})
+        self.assertIsNone(self.meta.get('unknown'))
+        with self.assertRaises(KeyError):
+            self.meta['unknown']
+
+    def test_add_request_commits_in_batches(self):
+        for i in range(meta.COMMIT_EVERY - 1):
+            self.meta.add_request('set', 'items', str(i), [('id', i)])
+        self.assertEqual(_committed(self.base), 0)
+
+        self.meta.add_request('set', 'items', 'last', [('id', -1)])
+        self.assertEqual(_committed(self.base), meta.COMMIT_EVERY)
+
+        self.meta.add_request('set', 'items', 'after', [])
+        self.meta.close()
+        self.assertEqual(_committed(self.base), meta.COMMIT_EVERY + 1)
+
+    def test_add_request_commits_after_interval(self):
+        self.meta.add_request('set', 'items', '1', [])
+        self.assertEqual(_committed(self.base), 0)
+        self.meta._last_commit -= meta.COMMIT_INTERVAL
+        self.meta.add_request('set', 'items', '2', [])
+        self.assertEqual(_committed(self.base), 2)
+
+    def test_reopen_without_close(self):
+        # a run that was killed never closes its storage
+        with tempfile.TemporaryDirectory() as d:
+            blobs = BlobStore(Path(d, 'blobs'))
+            killed = Storage(Path(d, 'run'), blobs)
+            for i in range(meta.COMMIT_EVERY + 1):
+                killed.meta.add_request('set', 'items', str(i), [('id', i)])
+
+            reopened = Storage(Path(d, 'run'), blobs)
+            self.assertEqual(reopened.meta.requests('set', 'items'), [str(i) for i in range(meta.COMMIT_EVERY)])
+            self.assertEqual(reopened.meta.parameters('set', 'items', '0'), [('id', 0)])
+            reopened.close()
+            killed.close()
+
+    def test_requests_and_parameters(self):
+        self.meta.add_request('set', 'b', '2', [('id', 2), ('id', 3), ('name', 'x')])
+        self.meta.add_request('set', 'a', '1', [])
+        self.meta.add_request('other', 'a', '3', [('flag', True)])
+
+        self.assertEqual(self.meta.testsets(), ['other', 'set'])
+        self.assertEqual(self.meta.endpoints('set'), ['a', 'b'])
+        self.assertEqual(self.meta.requests('set', 'b'), ['2'])
+        self.assertEqual(self.meta.parameters('set', 'b', '2'), [('id', 2), ('id', 3), ('name', 'x')])
+        self.assertEqual(list(self.meta.iter_requests()), [
+            ('other', 'a', '3', [('flag', True)]),
+            ('set', 'a', '1', []),
+            ('set', 'b', '2', [('id', 2), ('id', 3), ('name', 'x')]),
+        ])
+
+    def test_add_request_again_replaces_it(self):
+        self.meta.add_request('set', 'a', '1', [('id', 1)])
+        self.meta.add_request('set', 'a', '1', [('id', 2)])
+        self.assertEqual(self.meta.requests('set', 'a'), ['1'])
+        self.assertEqual(self.meta.parameters('set', 'a', '1'), [('id', 2)])
+
+    def test_find(self):
+        self.meta.add_request('set', 'a', '1', [])
+        self.assertEqual(tuple(self.meta.find('1')), ('set', 'a'))
+        self.assertIsNone(self.meta.find('2'))
+
+    def test_replace_with(self):
+        self.meta.add_request('set', 'a', '1', [('id', 1)])
+        self.meta['rid'] = 'main'
+
+        with tempfile.TemporaryDirectory() as d:
+            other = Meta(Path(d))
+            other.add_request('set', 'b', '2', [('id', 2)])
+            other['rid'] = 'run'
+
+            self.meta.replace_with(other)
+            other.close()
+
+        self.assertEqual(self.meta['rid'], 'run')
+        self.assertIsNone(self.meta.find('1'))
+        self.assertEqual(list(self.meta.iter_requests()), [('set', 'b', '2', [('id', 2)])])
+
+    def test_import_legacy_yaml(self):
+        with tempfile.TemporaryDirectory() as d:
+            with open(Path(d, Meta.LEGACY_FILE), 'wt') as f:
+                yaml.dump({
+                    'created': '01/02/2020 10:00:00',
+                    'rid': 'old',
+                    'testsets': {'set': {'items': {
+                        '1': {'parameters': [['id', '1'], ['id', '2']]},
+                        '2': {'parameters': []},
+                    }}},
+                }, f)
+
+            legacy = Meta(Path(d))
+            self.assertEqual(legacy['created'], '01/02/2020 10:00:00')
+            self.assertEqual(legacy['rid'], 'old')
+            self.assertNotIn('testsets', legacy)
+            self.assertEqual(legacy.requests('set', 'items'), ['1', '2'])
+            self.assertEqual(legacy.parameters('set', 'items', '1'), [('id', '1'), ('id', '2')])
+            legacy.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,325 @@
+import contextlib
+import hashlib
+import io
+import json
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qsl, urlparse
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from commands.flooter_accept import FlooterAccept
+from commands.flooter_cmp import FlooterCompare
+from commands.flooter_load import FlooterLoad
+from commands.flooter_run import FlooterRun
+from errors import FlooterRunError, FlootSpecSyntaxError
+from loggers import NullLogger
+from spec import record
+from spec.floot_spec import FlootSpec
+from spec.selection import Selection
+from spec.storage import Storage
+
+
+HOOKS = '''
+import threading
+
+class Recorder:
+    """ appends (kind, id, thread) to the shared calls list """
+    calls = []
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __call__(self, testset_name, endpoint_name, params, vars):
+        Recorder.calls.append((self.kind, int(dict(params)['id']), threading.get_ident()))
+
+class Token:
+    """ sets a new token for every testset """
+    calls = []
+
+    def __init__(self, as_tuple=False):
+        self.as_tuple = as_tuple
+
+    def __call__(self, testset_name, vars):
+        Token.calls.append(testset_name)
+        token = f'{testset_name}-{len(Token.calls)}'
+        vars['token'] = (token,) if self.as_tuple else token
+
+class Interrupt:
+    """ appends (testset, id, token) to calls and exits like SIGTERM after the request stop """
+    calls = []
+    stop = None
+
+    def __call__(self, testset_name, endpoint_name, params, vars):
+        request_id = int(dict(params)['id'])
+        token = vars.get('token')
+        Interrupt.calls.append((testset_name, request_id, token[0] if isinstance(token, tuple) else token))
+        if Interrupt.stop == (testset_name, request_id):
+            Interrupt.stop = None
+            raise SystemExit(143)
+'''
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def do_GET(self):
+        with _Handler.lock:
+            _Handler.active += 1
+            _Handler.max_active = max(_Handler.max_active, _Handler.active)
+        url = urlparse(self.path)
+        query = dict(parse_qsl(url.query))
+        # later requests answer first, so responses arrive out of order
+        time.sleep(0.002 * (10 - int(query.get('id', 0)) % 10))
+        if url.path == '/large':
+            query['pad'] = 'x' * (1 << 20)
+        body = json.dumps(query).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        with _Handler.lock:
+            _Handler.active -= 1
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RunTest(unittest.TestCase):
+    """ runs a spec against a local server """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        (self.dir / 'hooks.py').write_text(HOOKS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _spec(self, **overrides) -> FlootSpec:
+        content = {
+            'host': f'http://127.0.0.1:{self.server.server_address[1]}',
+            'storage': {'main': 'main', 'runs': 'runs'},
+            'hooks': {
+                'source': 'hooks.py',
+                'before_request': {'use': 'Recorder', 'args': {'kind': 'before'}},
+                'after_request': {'use': 'Recorder', 'args': {'kind': 'after'}},
+            },
+            'parameters': {'id': {'values': list(range(10))}},
+            'endpoints': {'items': {'uses': ['id']}},
+            'testsets': {'set': {}},
+        }
+        content.update(overrides)
+        path = self.dir / 'spec.yaml'
+        path.write_text(yaml.dump(content))
+        return FlootSpec.load_from_file(path)
+
+    def _run(self, spec: FlootSpec, **kwargs) -> FlooterRun:
+        run = FlooterRun(spec, NullLogger(), **kwargs)
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(SystemExit) as exit:
+            run.run()
+        self.assertEqual(exit.exception.code, 0)
+        return run
+
+    def test_hooks_run_in_order_on_one_thread(self):
+        spec = self._spec()
+        calls = spec.hooks.before_request.calls
+        calls.clear()
+        _Handler.max_active = 0
+
+        self._run(spec, concurrency=4)
+
+        self.assertGreater(_Handler.max_active, 1)
+        self.assertEqual([i for kind, i, _ in calls if kind == 'before'], list(range(10)))
+        self.assertEqual([i for kind, i, _ in calls if kind == 'after'], list(range(10)))
+        for i in range(10):
+            self.assertLess(calls.index(('before', i, threading.get_ident())),
+                            calls.index(('after', i, threading.get_ident())))
+        # all hooks ran on the calling thread, so none of them overlapped
+        self.assertEqual({thread for _, _, thread in calls}, {threading.get_ident()})
+
+    def test_sigterm_handler_is_restored(self):
+        handler = lambda signum, frame: None
+        previous = signal.signal(signal.SIGTERM, handler)
+        try:
+            run = self._run(self._spec())
+            self.assertIs(signal.getsignal(signal.SIGTERM), handler)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+        storage = run.spec.storages.get_run_storage(run.run_id)
+        self.assertTrue(storage.meta['complete'])
+        storage.close()
+
+    def _interrupted(self, as_tuple: bool = False):
+        """ a spec with two testsets and the run id of a run of it that was interrupted in the first one """
+        spec = self._spec(hooks={
+            'source': 'hooks.py',
+            'before_testset': {'use': 'Token', 'args': {'as_tuple': as_tuple}},
+            'after_request': {'use': 'Interrupt'},
+        }, testsets={'a': {}, 'b': {}})
+        interrupt = type(spec.hooks.after_request)
+        interrupt.stop = ('a', 4)
+
+        run = FlooterRun(spec, NullLogger())
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(SystemExit) as exit:
+            run.run()
+        self.assertEqual(exit.exception.code, 143)
+        return spec, run.run_id
+
+    def _resume(self, spec: FlootSpec, run_id: str):
+        interrupt = type(spec.hooks.after_request)
+        interrupt.calls.clear()
+        self._run(spec, resume=run_id)
+
+        storage = spec.storages.get_run_storage(run_id)
+        self.assertTrue(storage.meta['complete'])
+        self.assertEqual(len(storage.list_requests()), 20)
+        storage.close()
+        return interrupt.calls
+
+    def test_resume_restores_the_vars(self):
+        spec, run_id = self._interrupted()
+        token = type(spec.hooks.before_testset)
+        self.assertEqual(token.calls, ['a'])
+
+        calls = self._resume(spec, run_id)
+        # the hook of the interrupted testset is not called again
+        self.assertEqual(token.calls, ['a', 'b'])
+        self.assertEqual(calls, [('a', i, 'a-1') for i in range(5, 10)] + [('b', i, 'b-2') for i in range(10)])
+
+    def test_resume_without_json_vars_runs_the_hooks_again(self):
+        spec, run_id = self._interrupted(as_tuple=True)
+        token = type(spec.hooks.before_testset)
+
+        calls = self._resume(spec, run_id)
+        self.assertEqual(token.calls, ['a', 'a', 'b'])
+        # the requests made before are still skipped
+        self.assertEqual(calls, [('a', i, 'a-2') for i in range(5, 10)] + [('b', i, 'b-3') for i in range(10)])
+
+    def test_completed_run_is_not_resumed(self):
+        spec = self._spec()
+        run = self._run(spec)
+        with self.assertRaises(FlooterRunError):
+            FlooterRun(spec, NullLogger(), resume=run.run_id)
+
+    def test_cmp_does_not_miss_unselected_requests(self):
+        spec = self._spec(testsets={'a': {}, 'b': {}})
+        full = self._run(spec).run_id
+        partial = self._run(spec, selection=Selection.of(testsets=['a'])).run_id
+
+        storage = spec.storages.get_run_storage(partial)
+        self.assertEqual(len(storage.list_requests()), 10)
+        storage.close()
+        for a, b in [(full, partial), (partial, full)]:
+            self.assertEqual(FlooterCompare(spec, NullLogger(), True).changed_requests(a, b), set())
+
+        # as a full run it misses the requests of the other testset
+        storage = spec.storages.get_run_storage(partial)
+        storage.meta['selection'] = None
+        storage.close()
+        changed = FlooterCompare(spec, NullLogger(), True).changed_requests(full, partial)
+        self.assertEqual({testset for testset, _, _ in changed}, {'b'})
+        self.assertEqual(len(changed), 10)
+
+    def test_not_modified_refers_to_main(self):
+        spec = self._spec(request={'conditional': True})
+        FlooterAccept(spec, None).accept_run(self._run(spec).run_id)
+        # accept closes main
+        spec = FlootSpec.load_from_file(self.dir / 'spec.yaml')
+
+        run = self._run(spec)
+        self.assertEqual(run.not_modified, 10)
+        storage = spec.storages.get_run_storage(run.run_id)
+        self.assertEqual(len(storage.list_requests()), 10)
+        for req_id in storage.list_requests():
+            self.assertEqual(bytes(storage.read(req_id)), bytes(spec.storages.main.read(req_id)))
+        storage.close()
+        self.assertEqual(FlooterCompare(spec, NullLogger(), True).changed_requests('main', run.run_id), set())
+
+    def test_large_bodies_are_streamed_intact(self):
+        spec = self._spec(request={'stream_threshold': 1 << 16},
+                          endpoints={'items': {'uses': ['id']}, 'large': {'uses': ['id']}})
+        with mock.patch.object(Storage, 'save_body', autospec=True, side_effect=Storage.save_body) as save_body:
+            run = self._run(spec)
+        # only the large bodies were streamed
+        self.assertEqual(save_body.call_count, 10)
+
+        storage = spec.storages.get_run_storage(run.run_id)
+        for endpoint_name in ['items', 'large']:
+            for req_id in storage.meta.requests('set', endpoint_name):
+                response = storage.load(req_id)
+                expected = dict(storage.meta.parameters('set', endpoint_name, req_id))
+                if endpoint_name == 'large':
+                    expected['pad'] = 'x' * (1 << 20)
+                self.assertEqual(response.json(), {k: str(v) for k, v in expected.items()})
+                self.assertEqual(record.digest_of(storage.read(req_id)),
+                                 hashlib.sha256(response.content).hexdigest())
+                timing = storage.meta.timing('set', endpoint_name, req_id)
+                self.assertEqual(timing.received, len(response.content))
+                self.assertEqual(timing.status, 200)
+                self.assertLessEqual(timing.first_byte, timing.total)
+        storage.close()
+
+    def test_load_makes_the_requests_of_a_run(self):
+        spec = self._spec()
+        calls = spec.hooks.before_request.calls
+        calls.clear()
+        output = self.dir / 'load.json'
+
+        load = FlooterLoad(spec, NullLogger(), concurrency=4, iterations=1, output=output)
+        with self.assertRaises(SystemExit) as exit:
+            load.run()
+        self.assertEqual(exit.exception.code, 0)
+
+        self.assertEqual([i for kind, i, _ in calls if kind == 'before'], list(range(10)))
+        self.assertEqual([i for kind, i, _ in calls if kind == 'after'], list(range(10)))
+        result = json.loads(output.read_text())
+        self.assertEqual(result['iterations'], 1)
+        self.assertEqual(result['total']['requests'], 10)
+        self.assertEqual(result['total']['errors'], {})
+        self.assertEqual([(e['testset'], e['endpoint']) for e in result['endpoints']], [('set', 'items')])
+        # nothing was stored
+        runs = self.dir / 'runs'
+        self.assertEqual(list(runs.iterdir()) if runs.exists() else [], [])
+
+    def test_concurrency_must_be_a_positive_number(self):
+        for value in (0, -1, True):
+            with self.assertRaises(FlootSpecSyntaxError):
+                self._spec(testsets={'set': {'concurrency': value}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import sys
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from engines.scheduler import AdaptiveLimit, Scheduler, TokenBucket
+
+
+def _round(scheduler: Scheduler, latency: float = 0.01, errors: int = 0, status: int = 429) -> None:
+    """ releases one window of requests, errors of them with the given status """
+    size = max(scheduler.limit, AdaptiveLimit.MIN_WINDOW)
+    for i in range(size):
+        scheduler.release(latency, status if i < errors else 200)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_first_token_is_due_immediately(self):
+        self.assertEqual(TokenBucket(10).take(), 0.0)
+
+    def test_debt_is_paid_by_waiting(self):
+        bucket = TokenBucket(10)
+        bucket.take()
+        self.assertAlmostEqual(bucket.take(), 0.1, delta=0.01)
+        self.assertAlmostEqual(bucket.take(), 0.2, delta=0.01)
+
+    def test_delay_is_the_slowest_bucket(self):
+        scheduler = Scheduler(1, [TokenBucket(10), TokenBucket(2)])
+        self.assertEqual(scheduler.delay(), 0.0)
+        self.assertAlmostEqual(scheduler.delay(), 0.5, delta=0.01)
+
+
+class FixedLimitTest(unittest.TestCase):
+    def test_slots(self):
+        scheduler = Scheduler(2, [])
+        self.assertTrue(scheduler.try_acquire())
+        self.assertTrue(scheduler.try_acquire())
+        self.assertFalse(scheduler.try_acquire())
+        scheduler.release(0.01, 200)
+        self.assertTrue(scheduler.try_acquire())
+
+    def test_limit_does_not_adapt(self):
+        scheduler = Scheduler(4, [])
+        _round(scheduler, errors=8)
+        self.assertEqual(scheduler.limit, 4)
+
+
+class AdaptiveLimitTest(unittest.TestCase):
+    def test_starts_at_one(self):
+        self.assertEqual(Scheduler(8, [], adaptive=True).limit, 1)
+
+    def test_grows_by_one_per_good_round(self):
+        scheduler = Scheduler(8, [], adaptive=True)
+        for limit in range(2, 6):
+            _round(scheduler)
+            self.assertEqual(scheduler.limit, limit)
+
+    def test_judges_only_full_windows(self):
+        scheduler = Scheduler(8, [], adaptive=True)
+        for _ in range(AdaptiveLimit.MIN_WINDOW - 1):
+            scheduler.release(0.01, 200)
+        self.assertEqual(scheduler.limit, 1)
+
+    def test_capped_at_concurrency(self):
+        scheduler = Scheduler(3, [], adaptive=True)
+        for _ in range(10):
+            _round(scheduler)
+        self.assertEqual(scheduler.limit, 3)
+
+    def test_halves_on_overload_status(self):
+        for status in AdaptiveLimit.OVERLOAD_STATUS + [None]:
+            scheduler = Scheduler(8, [], adaptive=True)
+            for _ in range(3):
+                _round(scheduler)
+            self.assertEqual(scheduler.limit, 4)
+            # one in eight is above 5%
+            _round(scheduler, errors=1, status=status)
+            self.assertEqual(scheduler.limit, 2)
+
+    def test_other_errors_do_not_halve(self):
+        scheduler = Scheduler(8, [], adaptive=True)
+        _round(scheduler, errors=8, status=500)
+        self.assertEqual(scheduler.limit, 2)
+
+    def test_halves_when_median_latency_doubles(self):
+        scheduler = Scheduler(8, [], adaptive=True)
+        for _ in range(3):
+            _round(scheduler, latency=0.01)
+        _round(scheduler, latency=0.019)
+        self.assertEqual(scheduler.limit, 5)
+        _round(scheduler, latency=0.021)
+        self.assertEqual(scheduler.limit, 2)
+
+    def test_never_below_one(self):
+        scheduler = Scheduler(8, [], adaptive=True)
+        _round(scheduler, errors=8)
+        self.assertEqual(scheduler.limit, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from spec.meta import Meta
+from spec.selection import Selection
+
+
+class SelectionTest(unittest.TestCase):
+    def test_nothing_given_selects_all(self):
+        self.assertIsNone(Selection.of())
+
+    def test_testsets(self):
+        selection = Selection.of(testsets=['a'])
+        self.assertTrue(selection.selects_testset('a'))
+        self.assertFalse(selection.selects_testset('b'))
+        self.assertTrue(selection.selects('a', 'items', '1'))
+        self.assertFalse(selection.selects_endpoint('b', 'items'))
+
+    def test_endpoint_patterns(self):
+        selection = Selection.of(endpoints=['project/*', 'users'])
+        self.assertTrue(selection.selects_endpoint('a', 'project/items'))
+        self.assertTrue(selection.selects_endpoint('a', 'users'))
+        self.assertFalse(selection.selects_endpoint('a', 'users/1'))
+        self.assertFalse(selection.selects_endpoint('a', 'Project/items'))
+
+    def test_request_ids(self):
+        selection = Selection.of(testsets=['a'], request_ids=['1', '2'])
+        self.assertTrue(selection.selects_endpoint('a', 'items'))
+        self.assertTrue(selection.selects('a', 'items', '2'))
+        self.assertFalse(selection.selects('a', 'items', '3'))
+        self.assertFalse(selection.selects('b', 'items', '1'))
+
+    def test_of_requests(self):
+        selection = Selection.of_requests([('a', 'items', '1'), ('a', 'users', '2'), ('b', 'items', '3')])
+        self.assertTrue(selection.selects_testset('b'))
+        self.assertFalse(selection.selects_testset('c'))
+        self.assertTrue(selection.selects_endpoint('a', 'users'))
+        self.assertFalse(selection.selects_endpoint('b', 'users'))
+        self.assertTrue(selection.selects('a', 'items', '1'))
+        self.assertFalse(selection.selects('a', 'items', '4'))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as d:
+            meta = Meta(Path(d))
+            self.assertIsNone(Selection.load(meta))
+
+            for selection in [Selection.of(testsets=['b', 'a'], endpoints=['x/*']),
+                              Selection.of(request_ids=['2', '1']),
+                              Selection.of_requests([('a', 'items', '1'), ('b', 'users', '2')])]:
+                selection.save(meta)
+                meta.close()
+                meta = Meta(Path(d))
+                self.assertEqual(Selection.load(meta), selection)
+            meta.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
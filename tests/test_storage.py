@@ -0,0 +1,303 @@
+import datetime
+import os
+import pickle
+import sys
+import tempfile
+import time
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import requests
+
+from commands.flooter_migrate import FlooterMigrate
+from errors import FlooterRunError
+from loggers import NullLogger
+from spec import record
+from spec.storage import BlobStore, PackedStorage, Storage, Storages, open_storage
+
+
+def _age(p: Path, seconds: float = 3600) -> None:
+    """ pretends every file below p was written that many seconds ago """
+    past = time.time() - seconds
+    for f in p.rglob('*'):
+        if f.is_file():
+            os.utime(f, (past, past))
+
+
+class CollectGarbageTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        base = Path(self.dir.name)
+        self.blobs = BlobStore(Path(base, 'blobs'))
+        self.storages = Storages(main       = open_storage(Path(base, 'main'), self.blobs, 'none', 'files'),
+                                 runs_dir   = Path(base, 'runs'),
+                                 blobs      = self.blobs)
+        self.storages.runs_dir.mkdir()
+
+    def tearDown(self):
+        self.storages.main.close()
+        self.dir.cleanup()
+
+    def _save(self, storage: Storage, name: str, content) -> str:
+        storage.save(name, content)
+        return record.digest_of(storage.read(name))
+
+    def _run(self, rid: str, contents: dict, layout: str = 'files'):
+        self.storages.layout = layout
+        storage = self.storages.make_run_storage(rid)
+        digests = {name: self._save(storage, name, content) for name, content in contents.items()}
+        storage.close()
+        return digests
+
+    def test_removes_only_unreferenced(self):
+        for layout in ['files', 'packed']:
+            with self.subTest(layout=layout):
+                a = self._run(f'a-{layout}', {'1': 'only a', '2': 'shared'}, layout)
+                b = self._run(f'b-{layout}', {'3': 'shared'}, layout)
+                main = self._save(self.storages.main, '4', 'only main')
+                _age(self.blobs.base_dir)
+
+                self.assertEqual(self.storages.rm_run(f'a-{layout}')[0], 1)
+                self.assertFalse(self.blobs.exists(a['1']))
+                self.assertTrue(self.blobs.exists(b['3']))
+                self.assertTrue(self.blobs.exists(main))
+
+                self.assertEqual(self.storages.rm_run(f'b-{layout}')[0], 1)
+                self.assertFalse(self.blobs.exists(b['3']))
+                self.assertTrue(self.blobs.exists(main))
+
+    def test_keeps_recent_blobs(self):
+        a = self._run('a', {'1': 'recent'})
+        self.assertEqual(self.storages.rm_run('a'), (0, 0))
+        self.assertTrue(self.blobs.exists(a['1']))
+
+    def test_storing_again_touches_blob(self):
+        digest = self.blobs.put(b'again')
+        _age(self.blobs.base_dir)
+        # a run that is about to refer to it stores it again
+        self.assertEqual(self.blobs.put(b'again'), digest)
+        self.assertEqual(self.storages.collect_garbage(), (0, 0))
+        self.assertTrue(self.blobs.exists(digest))
+
+        _age(self.blobs.base_dir)
+        self.assertEqual(self.blobs.put_stream([b'aga', b'in']), (digest, 5))
+        self.assertEqual(self.storages.collect_garbage(), (0, 0))
+
+        _age(self.blobs.base_dir)
+        self.assertEqual(self.storages.collect_garbage()[0], 1)
+
+    def test_removes_left_temporaries(self):
+        digest = self._run('a', {'1': 'content'})['1']
+        left = Path(self.blobs.path(digest).parent, f'{BlobStore._TEMPORARY}left')
+        left.write_bytes(b'interrupted')
+        # streamed content is written next to the directories of the blobs
+        streamed = Path(self.blobs.base_dir, f'{BlobStore._TEMPORARY}streamed')
+        streamed.write_bytes(b'interrupted')
+        _age(self.blobs.base_dir)
+        self.storages.collect_garbage()
+        self.assertFalse(left.exists())
+        self.assertFalse(streamed.exists())
+        self.assertTrue(self.blobs.exists(digest))
+
+    def test_unreadable_run_removes_nothing(self):
+        a = self._run('a', {'1': 'content'})
+        self._run('b', {'2': 'more'})
+        Path(self.storages.runs_dir, 'b', '2').write_bytes(b'not a record')
+        _age(self.blobs.base_dir)
+        with self.assertRaises(FlooterRunError):
+            self.storages.rm_run('a')
+        self.assertTrue(self.blobs.exists(a['1']))
+
+
+class BlobStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.blobs = BlobStore(Path(self.dir.name))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        for content in [b'', b'body', bytes(range(256)) * 100]:
+            self.assertEqual(self.blobs.get(self.blobs.put(content)), content)
+
+    def test_put_stream(self):
+        content = bytes(range(256)) * 1000
+        for codec in ['none', 'zlib']:
+            with self.subTest(codec=codec):
+                chunks = (content[i:i+1000] for i in range(0, len(content), 1000))
+                digest, size = self.blobs.put_stream(chunks, codec)
+                self.assertEqual((digest, size), (self.blobs.put(content), len(content)))
+                self.assertEqual(self.blobs.get(digest), content)
+                self.assertEqual(list(self.blobs.base_dir.glob(f'{BlobStore._TEMPORARY}*')), [])
+                self.blobs.path(digest).unlink()
+
+    def test_truncated_blob(self):
+        digest = self.blobs.put(b'a body that is cut short')
+        p = self.blobs.path(digest)
+        p.write_bytes(p.read_bytes()[:-3])
+        with self.assertRaises(FlooterRunError):
+            self.blobs.get(digest)
+
+    def test_not_a_blob(self):
+        digest = self.blobs.put(b'body')
+        self.blobs.path(digest).write_bytes(b'body')
+        with self.assertRaises(FlooterRunError):
+            self.blobs.get(digest)
+
+
+class PackedIndexTest(unittest.TestCase):
+    def test_partial_entry_dropped_on_write_only(self):
+        with tempfile.TemporaryDirectory() as d:
+            blobs = BlobStore(Path(d, 'blobs'))
+            storage = PackedStorage(Path(d, 'run'), blobs)
+            storage.save('1', 'first')
+            storage.close()
+
+            index = Path(d, 'run', PackedStorage.INDEX)
+            complete = index.stat().st_size
+            with open(index, 'ab') as f:
+                f.write(b'\x05\x00')
+
+            # reading leaves a run that might still be writing alone
+            reader = PackedStorage(Path(d, 'run'), blobs)
+            self.assertEqual(reader.list_requests(), ['1'])
+            reader.close()
+            self.assertEqual(index.stat().st_size, complete + 2)
+
+            writer = PackedStorage(Path(d, 'run'), blobs)
+            writer.save('2', 'second')
+            writer.close()
+            reader = PackedStorage(Path(d, 'run'), blobs)
+            self.assertEqual(sorted(reader.list_requests()), ['1', '2'])
+            reader.close()
+
+    def test_close_unmaps_segments(self):
+        with tempfile.TemporaryDirectory() as d:
+            storage = PackedStorage(Path(d, 'run'), BlobStore(Path(d, 'blobs')))
+            storage.save('1', 'first')
+            storage.save('2', 'second')
+            storage.load('1')
+            maps = list(storage._maps.values())
+            self.assertEqual(len(maps), 1)
+
+            # a record that is still held keeps its map open
+            held = storage.read('2')
+            storage.close()
+            self.assertEqual(storage._maps, {})
+            self.assertFalse(maps[0].closed)
+            self.assertEqual(bytes(held[:4]), b'FLTR')
+            held.release()
+            # the storage can still be read after it was closed
+            self.assertEqual(storage.load('1'), 'first')
+            storage.close()
+
+        with tempfile.TemporaryDirectory() as d:
+            storage = PackedStorage(Path(d, 'run'), BlobStore(Path(d, 'blobs')))
+            storage.save('1', 'first')
+            storage.load('1')
+            maps = list(storage._maps.values())
+            storage.close()
+            self.assertTrue(all(m.closed for m in maps))
+
+
+def _response(body: bytes = b'{"a": [1, 2]}') -> requests.Response:
+    response = requests.Response()
+    response.status_code = 404
+    response.reason = 'Not Found'
+    response.url = 'http://host/items?id=1'
+    response.encoding = 'utf-8'
+    response.elapsed = datetime.timedelta(milliseconds=12.5)
+    response.headers = requests.structures.CaseInsensitiveDict({'Content-Type': 'application/json', 'ETag': '"v1"'})
+    response._content = body
+    return response
+
+
+class RecordTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.blobs = BlobStore(Path(self.dir.name, 'blobs'))
+        self.storage = Storage(Path(self.dir.name, 'main'), self.blobs)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def assertSameResponse(self, stored, response: requests.Response):
+        for field in ['status_code', 'reason', 'url', 'encoding', 'elapsed', 'content', 'text']:
+            self.assertEqual(getattr(stored, field), getattr(response, field), field)
+        self.assertEqual(dict(stored.headers), dict(response.headers))
+        self.assertEqual(stored.headers['content-type'], 'application/json')
+        self.assertEqual(stored.json(), response.json())
+
+    def test_encode_decode(self):
+        response = _response()
+        digest = self.blobs.put(response.content)
+        kind, decoded_digest, fields = record.decode(record.encode_response(response, digest))
+        self.assertEqual((kind, decoded_digest), (record.KIND_RESPONSE, digest))
+        self.assertSameResponse(record.StoredResponse(digest, self.blobs.get, self.blobs.iter_content, **fields), response)
+
+    def test_body_is_loaded_on_access(self):
+        loaded = []
+        def load_body(digest):
+            loaded.append(digest)
+            return self.blobs.get(digest)
+
+        response = _response()
+        digest = self.blobs.put(response.content)
+        _, _, fields = record.decode(record.encode_response(response, digest))
+        stored = record.StoredResponse(digest, load_body, self.blobs.iter_content, **fields)
+        self.assertEqual(stored.status_code, 404)
+        self.assertEqual(b''.join(stored.iter_content(4)), response.content)
+        self.assertEqual(loaded, [])
+        self.assertEqual(stored.content, response.content)
+        self.assertEqual(stored.content, response.content)
+        self.assertEqual(loaded, [digest])
+
+    def test_save_and_load(self):
+        response = _response()
+        self.storage.save('1', response)
+        self.assertSameResponse(self.storage.load('1'), response)
+        self.assertEqual(list(self.storage.digests()), [self.blobs.put(response.content)])
+
+        # a loaded response is saved as the same record
+        self.storage.save('2', self.storage.load('1'))
+        self.assertEqual(bytes(self.storage.read('1')), bytes(self.storage.read('2')))
+
+    def test_objects(self):
+        self.storage.save('1', {'rows': [1, 2]})
+        self.assertEqual(self.storage.load('1'), {'rows': [1, 2]})
+        self.assertEqual(record.decode(bytes(self.storage.read('1')))[0], record.KIND_OBJECT)
+
+    def test_unknown_version(self):
+        data = bytearray(record.encode_object(self.blobs.put(b'')))
+        data[len(record.MAGIC)] = record.VERSION + 1
+        with self.assertRaises(ValueError):
+            record.decode(bytes(data))
+
+    def test_pickled_response_of_older_runs(self):
+        response = _response()
+        self.storage.write('1', pickle.dumps(response))
+        self.assertTrue(self.storage.is_legacy('1'))
+        self.assertSameResponse(self.storage.load('1'), response)
+        # it refers to no blob
+        self.assertEqual(list(self.storage.digests()), [])
+
+    def test_migrate(self):
+        response = _response()
+        self.storage.write('1', pickle.dumps(response))
+        self.storage.save('2', {'rows': []})
+        record_of_2 = bytes(self.storage.read('2'))
+
+        FlooterMigrate(None, NullLogger()).migrate('main', self.storage)
+
+        self.assertFalse(self.storage.is_legacy('1'))
+        self.assertIsInstance(self.storage.load('1'), record.StoredResponse)
+        self.assertSameResponse(self.storage.load('1'), response)
+        self.assertEqual(bytes(self.storage.read('2')), record_of_2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import itertools
+import math
+import sys
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from errors import FlootSpecSyntaxError
+from spec.parameter import Parameter, Parameters
+from spec.strategies import _covering_array, pairwise_strategy, permutations_strategy, sample_strategy
+
+
+def _parameters(*levels: int) -> Parameters:
+    """ a parameter p<i> with the values 0 to level - 1 for every level """
+    return Parameters({f'p{i}': Parameter(values=list(range(level)), min_occurrence=1, max_occurrence=1)
+                       for i, level in enumerate(levels)})
+
+
+def _run(strategy, parameters: Parameters, **args):
+    return list(strategy('testset', 'endpoint', {}, args, parameters))
+
+
+class PermutationsTest(unittest.TestCase):
+    def test_count_is_product_of_values(self):
+        for levels in [(1,), (3,), (2, 3), (4, 1, 5), (2, 2, 2, 2)]:
+            self.assertEqual(len(_run(permutations_strategy, _parameters(*levels))), math.prod(levels))
+
+    def test_occurrences(self):
+        # no value, one of two or two of two in any order
+        parameters = Parameters({'a': Parameter(values=['x', 'y'], min_occurrence=0, max_occurrence=2),
+                                 'b': Parameter(values=[1, 2, 3], min_occurrence=1, max_occurrence=1)})
+        runs = _run(permutations_strategy, parameters)
+        self.assertEqual(len(runs), (1 + 2 + 4) * 3)
+        self.assertIn([('b', '1')], runs)
+        self.assertIn([('a', 'y'), ('a', 'x'), ('b', '3')], runs)
+
+    def test_all_distinct(self):
+        runs = _run(permutations_strategy, _parameters(3, 4, 2))
+        self.assertEqual(len(set(map(tuple, runs))), len(runs))
+
+
+class PairwiseTest(unittest.TestCase):
+    def assertCovers(self, runs, parameters: Parameters, t: int):
+        values = {name: [str(v) for v in parameter.values] for name, parameter in parameters.items()}
+        covered = {frozenset(run) for run in map(tuple, runs)}
+        for names in itertools.combinations(values, t):
+            for combination in itertools.product(*(values[name] for name in names)):
+                pairs = set(zip(names, combination))
+                self.assertTrue(any(pairs <= run for run in covered), f'{pairs} is not covered')
+
+    def test_every_pair_is_covered(self):
+        for levels in [(2, 2, 2), (3, 3, 3, 3), (5, 2, 4, 3), (4, 4, 4, 4, 4, 4), (7, 1, 3, 6, 2)]:
+            parameters = _parameters(*levels)
+            runs = _run(pairwise_strategy, parameters)
+            self.assertCovers(runs, parameters, 2)
+            self.assertLessEqual(len(runs), math.prod(levels))
+
+    def test_every_triple_is_covered(self):
+        parameters = _parameters(3, 2, 4, 3, 2)
+        self.assertCovers(_run(pairwise_strategy, parameters, t=3), parameters, 3)
+
+    def test_smaller_than_product(self):
+        # 3 ** 13 = 1594323 permutations, IPOG needs about 20 runs
+        runs = _run(pairwise_strategy, _parameters(*[3] * 13))
+        self.assertLess(len(runs), 30)
+
+    def test_every_parameter_once_per_run(self):
+        for run in _run(pairwise_strategy, _parameters(4, 3, 3, 2)):
+            self.assertEqual(sorted(name for name, _ in run), ['p0', 'p1', 'p2', 'p3'])
+
+    def test_deterministic(self):
+        self.assertEqual(_covering_array([4, 3, 5, 2], 2), _covering_array([4, 3, 5, 2], 2))
+
+    def test_t_of_all_parameters_is_product(self):
+        parameters = _parameters(2, 3)
+        self.assertEqual(_run(pairwise_strategy, parameters), _run(permutations_strategy, parameters))
+
+    def test_parameter_without_values(self):
+        self.assertEqual(_run(pairwise_strategy, _parameters(3, 0, 2)), [])
+
+
+class SampleTest(unittest.TestCase):
+    def test_distinct_and_in_range(self):
+        parameters = _parameters(4, 5, 3)
+        permutations = _run(permutations_strategy, parameters)
+        runs = _run(sample_strategy, parameters, budget=20, seed=7)
+        self.assertEqual(len(runs), 20)
+        self.assertEqual(len(set(map(tuple, runs))), 20)
+        for run in runs:
+            self.assertIn(run, permutations)
+        # in the order of the permutations
+        self.assertEqual(runs, sorted(runs, key=permutations.index))
+
+    def test_budget_above_total(self):
+        parameters = _parameters(2, 3)
+        self.assertEqual(_run(sample_strategy, parameters, budget=100), _run(permutations_strategy, parameters))
+
+    def test_deterministic_for_seed(self):
+        parameters = _parameters(6, 6, 6, 6)
+        self.assertEqual(_run(sample_strategy, parameters, budget=50, seed=3),
+                         _run(sample_strategy, parameters, budget=50, seed=3))
+        self.assertEqual(_run(sample_strategy, parameters, budget=50, seed='nightly'),
+                         _run(sample_strategy, parameters, budget=50, seed='nightly'))
+        self.assertNotEqual(_run(sample_strategy, parameters, budget=50, seed=3),
+                            _run(sample_strategy, parameters, budget=50, seed=4))
+
+    def test_more_permutations_than_maxsize(self):
+        # 10 ** 20 permutations cannot be sampled from a range
+        parameters = _parameters(*[10] * 20)
+        runs = _run(sample_strategy, parameters, budget=100, seed=1)
+        self.assertEqual(len(set(map(tuple, runs))), 100)
+        for run in runs:
+            self.assertEqual([name for name, _ in run], [f'p{i}' for i in range(20)])
+            self.assertTrue(all(0 <= int(value) < 10 for _, value in run))
+        self.assertEqual(runs, _run(sample_strategy, parameters, budget=100, seed=1))
+
+    def test_budget_is_required(self):
+        with self.assertRaises(FlootSpecSyntaxError):
+            _run(sample_strategy, _parameters(2, 2))
+
+    def test_budget_must_be_a_count(self):
+        for budget in (0, True):
+            with self.assertRaises(FlootSpecSyntaxError):
+                _run(sample_strategy, _parameters(2, 2), budget=budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
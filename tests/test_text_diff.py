@@ -0,0 +1,173 @@
+import difflib
+import random
+import re
+import sys
+import unittest
+
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from diff.text_diff import _intern, _Opcodes, matching_blocks, text_diff
+from spec.compare import TextCompare
+
+_HUNK = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def _opcodes(a_lines: List[str], b_lines: List[str], max_d: int = 1000):
+    a, b = _intern(a_lines, b_lines)
+    blocks = matching_blocks(a, b, max_d)
+    return blocks, _Opcodes(a, b, blocks).get_opcodes()
+
+
+def _apply(a_lines: List[str], b_lines: List[str], opcodes) -> List[str]:
+    """ the text the edit script makes of a_lines """
+    out: List[str] = list()
+    for tag, i1, i2, j1, j2 in opcodes:
+        out.extend(a_lines[i1:i2] if tag == 'equal' else b_lines[j1:j2])
+    return out
+
+
+def _patch(a_lines: List[str], diff: List[str]) -> List[str]:
+    """ applies a unified diff, checking every line it keeps or removes """
+    out: List[str] = list()
+    i = 0
+    for line in diff[2:]:
+        hunk = _HUNK.match(line)
+        if hunk:
+            start = int(hunk.group(1)) - (0 if hunk.group(2) == '0' else 1)
+            out.extend(a_lines[i:start])
+            i = start
+        elif line[0] == '+':
+            out.append(line[1:-1])
+        else:
+            assert line[1:-1] == a_lines[i], f'{line!r} is not line {i + 1}'
+            if line[0] == ' ':
+                out.append(a_lines[i])
+            i += 1
+    return out + list(a_lines[i:])
+
+
+def _lcs(a: List[str], b: List[str]) -> int:
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            prev, row[j + 1] = row[j + 1], prev + 1 if x == y else max(row[j + 1], row[j])
+    return row[-1]
+
+
+def _edited(rnd: random.Random, lines: List[str], edits: int) -> List[str]:
+    lines = list(lines)
+    for _ in range(edits):
+        i = rnd.randrange(len(lines) + 1)
+        what = rnd.random()
+        if what < 0.4 and i < len(lines):
+            del lines[i:i + rnd.randint(1, 5)]
+        elif what < 0.7:
+            lines[i:i] = [f'new {rnd.random()}' for _ in range(rnd.randint(1, 5))]
+        else:
+            lines[i:i + 1] = [f'changed {rnd.random()}']
+    return lines
+
+
+class EditScriptTest(unittest.TestCase):
+    def assertRebuilds(self, a_lines, b_lines, max_d=1000):
+        blocks, opcodes = _opcodes(a_lines, b_lines, max_d)
+        self.assertEqual(_apply(a_lines, b_lines, opcodes), b_lines)
+        # blocks match, increase and end with the sentinel
+        for i, j, size in blocks:
+            self.assertEqual(a_lines[i:i + size], b_lines[j:j + size])
+        for (i, j, size), (next_i, next_j, _) in zip(blocks, blocks[1:]):
+            self.assertLessEqual(i + size, next_i)
+            self.assertLessEqual(j + size, next_j)
+        self.assertEqual(blocks[-1], (len(a_lines), len(b_lines), 0))
+        return blocks
+
+    def test_empty(self):
+        self.assertRebuilds([], [])
+        self.assertRebuilds([], ['a', 'b'])
+        self.assertRebuilds(['a', 'b'], [])
+
+    def test_same(self):
+        lines = [f'line {i}' for i in range(100)]
+        self.assertEqual(self.assertRebuilds(lines, lines), [(0, 0, 100), (100, 100, 0)])
+
+    def test_nothing_in_common(self):
+        blocks = self.assertRebuilds([f'a {i}' for i in range(50)], [f'b {i}' for i in range(70)])
+        self.assertEqual(blocks, [(50, 70, 0)])
+
+    def test_repeated_lines(self):
+        self.assertRebuilds(['x'] * 10, ['x'] * 15)
+        self.assertRebuilds(['x', 'y'] * 20, ['y', 'x'] * 25)
+        self.assertRebuilds(['{', '}'] * 30 + ['a'], ['a'] + ['{', '}'] * 30)
+
+    def test_repeated_lines_shortest_script(self):
+        # without unique lines the whole region is compared by the Myers diff
+        rnd = random.Random(5)
+        for _ in range(30):
+            a = [rnd.choice('xyz') for _ in range(rnd.randint(0, 40))]
+            b = [rnd.choice('xyz') for _ in range(rnd.randint(0, 40))]
+            blocks = self.assertRebuilds(a, b)
+            self.assertEqual(sum(size for _, _, size in blocks), _lcs(a, b))
+
+    def test_random_edits(self):
+        rnd = random.Random(11)
+        for _ in range(20):
+            a = [f'line {rnd.randrange(300)}' for _ in range(rnd.randint(1, 500))]
+            self.assertRebuilds(a, _edited(rnd, a, rnd.randint(1, 30)))
+
+    def test_moved_block(self):
+        a = [f'line {i}' for i in range(200)]
+        self.assertRebuilds(a, a[100:150] + a[:100] + a[150:])
+
+    def test_beyond_max_edit_distance(self):
+        # a region that differs too much counts as replaced
+        rnd = random.Random(3)
+        a = [rnd.choice('xy') for _ in range(300)]
+        b = [rnd.choice('xy') for _ in range(300)]
+        self.assertRebuilds(a, b, max_d=10)
+        self.assertRebuilds(['u'] + a + ['v'], ['u'] + b + ['v'], max_d=10)
+
+
+class TextDiffTest(unittest.TestCase):
+    # every text is compared with the fast diff
+    FAST = TextCompare(fast_diff_lines=0)
+
+    def test_same_texts(self):
+        lines = [f'line {i}' for i in range(50)]
+        self.assertEqual(text_diff(lines, list(lines), 'a', 'b', self.FAST), [])
+        self.assertEqual(text_diff([], [], 'a', 'b', self.FAST), [])
+
+    def test_patch_rebuilds(self):
+        rnd = random.Random(7)
+        cases = [([], ['a']), (['a'], []), (['a', 'b'], ['c', 'd']), (['x'] * 8, ['x'] * 3 + ['y'] + ['x'] * 6)]
+        for _ in range(20):
+            a = [f'line {rnd.randrange(200)}' for _ in range(rnd.randint(1, 300))]
+            cases.append((a, _edited(rnd, a, rnd.randint(1, 20))))
+        for a, b in cases:
+            diff = text_diff(a, b, 'a', 'b', self.FAST)
+            self.assertEqual(diff[:2], ['--- a\n', '+++ b\n'])
+            self.assertTrue(all(line.endswith('\n') for line in diff))
+            self.assertEqual(_patch(a, diff), b)
+
+    def test_like_difflib(self):
+        a = [f'line {i}' for i in range(100)]
+        b = a[:10] + ['new'] + a[12:60] + a[61:]
+        expected = list(difflib.unified_diff(a, b, fromfile='a', tofile='b', lineterm='\n'))
+        self.assertEqual(text_diff(a, b, 'a', 'b', self.FAST), [line if line.endswith('\n') else f'{line}\n'
+                                                                 for line in expected])
+
+    def test_summary(self):
+        a = [f'line {i}' for i in range(1000)]
+        b = [line if i % 10 else 'changed' for i, line in enumerate(a)]
+        diff = text_diff(a, b, 'a', 'b', TextCompare(fast_diff_lines=0, max_diff_lines=50))
+        self.assertEqual(diff[2], '@@ too many changes to show: 100 lines removed and 100 added in 100 ranges @@\n')
+        self.assertEqual(diff[3], '@@ -1 +1 @@\n')
+        self.assertEqual(diff[-1], '@@ and 80 more ranges @@\n')
+        self.assertEqual(len(diff), 3 + 20 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()